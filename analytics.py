@@ -0,0 +1,160 @@
+from datetime import date
+from itertools import groupby
+import clock
+from streaks import Streaks, compute_streaks, periodicity_for
+
+# NumPy is optional, without it the batch API falls back to the pure Python streak engine.
+# It is only imported when the NumPy implementation is used, so importing this module stays cheap.
+_numpy = None
+
+
+def numpy_module():
+    """Returns the numpy module, or None if it is not installed. Imports it on the first call."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+# Batch streak analytics for all habits at once. The tracking table is read with one ordered query
+# into (habit_id, day ordinal) columns, and the streaks of every habit are computed from those columns
+# instead of looping over the habits. Both implementations give identical results.
+
+def _periodicities(cursor):
+    """Returns habit_id --> Periodicity for all habits with a known periodicity."""
+    cursor.execute("SELECT id, periodicity FROM habit")
+    result = {}
+    for habit_id, text in cursor.fetchall():
+        try:
+            result[habit_id] = periodicity_for(text)
+        except ValueError:
+            pass
+    return result
+
+
+def _tracking_rows(cursor):
+    return cursor.execute("SELECT habit_id, completed_day FROM tracking ORDER BY habit_id, completed_day")
+
+
+def _python_streaks(rows, periodicities, today):
+    result = {}
+    for habit_id, group in groupby(rows, key=lambda row: row[0]):
+        periodicity = periodicities.get(habit_id)
+        if periodicity is None:
+            continue
+        result[habit_id] = compute_streaks((row[1] for row in group), periodicity.key, today, periodicity.times)
+    return result
+
+
+def python_streaks(cursor, today):
+    """Computes the streaks of all habits with the pure Python engine, see batch_streaks()."""
+    periodicities = _periodicities(cursor)
+    return _python_streaks(_tracking_rows(cursor), periodicities, today)
+
+
+def load_arrays(cursor):
+    """
+    Loads the tracking table into two NumPy arrays.
+
+    Returns
+    -------
+    :return: tuple
+        (habit_ids, days) as int64 arrays, sorted by habit_id and day ordinal.
+    """
+    np = numpy_module()
+    rows = cursor.execute("SELECT COUNT(*) FROM tracking").fetchone()[0]
+    data = np.fromiter((value for row in _tracking_rows(cursor) for value in row),
+                       dtype=np.int64, count=2 * rows)
+    data = data.reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def numpy_streaks(cursor, today):
+    """
+    Computes the streaks of all habits with vectorized NumPy operations, see batch_streaks().
+
+    Periodicities with periods of a fixed number of days and one completion per period are computed
+    by NumPy, the habits with other periodicities ('Monthly', '3x per week') by the Python engine.
+    """
+    np = numpy_module()
+    periodicities = _periodicities(cursor)
+    habit_ids, days = load_arrays(cursor)
+
+    vectorized = sorted(habit_id for habit_id, p in periodicities.items() if p.length and p.times == 1)
+    others = {habit_id: p for habit_id, p in periodicities.items() if not (p.length and p.times == 1)}
+    result = {}
+    if others:
+        other = np.isin(habit_ids, np.array(list(others), dtype=np.int64))
+        result = _python_streaks(zip(habit_ids[other].tolist(), days[other].tolist()), others, today)
+
+    vectorized_ids = np.array(vectorized, dtype=np.int64)
+    lengths = np.array([periodicities[habit_id].length for habit_id in vectorized], dtype=np.int64)
+    known = np.isin(habit_ids, vectorized_ids)
+    habit_ids, days = habit_ids[known], days[known]
+    if len(habit_ids) == 0:
+        return result
+    row_lengths = lengths[np.searchsorted(vectorized_ids, habit_ids)]
+    periods = (days - 1) // row_lengths
+
+    # several completions in the same period count once
+    new_habit = np.ones(len(habit_ids), dtype=bool)
+    new_habit[1:] = habit_ids[1:] != habit_ids[:-1]
+    keep = new_habit.copy()
+    keep[1:] |= np.diff(periods) != 0
+    habit_ids, periods, row_lengths, new_habit = habit_ids[keep], periods[keep], row_lengths[keep], new_habit[keep]
+
+    # run-length encoding: a run starts with every habit and after every gap of more than one period
+    run_start = new_habit.copy()
+    run_start[1:] |= np.diff(periods) != 1
+    run_starts = np.flatnonzero(run_start)
+    run_lengths = np.diff(np.append(run_starts, len(periods)))
+    run_habits = habit_ids[run_starts]
+
+    first_runs = np.flatnonzero(np.r_[True, run_habits[1:] != run_habits[:-1]])
+    longest = np.maximum.reduceat(run_lengths, first_runs)
+    last_runs = np.r_[first_runs[1:] - 1, len(run_habits) - 1]
+    last_rows = np.r_[np.flatnonzero(new_habit)[1:] - 1, len(periods) - 1]
+
+    # the last run of a habit is current if it ends in the period of today or the one before
+    behind = (today - 1) // row_lengths[last_rows] - periods[last_rows]
+    current = np.where((behind >= 0) & (behind <= 1), run_lengths[last_runs], 0)
+
+    result.update((int(habit_id), Streaks(int(c), int(l)))
+                  for habit_id, c, l in zip(run_habits[first_runs], current, longest))
+    return dict(sorted(result.items()))
+
+
+def batch_streaks(conn, today=None, use_numpy=None):
+    """
+    Computes the current and the longest streak of every habit at once.
+
+    The streaks are counted in periods of the periodicity of each habit, see streaks.periodicity_for().
+    Habits with an unknown periodicity and habits without completions are left out.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param today: date or int
+        The day the current streaks are computed for, today by default.
+    :param use_numpy: bool
+        True forces, False disables the NumPy implementation. By default NumPy is used when it is installed.
+
+    Returns
+    -------
+    :return: dict
+        habit_id --> Streaks(current, longest)
+    """
+    if today is None:
+        today = clock.today()
+    if isinstance(today, date):
+        today = today.toordinal()
+    if use_numpy is None:
+        use_numpy = numpy_module() is not None
+    if use_numpy and numpy_module() is None:
+        raise ImportError("NumPy is not installed")
+    cursor = conn.cursor()
+    return numpy_streaks(cursor, today) if use_numpy else python_streaks(cursor, today)
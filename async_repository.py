@@ -0,0 +1,163 @@
+import asyncio
+import queue
+import threading
+from habit import Habit
+
+
+_STOP = object()
+
+
+class AsyncHabitRepository:
+    """
+    Asyncio access to the habits that never blocks the event loop.
+
+    All database work runs on one dedicated worker thread that takes requests from a queue.
+    Whenever the worker picks up a request, it also takes every request that is already waiting
+    (up to max_batch) and runs them in order in one transaction, so many concurrent writes share one
+    commit. Every request runs in its own savepoint: a failing request is rolled back alone and only
+    its caller gets the exception. Results are delivered after the commit.
+
+        async with AsyncHabitRepository() as repository:
+            await repository.mark_completed(3)
+            current, longest = await repository.streaks(3)
+
+    Parameters
+    ----------
+    :param habit_class: type
+        Habit or a subclass of it, for example one with another _DB_NAME.
+    :param max_batch: int
+        The maximum number of requests per transaction.
+    """
+
+    def __init__(self, habit_class=Habit, max_batch=1000):
+        self.habit_class = habit_class
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    # LIFECYCLE
+
+    def start(self):
+        """Starts the worker thread. Called by `async with` and on the first request."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="AsyncHabitRepository", daemon=True)
+            self._thread.start()
+
+    async def close(self):
+        """Finishes all queued requests and stops the worker thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+            self._thread = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # REQUESTS
+
+    async def get(self, habit_id):
+        """
+        Returns the habit with the ID or None.
+
+        Its completions are loaded on the worker thread, so reading them never blocks the event loop.
+        """
+        def get():
+            habit = self.habit_class.get_by_id(habit_id)
+            if habit is not None:
+                habit.load_completions()
+            return habit
+        return await self._submit(get)
+
+    async def save(self, habit):
+        """Saves a habit and its new completions."""
+        return await self._submit(habit.save)
+
+    async def mark_completed(self, habit_id, date=None):
+        """
+        Marks the habit with the ID as completed on a date (now by default) and saves it.
+
+        Raises a LookupError if the habit does not exist.
+        """
+        def mark_completed():
+            habit = self.habit_class.get_by_id(habit_id)
+            if habit is None:
+                raise LookupError(f"Habit {habit_id} not found.")
+            habit.mark_completed(date)
+            habit.save()
+        return await self._submit(mark_completed)
+
+    async def streaks(self, habit_id):
+        """Returns the Streaks(current, longest) of the habit with the ID."""
+        return await self._submit(lambda: self.habit_class.get_streaks(habit_id))
+
+    async def _submit(self, function):
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put((function, future))
+        return await future
+
+    # WORKER THREAD
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        outcomes = []
+        try:
+            with self.habit_class.transaction() as conn:
+                # take the write lock first, so the requests cannot fail on a lock upgrade
+                if not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                for function, future in batch:
+                    # a rolled back request leaves the habits it saved with their unsaved completions
+                    try:
+                        with self.habit_class.savepoint("request"):
+                            result = function()
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+                    else:
+                        outcomes.append((future, result, None))
+        except Exception as error:
+            # the commit failed, none of the requests was saved and their habits stay unsaved
+            outcomes = [(future, None, error) for _, future in batch]
+
+        self.batches += 1
+        self.requests += len(batch)
+        for future, result, error in outcomes:
+            try:
+                future.get_loop().call_soon_threadsafe(_resolve, future, result, error)
+            except RuntimeError:
+                # the event loop of the caller is already closed
+                pass
+
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
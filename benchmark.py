@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from cache import habit_cache
+from database import close_all
+from habit import Habit
+
+
+# BENCHMARK SUITE FOR PERSISTENCE AND STREAK COMPUTATION
+#
+#   python benchmark.py --habits 200 --days 365 --gaps random --weekly 0.3 --output results.json
+#   python benchmark.py --output new.json --compare results.json
+#
+# Every run works on a new database in a temporary directory that is filled by a seeded synthetic
+# data generator, so two runs with the same options measure the same work. Every operation is timed
+# call by call for throughput and p50/p99 latency, then run once more under tracemalloc for its peak
+# memory. The results are written as JSON that can be compared across commits.
+#
+#   python benchmark.py --startup
+#
+# also measures the cold-import time of the library modules, each in a new interpreter.
+
+# The gaps between two completions in periods (days of a daily habit, weeks of a weekly habit).
+# A gap of 1 continues the streak, a larger gap breaks it.
+GAP_PATTERNS = {
+    "none": lambda rng: 1,
+    "random": lambda rng: 1 if rng.random() < 0.8 else rng.randint(2, 5),
+    "bursty": lambda rng: 1 if rng.random() < 0.95 else rng.randint(7, 30),
+    "sparse": lambda rng: rng.randint(1, 4),
+}
+
+
+def generate_habits(count, days, gaps="random", weekly_ratio=0.3, seed=0, end=None, habit_class=Habit):
+    """
+    Creates habits with a synthetic completion history. The habits are not saved.
+
+    Parameters
+    ----------
+    :param count: int
+        The number of habits.
+    :param days: int
+        The length of every history in days, ending on end.
+    :param gaps: str
+        The gap pattern between two completions, one of GAP_PATTERNS.
+    :param weekly_ratio: float
+        The share of weekly habits, the others are daily.
+    :param seed: int
+        The same seed always generates the same habits.
+    :param end: date
+        The last day of the histories, today by default.
+    :param habit_class: type
+        Habit or a subclass of it.
+
+    Returns
+    -------
+    :return: list of Habit
+    """
+    try:
+        gap = GAP_PATTERNS[gaps]
+    except KeyError:
+        raise ValueError(f"Unknown gap pattern: {gaps!r}, expected one of {', '.join(GAP_PATTERNS)}") from None
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    habits = []
+    for number in range(count):
+        weekly = rng.random() < weekly_ratio
+        habit = habit_class(name=f"Habit{number}", description="synthetic",
+                            periodicity="Weekly" if weekly else "Daily")
+        period = 7 if weekly else 1
+        day = start + timedelta(days=rng.randrange(period))
+        while day <= end:
+            habit.mark_completed(day)
+            day += timedelta(days=period * gap(rng))
+        habits.append(habit)
+    return habits
+
+
+def _percentile(ordered, fraction):
+    """Returns the nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def measure(function, calls, memory_calls=None):
+    """
+    Times an operation call by call.
+
+    Parameters
+    ----------
+    :param function: callable
+        Called with every element of calls.
+    :param calls: list
+        The arguments of the calls.
+    :param memory_calls: list
+        The arguments of the calls of the memory run, calls by default. Operations that change
+        their arguments (like saving a habit) need fresh ones.
+
+    Returns
+    -------
+    :return: dict
+        calls, total_seconds, ops_per_second, p50_ms, p99_ms and peak_memory_bytes.
+    """
+    timings = []
+    clock = time.perf_counter
+    for argument in calls:
+        started = clock()
+        function(argument)
+        timings.append(clock() - started)
+    timings.sort()
+    total = sum(timings)
+
+    # tracemalloc slows every allocation down, so the memory is measured in a separate run
+    tracemalloc.start()
+    try:
+        for argument in calls if memory_calls is None else memory_calls:
+            function(argument)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": len(timings),
+        "total_seconds": total,
+        "ops_per_second": len(timings) / total if total else 0.0,
+        "p50_ms": _percentile(timings, 0.50) * 1000,
+        "p99_ms": _percentile(timings, 0.99) * 1000,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_benchmarks(habits=200, days=365, gaps="random", weekly_ratio=0.3, seed=0, cached=False, directory=None):
+    """
+    Runs all benchmarks on a new database and returns the results.
+
+    Parameters
+    ----------
+    :param habits: int
+    :param days: int
+    :param gaps: str
+    :param weekly_ratio: float
+    :param seed: int
+        See generate_habits().
+    :param cached: bool
+        Whether get_by_id may be answered by the habit cache. By default the cache is cleared before
+        every call, so the database access is measured.
+    :param directory: str
+        Where the database is created, a temporary directory by default.
+
+    Returns
+    -------
+    :return: dict
+        The options, the environment and the measurements per operation.
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as temporary:
+        def benchmark_class(db_file):
+            return type("BenchmarkHabit", (Habit,), {"__slots__": (), "_DB_NAME": os.path.join(temporary, db_file)})
+
+        habit_class = benchmark_class("benchmark.db")
+        memory_class = benchmark_class("memory.db")
+        try:
+            generated = generate_habits(habits, days, gaps, weekly_ratio, seed, habit_class=habit_class)
+            completions = sum(len(habit.completed_days) for habit in generated)
+            # migrate the schemas before anything is measured
+            habit_class.get_all()
+            memory_class.get_all()
+
+            operations = {}
+            # every generated habit is saved in its own transaction with its whole history,
+            # the memory run saves a second copy of the habits into another database
+            operations["save"] = measure(lambda habit: habit.save(), generated,
+                                         generate_habits(habits, days, gaps, weekly_ratio, seed,
+                                                         habit_class=memory_class))
+            habit_ids = [habit.habit_id for habit in generated]
+            daily = [habit.habit_id for habit in generated if habit.periodicity == "Daily"]
+            weekly = [habit.habit_id for habit in generated if habit.periodicity == "Weekly"]
+            probe = habit_class()
+
+            def get_by_id(habit_id):
+                if not cached:
+                    habit_cache.clear()
+                return habit_class.get_by_id(habit_id)
+
+            operations["get_by_id"] = measure(get_by_id, habit_ids)
+            operations["get_tracking_data"] = measure(probe.get_tracking_data, habit_ids)
+            operations["calculate_current_daily_streak"] = measure(probe.calculate_current_daily_streak, daily)
+            operations["calculate_longest_daily_streak"] = measure(probe.calculate_longest_daily_streak, daily)
+            operations["calculate_current_weekly_streak"] = measure(probe.calculate_current_weekly_streak, weekly)
+            operations["calculate_longest_weekly_streak"] = measure(probe.calculate_longest_weekly_streak, weekly)
+            operations["longest_streaks"] = measure(lambda _: habit_class.longest_streaks(), [None] * 5)
+        finally:
+            habit_cache.clear()
+            close_all()
+
+    return {
+        "options": {"habits": habits, "days": days, "gaps": gaps, "weekly_ratio": weekly_ratio,
+                    "seed": seed, "cached": cached},
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                        "platform": platform.platform()},
+        "completions": completions,
+        "operations": operations,
+    }
+
+
+# Modules the core library must not import, they belong to the interactive menu or are only needed
+# by optional code paths.
+HEAVY_MODULES = ("questionary", "prompt_toolkit", "numpy", "concurrent.futures", "multiprocessing")
+
+STARTUP_MODULES = ("habit", "cli", "main", "menu")
+
+
+def startup_times(modules=STARTUP_MODULES, repeat=5):
+    """
+    Measures the cold-import time of modules.
+
+    Every import runs in a new Python interpreter with -X importtime, so nothing is imported yet.
+    The time is the cumulative import time of the module that Python reports, without the start
+    of the interpreter itself.
+
+    Parameters
+    ----------
+    :param modules: iterable of str
+    :param repeat: int
+        The number of interpreters per module.
+
+    Returns
+    -------
+    :return: dict
+        module --> runs, p50_ms, min_ms, max_ms and heavy_modules, the HEAVY_MODULES it imports.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for module in modules:
+        code = (f"import sys, {module}; "
+                f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+        timings = []
+        heavy = ""
+        for _ in range(repeat):
+            process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory,
+                                     capture_output=True, text=True, check=True)
+            heavy = process.stdout.strip()
+            for line in process.stderr.splitlines():
+                # import time: self [us] | cumulative | imported package
+                parts = line.split("|")
+                if len(parts) == 3 and parts[2].strip() == module:
+                    timings.append(int(parts[1]) / 1000)
+        timings.sort()
+        results[module] = {
+            "runs": len(timings),
+            "p50_ms": _percentile(timings, 0.50),
+            "min_ms": timings[0] if timings else 0.0,
+            "max_ms": timings[-1] if timings else 0.0,
+            "heavy_modules": heavy.split(",") if heavy else [],
+        }
+    return results
+
+
+def compare(baseline, results):
+    """
+    Compares two benchmark results operation by operation.
+
+    Returns
+    -------
+    :return: dict
+        operation --> the ratios of throughput, p50 and p99 (results / baseline). A throughput
+        ratio below 1 and latency ratios above 1 mean that the results are slower.
+    """
+    comparison = {}
+    for name, current in results["operations"].items():
+        before = baseline.get("operations", {}).get(name)
+        if before is None:
+            continue
+        comparison[name] = {
+            key: current[key] / before[key] if before[key] else None
+            for key in ("ops_per_second", "p50_ms", "p99_ms")
+        }
+    for module, current in results.get("startup", {}).items():
+        before = baseline.get("startup", {}).get(module)
+        if before is not None:
+            comparison[f"import {module}"] = {"p50_ms": current["p50_ms"] / before["p50_ms"] if before["p50_ms"] else None}
+    return comparison
+
+
+def _format(results, comparison=None):
+    lines = [f"{'operation':34} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>9}"]
+    for name, result in results["operations"].items():
+        line = (f"{name:34} {result['ops_per_second']:10.1f} {result['p50_ms']:9.3f} {result['p99_ms']:9.3f} "
+                f"{result['peak_memory_bytes'] / 1024:9.1f}")
+        if comparison and comparison.get(name) and comparison[name]["p50_ms"] is not None:
+            line += f"   p50 x{comparison[name]['p50_ms']:.2f}"
+        lines.append(line)
+    if "startup" in results:
+        lines.append("")
+        lines.append(f"{'import':34} {'p50 ms':>10} {'min ms':>9} {'max ms':>9}  heavy modules")
+        for module, result in results["startup"].items():
+            line = (f"{module:34} {result['p50_ms']:10.1f} {result['min_ms']:9.1f} {result['max_ms']:9.1f}  "
+                    f"{', '.join(result['heavy_modules']) or '-'}")
+            ratio = (comparison or {}).get(f"import {module}", {}).get("p50_ms")
+            if ratio is not None:
+                line += f"   p50 x{ratio:.2f}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the habit persistence and streak computation.")
+    parser.add_argument("--habits", type=int, default=200, help="number of generated habits")
+    parser.add_argument("--days", type=int, default=365, help="length of every history in days")
+    parser.add_argument("--gaps", choices=list(GAP_PATTERNS), default="random", help="gap pattern between completions")
+    parser.add_argument("--weekly", type=float, default=0.3, help="share of weekly habits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cached", action="store_true", help="let the habit cache answer get_by_id")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with the results of an earlier run")
+    parser.add_argument("--startup", action="store_true", help="also measure the cold-import time of the modules")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.habits, args.days, args.gaps, args.weekly, args.seed, args.cached)
+    if args.startup:
+        results["startup"] = startup_times()
+    comparison = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            comparison = compare(json.load(file), results)
+        results["comparison"] = comparison
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    print(_format(results, comparison))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
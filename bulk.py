@@ -0,0 +1,261 @@
+import csv
+import json
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+from schema import day_and_timestamp, parse_completed_date
+from stats import rebuild_habit_stats
+from streaks import periodicity_name
+
+
+# Streaming import and export of the habit and tracking tables as CSV or JSON Lines.
+# Exports iterate the database cursor row by row, imports read, validate and insert the file
+# chunk by chunk, so memory use does not grow with the size of the data.
+
+HABIT_COLUMNS = ["id", "name", "description", "periodicity"]
+TRACKING_COLUMNS = ["habit_id", "completed_date", "completed_at"]
+
+COLUMNS = {
+    "habit": HABIT_COLUMNS,
+    "tracking": TRACKING_COLUMNS,
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path, fmt=None):
+    """Returns the file format, given explicitly or taken from the file extension (.csv, .jsonl)."""
+    if fmt is None:
+        fmt = str(path).rsplit(".", 1)[-1].lower()
+        if fmt == "json":
+            fmt = "jsonl"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown file format: {fmt!r}, expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def _columns(table):
+    try:
+        return COLUMNS[table]
+    except KeyError:
+        raise ValueError(f"Unknown table: {table!r}, expected 'habit' or 'tracking'") from None
+
+
+# EXPORT
+
+def _export_rows(conn, table):
+    if table == "habit":
+        cursor = conn.execute("SELECT id, name, description, periodicity FROM habit ORDER BY id")
+        yield from cursor
+    else:
+        cursor = conn.execute("""
+            SELECT habit_id, completed_day, completed_at FROM tracking ORDER BY habit_id, completed_day
+        """)
+        for habit_id, completed_day, completed_at in cursor:
+            yield habit_id, _iso_day(completed_day), completed_at
+
+
+# the same days occur for many habits, so their ISO strings are only built once
+@lru_cache(maxsize=65536)
+def _iso_day(day):
+    return date.fromordinal(day).isoformat()
+
+
+def export_table(conn, table, path, fmt=None):
+    """
+    Writes a table to a CSV or JSON Lines file.
+
+    Completed days are written as ISO dates. The rows are written while the cursor streams them.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param table: str
+        'habit' or 'tracking'
+    :param path: str
+    :param fmt: str
+        'csv' or 'jsonl', taken from the file extension by default.
+
+    Returns
+    -------
+    :return: int
+        The number of exported rows.
+    """
+    columns = _columns(table)
+    fmt = detect_format(path, fmt)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if fmt == "csv":
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in _export_rows(conn, table):
+                writer.writerow(row)
+                count += 1
+        else:
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            for row in _export_rows(conn, table):
+                file.write(encode(dict(zip(columns, row))))
+                file.write("\n")
+                count += 1
+    return count
+
+
+# IMPORT
+
+def _read_records(file, fmt):
+    """Yields (line number, record dict) for every record of a CSV or JSON Lines file."""
+    if fmt == "csv":
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for number, line in enumerate(file, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise ValueError(f"line {number}: invalid JSON ({error.msg})") from None
+
+
+def _text(record, column, required=True):
+    value = record.get(column)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"{column} is missing")
+    return value
+
+
+def _habit_row(record):
+    habit_id = _text(record, "id", required=False)
+    return (int(habit_id) if habit_id else None, _text(record, "name"),
+            _text(record, "description", required=False), periodicity_name(_text(record, "periodicity")))
+
+
+def _tracking_row(record):
+    completed_day, completed_at = day_and_timestamp(parse_completed_date(_text(record, "completed_date")))
+    return (int(_text(record, "habit_id")), completed_day,
+            _text(record, "completed_at", required=False) or completed_at)
+
+
+def _known_habits(cursor, habit_ids):
+    """Returns the habit_ids that belong to existing habits, queried in groups below SQLite's variable limit."""
+    habit_ids = sorted(habit_ids)
+    known = set()
+    for start in range(0, len(habit_ids), 500):
+        group = habit_ids[start:start + 500]
+        cursor.execute(f"SELECT id FROM habit WHERE id IN ({', '.join('?' * len(group))})", group)
+        known.update(habit_id for habit_id, in cursor)
+    return known
+
+
+def _insert_habits(cursor, rows):
+    cursor.executemany("""
+        INSERT INTO habit (id, name, description, periodicity) VALUES (?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            name = excluded.name, description = excluded.description, periodicity = excluded.periodicity
+    """, [row for row in rows if row[0] is not None])
+    habit_ids = {row[0] for row in rows if row[0] is not None}
+    for row in rows:
+        if row[0] is None:
+            cursor.execute("INSERT INTO habit (name, description, periodicity) VALUES (?, ?, ?)", row[1:])
+    return habit_ids
+
+
+def _insert_tracking(cursor, rows):
+    cursor.executemany("""
+        INSERT OR IGNORE INTO tracking (habit_id, completed_day, completed_at) VALUES (?, ?, ?)
+    """, rows)
+    return {row[0] for row in rows}
+
+
+def _insert_chunk(cursor, insert, rows):
+    """Inserts a chunk inside a savepoint of the transaction of the caller, nothing of it is kept if it fails."""
+    cursor.execute("SAVEPOINT import_chunk")
+    try:
+        return insert(cursor, rows)
+    except BaseException:
+        cursor.execute("ROLLBACK TO import_chunk")
+        raise
+    finally:
+        cursor.execute("RELEASE import_chunk")
+
+
+def import_table(conn, table, path, fmt=None, chunk_size=10000, nested=None):
+    """
+    Reads a CSV or JSON Lines file into a table.
+
+    The file is read in chunks of chunk_size records. Every chunk is validated and then written
+    with executemany in its own transaction. Habits with an ID are inserted or updated, habits without
+    one get a new ID. Completions that already exist for the same day are skipped. Afterwards the
+    habit_stats summary rows of all affected habits are rebuilt.
+
+    A record that fails validation, or a completion of a habit that does not exist, raises a ValueError
+    with its line number. The chunks before it stay imported, nothing of the chunk that contains it is written.
+
+    Inside a transaction of the caller nothing is committed or rolled back: every chunk is written in
+    a savepoint and the caller decides whether the import is kept together with its other changes.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param table: str
+        'habit' or 'tracking'
+    :param path: str
+    :param fmt: str
+        'csv' or 'jsonl', taken from the file extension by default.
+    :param chunk_size: int
+        The number of records per transaction.
+    :param nested: bool
+        Whether the import runs inside a transaction of the caller, by default if one is open.
+
+    Returns
+    -------
+    :return: int
+        The number of records read from the file.
+    """
+    _columns(table)
+    fmt = detect_format(path, fmt)
+    convert, insert = (_habit_row, _insert_habits) if table == "habit" else (_tracking_row, _insert_tracking)
+    if nested is None:
+        nested = conn.in_transaction
+    cursor = conn.cursor()
+    if nested and not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    affected = set()
+    count = 0
+    try:
+        with open(path, newline="", encoding="utf-8") as file:
+            records = _read_records(file, fmt)
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                rows = []
+                for number, record in chunk:
+                    try:
+                        rows.append(convert(record))
+                    except (AttributeError, TypeError, ValueError) as error:
+                        raise ValueError(f"line {number}: {error}") from None
+                if table == "tracking":
+                    known = _known_habits(cursor, {row[0] for row in rows})
+                    for (number, _), row in zip(chunk, rows):
+                        if row[0] not in known:
+                            raise ValueError(f"line {number}: unknown habit {row[0]}")
+                if nested:
+                    affected |= _insert_chunk(cursor, insert, rows)
+                else:
+                    affected |= insert(cursor, rows)
+                    conn.commit()
+                count += len(rows)
+    finally:
+        # drop a chunk that failed half-way, then bring the summaries of the written chunks up to date
+        if not nested:
+            conn.rollback()
+        for habit_id in sorted(affected):
+            cursor.execute("SELECT periodicity FROM habit WHERE id = ?", (habit_id,))
+            row = cursor.fetchone()
+            if row is not None:
+                rebuild_habit_stats(cursor, habit_id, row[0])
+        if not nested:
+            conn.commit()
+    return count
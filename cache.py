@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A thread-safe least-recently-used cache with a fixed maximum size.
+
+    Every entry can carry a tag (for example the habit it belongs to), so that all entries of a tag
+    can be invalidated at once without scanning the cache. Hits, misses and evictions are counted
+    to help with choosing the size.
+
+    Parameters
+    ----------
+    :param maxsize: int
+        The maximum number of entries. 0 disables the cache.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=4096):
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, tag=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[1] is not None:
+            keys = self._tags[entry[1]]
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry[1]]
+
+    def invalidate(self, tag):
+        """Removes all entries with a tag."""
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Removes all entries, the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def resize(self, maxsize):
+        """Changes the maximum size and evicts the least recently used entries that no longer fit."""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        """Returns the counters and the size of the cache as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# The process-wide read-through cache of Habit: habit rows, loaded completion arrays and streaks.
+# Before an entry is served, Habit checks PRAGMA data_version and clears the cache when another
+# connection, for example one of another process, has written to the database in the meantime.
+habit_cache = LRUCache(int(os.environ.get("HABIT_CACHE_SIZE", "4096")))
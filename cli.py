@@ -0,0 +1,303 @@
+import argparse
+import json
+import shlex
+import sys
+from datetime import date
+import clock
+import instrumentation
+from habit import Habit
+from schema import parse_completed_date
+from snapshot import Snapshot
+from streaks import periodicity_for
+
+
+# NON-INTERACTIVE COMMAND LINE INTERFACE
+#
+#   python cli.py add --name Read --description "Read a book" --periodicity Daily
+#   python cli.py add --name Gym --periodicity "3x per week"
+#   python cli.py complete --id 3 --date 2024-06-01
+#   python cli.py streaks --all --json
+#   python cli.py --batch commands.txt
+#
+# A batch file holds one command per line (blank lines and lines starting with # are skipped).
+# All commands of a batch run over one connection in one transaction: either all of them are saved or,
+# if one fails, none.
+
+class CommandError(Exception):
+    """An error in a command that is reported to the user without a traceback."""
+
+
+def _periodicity(text):
+    """Argument type of --periodicity: the canonical name of the periodicity, see streaks.periodicity_for()."""
+    try:
+        return periodicity_for(text).name
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="habit", description="Habit Tracking App command line interface.")
+    parser.add_argument("--db", help="path of the database file (default: habits.db)")
+    parser.add_argument("--batch", metavar="FILE", help="run the commands of FILE in one transaction")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--profile", choices=["table", "json", "prometheus"],
+                        help="print the timings and SQL statements of the habit operations to stderr")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    # --db and --json are accepted after the command as well; SUPPRESS keeps the values given before it
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=argparse.SUPPRESS, help="path of the database file (default: habits.db)")
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS, help="print the results as JSON")
+
+    add = commands.add_parser("add", parents=[common], help="create a new habit")
+    add.add_argument("--id", type=int, help="ID of the habit (default: the next free ID)")
+    add.add_argument("--name", required=True)
+    add.add_argument("--description", default="")
+    add.add_argument("--periodicity", required=True, type=_periodicity,
+                     help="Daily, Weekly, Monthly, 'Every N days' or 'Nx per week' / 'Nx per month'")
+
+    edit = commands.add_parser("edit", parents=[common], help="change name, description or periodicity of a habit")
+    edit.add_argument("--id", type=int, required=True)
+    edit.add_argument("--name")
+    edit.add_argument("--description")
+    edit.add_argument("--periodicity", type=_periodicity)
+
+    delete = commands.add_parser("delete", parents=[common], help="delete a habit and its completions")
+    delete.add_argument("--id", type=int, required=True)
+
+    complete = commands.add_parser("complete", parents=[common], help="mark a habit as completed")
+    complete.add_argument("--id", type=int, required=True)
+    complete.add_argument("--date", help="ISO date or timestamp of the completion (default: now)")
+
+    listing = commands.add_parser("list", parents=[common], help="list all habits")
+    listing.add_argument("--periodicity", type=_periodicity)
+
+    streaks = commands.add_parser("streaks", parents=[common], help="show current and longest streaks")
+    which = streaks.add_mutually_exclusive_group(required=True)
+    which.add_argument("--id", type=int)
+    which.add_argument("--all", action="store_true")
+
+    report = commands.add_parser("report", parents=[common],
+                                 help="compute the streaks of all habits in parallel worker processes")
+    report.add_argument("--workers", type=int, help="number of worker processes (default: number of CPUs)")
+    report.add_argument("--snapshot", metavar="FILE", help="read a snapshot file instead of the database")
+
+    snapshot = commands.add_parser("snapshot", parents=[common],
+                                   help="write a columnar snapshot file for offline reports")
+    snapshot.add_argument("file")
+
+    history = commands.add_parser("history", parents=[common], help="count the completions per day, week or month")
+    history.add_argument("--id", type=int, action="append", help="ID of a habit, can be repeated (default: all)")
+    history.add_argument("--start", help="first ISO date of the range (default: first completion)")
+    history.add_argument("--end", help="last ISO date of the range (default: last completion)")
+    history.add_argument("--bucket", choices=["day", "week", "month"], default="week")
+
+    commands.add_parser("overview", parents=[common], help="show the habit with the longest streak per periodicity")
+
+    for name, help_text in (("import", "import a CSV or JSON Lines file"),
+                            ("export", "export a table to a CSV or JSON Lines file")):
+        command = commands.add_parser(name, parents=[common], help=help_text)
+        command.add_argument("table", choices=["habit", "tracking"])
+        command.add_argument("file")
+        command.add_argument("--format", choices=["csv", "jsonl"])
+
+    commands.add_parser("rebuild-stats", parents=[common], help="recompute the streak summary table")
+    return parser
+
+
+def _get_habit(habit_id):
+    habit = Habit.get_by_id(habit_id)
+    if habit is None:
+        raise CommandError(f"Habit {habit_id} not found.")
+    return habit
+
+
+def _habit_dict(habit):
+    return {"id": habit.habit_id, "name": habit.name, "description": habit.description,
+            "periodicity": habit.periodicity}
+
+
+def _snapshot_report(path):
+    try:
+        with Snapshot(path) as snapshot:
+            return [{"habit_id": habit_id, "name": snapshot.name(habit_id), "periodicity": snapshot.periodicity(habit_id),
+                     "current": current, "longest": longest}
+                    for habit_id, (current, longest) in snapshot.streaks().items()]
+    except (OSError, ValueError) as error:
+        raise CommandError(str(error)) from None
+
+
+def run_command(args):
+    """
+    Runs one parsed command.
+
+    Returns
+    -------
+    :return: tuple
+        (result, text): the result as JSON-compatible data and as text for the console.
+    """
+    if args.command == "add":
+        if args.id is not None and Habit.get_by_id(args.id) is not None:
+            raise CommandError(f"Habit {args.id} already exists, use edit to change it.")
+        habit = Habit(habit_id=args.id, name=args.name, description=args.description, periodicity=args.periodicity)
+        habit.save()
+        return _habit_dict(habit), f"Habit {habit.habit_id} saved."
+
+    if args.command == "edit":
+        habit = _get_habit(args.id)
+        for field in ("name", "description", "periodicity"):
+            if getattr(args, field) is not None:
+                setattr(habit, field, getattr(args, field))
+        habit.save()
+        return _habit_dict(habit), f"Habit {habit.habit_id} updated."
+
+    if args.command == "delete":
+        _get_habit(args.id).delete_habit()
+        return {"id": args.id}, f"Habit {args.id} deleted."
+
+    if args.command == "complete":
+        habit = _get_habit(args.id)
+        try:
+            completed = parse_completed_date(args.date) if args.date else clock.now()
+        except ValueError:
+            raise CommandError(f"Invalid date: {args.date}") from None
+        habit.mark_completed(completed)
+        habit.save()
+        return {"id": habit.habit_id, "date": completed.isoformat()}, f"Habit {habit.habit_id} completed."
+
+    if args.command == "list":
+        habits = [_habit_dict(habit) for habit in Habit.get_all(args.periodicity)]
+        return habits, "\n".join(f"{h['id']}\t{h['name']}\t{h['periodicity']}" for h in habits)
+
+    if args.command == "streaks":
+        if args.all:
+            streaks = [s._asdict() for s in Habit.get_all_streaks()]
+        else:
+            habit = _get_habit(args.id)
+            current, longest = Habit.get_streaks(habit.habit_id)
+            streaks = [{"habit_id": habit.habit_id, "name": habit.name, "periodicity": habit.periodicity,
+                        "current": current, "longest": longest}]
+        text = "\n".join(f"{s['habit_id']}\t{s['name']}\tcurrent: {s['current']}\tlongest: {s['longest']}"
+                         for s in streaks)
+        return (streaks if args.all else streaks[0]), text
+
+    if args.command == "report":
+        if args.snapshot:
+            streaks = _snapshot_report(args.snapshot)
+        else:
+            if args.workers is not None and args.workers < 1:
+                raise CommandError("--workers must be at least 1.")
+            streaks = [s._asdict() for s in Habit.streak_report(args.workers)]
+        text = "\n".join(f"{s['habit_id']}\t{s['name']}\tcurrent: {s['current']}\tlongest: {s['longest']}"
+                         for s in streaks)
+        return streaks, text
+
+    if args.command == "history":
+        try:
+            start, end = (date.fromisoformat(value) if value else None for value in (args.start, args.end))
+        except ValueError as error:
+            raise CommandError(f"Invalid date: {error}") from None
+        counts = {habit_id: {day.isoformat(): count for day, count in buckets.items()}
+                  for habit_id, buckets in Habit.completions(args.id, start, end, args.bucket).items()}
+        text = "\n".join(f"{habit_id}\t{day}\t{count}" for habit_id, buckets in counts.items()
+                         for day, count in buckets.items())
+        return counts, text
+
+    if args.command == "snapshot":
+        try:
+            habits, completions = Habit.export_snapshot(args.file)
+        except OSError as error:
+            raise CommandError(str(error)) from None
+        return ({"file": args.file, "habits": habits, "completions": completions},
+                f"{habits} habit(s) and {completions} completion(s) written to {args.file}.")
+
+    if args.command == "overview":
+        overview = {periodicity: best._asdict() for periodicity, best in Habit.longest_streak_overview().items()}
+        text = "\n".join(f"{periodicity}: {best['name']} ({best['longest']})" for periodicity, best in overview.items())
+        return overview, text
+
+    if args.command == "import":
+        try:
+            count = Habit.import_table(args.table, args.file, args.format)
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error)) from None
+        return {"table": args.table, "rows": count}, f"{count} row(s) imported into {args.table}."
+
+    if args.command == "export":
+        try:
+            count = Habit.export_table(args.table, args.file, args.format)
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error)) from None
+        return {"table": args.table, "rows": count}, f"{count} row(s) exported from {args.table}."
+
+    if args.command == "rebuild-stats":
+        Habit.rebuild_stats()
+        return {}, "Habit statistics rebuilt."
+
+    raise CommandError("No command given.")
+
+
+def _print(result, text, as_json, out):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False), file=out)
+    elif text:
+        print(text, file=out)
+
+
+def run_batch(parser, path, as_json, out):
+    """Runs the commands of a batch file over one connection in one transaction."""
+    try:
+        with open(path, encoding="utf-8") as file:
+            lines = file.readlines()
+    except OSError as error:
+        raise CommandError(str(error)) from None
+
+    with Habit.transaction():
+        for number, line in enumerate(lines, start=1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            # argparse prints what is wrong with the line and exits, the batch stops with its number
+            try:
+                args = parser.parse_args(shlex.split(line))
+            except (SystemExit, ValueError):
+                raise CommandError(f"line {number}: invalid command: {line.strip()}") from None
+            if args.batch or args.db or args.profile:
+                raise CommandError(f"line {number}: --batch, --db and --profile are not allowed in a batch file")
+            args.json = args.json or as_json
+            try:
+                result, text = run_command(args)
+            except CommandError as error:
+                raise CommandError(f"line {number}: {error}") from None
+            _print(result, text, args.json, out)
+
+
+def main(argv=None, out=sys.stdout):
+    """Entry point of the command line interface, returns the exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.db:
+        Habit._DB_NAME = args.db
+    if args.profile:
+        instrumentation.reset()
+        instrumentation.enable()
+    try:
+        if args.batch:
+            run_batch(parser, args.batch, args.json, out)
+        elif args.command:
+            _print(*run_command(args), args.json, out)
+        else:
+            parser.print_usage(sys.stderr)
+            return 2
+    except CommandError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        if args.profile:
+            instrumentation.disable()
+            exports = {"table": instrumentation.summary_table, "json": instrumentation.to_json,
+                       "prometheus": instrumentation.to_prometheus}
+            print(exports[args.profile](), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+
+# DAY BOUNDARIES OF THE COMPLETIONS
+# A completion belongs to the day (and the ISO week of that day) on which it happened in the
+# configured timezone, where a day can end later than midnight, e.g. at 4am for night owls.
+# The day is computed once when a completion is saved and stored as a day ordinal in the tracking
+# table, its ISO week is kept next to it in an index, so the streak queries only compare integers.
+# Changing the settings only affects completions that are saved afterwards.
+#
+#   HABIT_TIMEZONE=Europe/Berlin HABIT_DAY_START=04:00 python cli.py complete --id 1
+
+DaySettings = namedtuple("DaySettings", ["timezone", "day_start"])
+
+_lock = threading.Lock()
+
+
+def _parse_timezone(name):
+    if not name:
+        return None
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name!r}") from None
+
+
+def _parse_day_start(value):
+    """Returns the start of the day as a timedelta from an hour (4), 'HH:MM' ('04:30') or a timedelta."""
+    if value is None or value == "":
+        return timedelta(0)
+    if isinstance(value, timedelta):
+        day_start = value
+    elif isinstance(value, int):
+        day_start = timedelta(hours=value)
+    else:
+        hours, _, minutes = str(value).strip().partition(":")
+        try:
+            day_start = timedelta(hours=int(hours), minutes=int(minutes or 0))
+        except ValueError:
+            raise ValueError(f"Invalid day start: {value!r}, expected an hour or HH:MM") from None
+    if not timedelta(0) <= day_start < timedelta(hours=12):
+        raise ValueError(f"Invalid day start: {value!r}, the day has to start between 00:00 and 11:59")
+    return day_start
+
+
+def settings_from_env():
+    """Reads the settings from HABIT_TIMEZONE (an IANA name, the system timezone by default) and HABIT_DAY_START."""
+    return DaySettings(_parse_timezone(os.environ.get("HABIT_TIMEZONE")),
+                       _parse_day_start(os.environ.get("HABIT_DAY_START")))
+
+
+_settings = settings_from_env()
+
+
+def configure(timezone=None, day_start=None):
+    """
+    Sets the timezone and the start of the day for all completions saved from now on.
+
+    Parameters
+    ----------
+    :param timezone: str
+        IANA name like 'Europe/Berlin'. None uses the timezone of the system.
+    :param day_start: int, str or timedelta
+        When a new day starts, e.g. 4 or '04:00'. Completions before are counted on the day before.
+
+    Returns
+    -------
+    :return: DaySettings
+    """
+    global _settings
+    settings = DaySettings(_parse_timezone(timezone), _parse_day_start(day_start))
+    with _lock:
+        _settings = settings
+    return settings
+
+
+def settings():
+    """Returns the current DaySettings(timezone, day_start)."""
+    return _settings
+
+
+def now():
+    """Returns the current time, in the configured timezone if there is one."""
+    timezone = _settings.timezone
+    return datetime.now(timezone) if timezone is not None else datetime.now()
+
+
+def completion_day(value):
+    """
+    Returns the day ordinal a completion counts for.
+
+    Aware datetimes are converted to the configured timezone, naive ones are taken as wall-clock
+    time there. Times before the start of the day count for the day before. A plain date is its own day.
+    """
+    if isinstance(value, datetime):
+        timezone, day_start = _settings
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone)
+        return (value - day_start).toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    raise TypeError(f"Expected a date or datetime, got {type(value).__name__}")
+
+
+def today():
+    """Returns the day ordinal of today according to the settings."""
+    return completion_day(now())
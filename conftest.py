@@ -0,0 +1,36 @@
+import random
+from datetime import date, timedelta
+import pytest
+from database import close_all
+from habit import Habit
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    # Every test works on its own empty database file
+    monkeypatch.setattr(Habit, "_DB_NAME", str(tmp_path / "habits.db"))
+    yield
+    close_all()
+
+
+@pytest.fixture
+def random_habits():
+    """
+    Returns a function that saves habits with random periodicities and completions and returns them.
+
+    The completions start in December 2024 and follow each other with gaps (in days) drawn from `gaps`,
+    the same seed always gives the same habits.
+    """
+    def create(seed, count, periodicities, gaps, name="Habit{}"):
+        rng = random.Random(seed)
+        habits = []
+        for number in range(count):
+            habit = Habit(name=name.format(number), description="", periodicity=rng.choice(periodicities))
+            day = date(2024, 12, 1) + timedelta(days=rng.randint(0, 30))
+            for _ in range(rng.randint(0, 80)):
+                habit.mark_completed(day)
+                day += timedelta(days=rng.choice(gaps))
+            habits.append(habit)
+        Habit.save_many(habits)
+        return habits
+    return create
@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from instrumentation import InstrumentedConnection, record_connection
+
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# The storage options of a database file, see ConnectionManager for their meaning.
+StorageConfig = namedtuple("StorageConfig", ["pool_size", "journal_mode", "synchronous", "busy_timeout"])
+
+
+def storage_config_from_env():
+    """
+    Returns the default storage options, which can be set with environment variables:
+
+    HABIT_DB_POOL_SIZE (5), HABIT_DB_JOURNAL_MODE (WAL), HABIT_DB_SYNCHRONOUS (NORMAL)
+    and HABIT_DB_BUSY_TIMEOUT in milliseconds (5000).
+    """
+    return StorageConfig(
+        pool_size=int(os.environ.get("HABIT_DB_POOL_SIZE", "5")),
+        journal_mode=os.environ.get("HABIT_DB_JOURNAL_MODE", "WAL"),
+        synchronous=os.environ.get("HABIT_DB_SYNCHRONOUS", "NORMAL"),
+        busy_timeout=int(os.environ.get("HABIT_DB_BUSY_TIMEOUT", "5000")),
+    )
+
+
+# The database file that Habit uses unless another one is configured.
+DEFAULT_DB_NAME = os.environ.get("HABIT_DB_PATH", "habits.db")
+
+
+class ConnectionManager:
+    """
+    Hands out pooled SQLite connections for one database file.
+
+    Every thread borrows its own connection from the pool, nested uses within the same thread
+    share that connection, and the outermost use commits (or rolls back on an error) just like
+    `with sqlite3.connect(...)` does. Connections are created lazily, get their PRAGMAs applied
+    once when they are opened and are kept for reuse until close() is called.
+
+    Write transactions start with BEGIN IMMEDIATE, so a writer takes the write lock before it reads
+    and waits up to busy_timeout for other processes instead of failing with "database is locked".
+    In WAL mode readers and the writer do not block each other.
+
+    Parameters
+    ----------
+    :param db_name: str
+        Path of the SQLite database file.
+    :param pool_size: int
+        Maximum number of idle connections that are kept open for reuse.
+    :param journal_mode: str
+        One of JOURNAL_MODES, WAL by default.
+    :param synchronous: str
+        One of SYNCHRONOUS_LEVELS. NORMAL is safe in WAL mode, only the last commits can be lost on power failure.
+    :param busy_timeout: int
+        Milliseconds to wait for a lock held by another connection.
+    :param pragmas: dict
+        Further PRAGMA name/value pairs that are applied to every new connection.
+    """
+
+    DEFAULT_PRAGMAS = {"foreign_keys": "ON"}
+
+    def __init__(self, db_name, pool_size=5, journal_mode="WAL", synchronous="NORMAL", busy_timeout=5000,
+                 pragmas=None):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if str(journal_mode).upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal_mode: {journal_mode!r}")
+        if str(synchronous).upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level: {synchronous!r}")
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.busy_timeout = int(busy_timeout)
+        self.pragmas = {
+            "busy_timeout": self.busy_timeout,
+            "journal_mode": str(journal_mode).upper(),
+            "synchronous": str(synchronous).upper(),
+        }
+        self.pragmas.update(self.DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+        # set by schema.ensure_schema() once the database has been migrated
+        self.schema_ready = False
+
+    def open(self):
+        """Opens the manager again after close() and pre-opens one connection."""
+        with self._lock:
+            self._closed = False
+        self._release(self._acquire())
+
+    def close(self):
+        """Closes all idle connections. Connections that are in use are closed when they are released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _new_connection(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout / 1000, check_same_thread=False,
+                               isolation_level="IMMEDIATE", factory=InstrumentedConnection)
+        record_connection()
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection manager.")
+            if self._idle:
+                return self._idle.pop()
+        return self._new_connection()
+
+    def _release(self, conn):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def in_connection(self):
+        """Whether the current thread is inside a connection() block, the outermost block owns the transaction."""
+        return getattr(self._local, "conn", None) is not None
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields the connection of the current thread.
+
+        The outermost `with` block commits when it finishes and rolls back if an exception is raised.
+        Nested blocks reuse the connection and leave the transaction handling to the outermost block.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+
+_managers = {}
+_configs = {}
+_managers_lock = threading.Lock()
+
+
+def storage_config(db_name):
+    """Returns the storage options of a database file."""
+    with _managers_lock:
+        return _configs.get(db_name) or storage_config_from_env()
+
+
+def configure(db_name, **options):
+    """
+    Changes storage options (pool_size, journal_mode, synchronous, busy_timeout) of a database file.
+
+    Options that are not given keep their current value. The pooled connections of the database
+    are closed, new connections use the new options.
+
+    Returns
+    -------
+    :return: StorageConfig
+    """
+    unknown = set(options) - set(StorageConfig._fields)
+    if unknown:
+        raise ValueError(f"Unknown storage option(s): {', '.join(sorted(unknown))}")
+    config = storage_config(db_name)._replace(**options)
+    # validates the options before they are stored
+    ConnectionManager(db_name, **config._asdict())
+    with _managers_lock:
+        _configs[db_name] = config
+        manager = _managers.pop(db_name, None)
+    if manager is not None:
+        manager.close()
+    return config
+
+
+def get_manager(db_name):
+    """Returns the shared ConnectionManager for a database file and creates it on first use."""
+    config = storage_config(db_name)
+    with _managers_lock:
+        manager = _managers.get(db_name)
+        if manager is None:
+            manager = ConnectionManager(db_name, **config._asdict())
+            _managers[db_name] = manager
+        return manager
+
+
+def close_all():
+    """Closes the pooled connections of every database and forgets the managers."""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
@@ -1,112 +1,466 @@
-import sqlite3
-from datetime import datetime, timedelta
-import questionary
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import date
+import clock
+from analytics import batch_streaks
+from bulk import export_table, import_table
+from cache import habit_cache
+from database import DEFAULT_DB_NAME, configure, get_manager
+from history import completions
+from instrumentation import instrumented
+from report import streak_report
+from schema import day_and_timestamp, ensure_schema
+from snapshot import write_snapshot
+from stats import best_streaks, read_all_streaks, read_streaks, rebuild_stats, stream_streaks, update_stats
+from streaks import (compute_streaks, current_daily_streak, day_key, longest_daily_streak, periodicity_for,
+                     periodicity_name, week_key)
+
+
+def _to_day(value):
+    """Returns the day ordinal of a date, datetime or day ordinal."""
+    return value if isinstance(value, int) else day_and_timestamp(value)[0]
+
+
+# The habits saved inside the outermost Habit.transaction() block of a thread. Their completions
+# are only marked as saved once the block has been committed, so after a rollback the same habits
+# can simply be saved again.
+_transaction = threading.local()
+
+
+def _committed(saved):
+    """Forgets the completions that were saved, the habits keep the ones marked since."""
+    for habit, completions, _ in saved:
+        done = {id(completed) for completed in completions}
+        habit._unsaved_completions = [c for c in habit._unsaved_completions if id(c) not in done]
+
+
+def _rolled_back(saved):
+    """New habits lose the ID of their rolled back row, their completions stay unsaved."""
+    for habit, _, new in saved:
+        if new:
+            habit.habit_id = None
+
+
+def _check_cache(conn):
+    """
+    Clears the habit cache when the database has been changed by another connection, for example
+    one of another process, since this connection last looked. Own commits do not count, they
+    invalidate their entries themselves.
+    """
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if getattr(conn, "_cache_data_version", None) != version:
+        conn._cache_data_version = version
+        habit_cache.clear()
+
+
+def _cache_id(habit_id):
+    """Habit IDs are cached as int, so that '3' from user input and 3 share one cache entry."""
+    try:
+        return int(habit_id)
+    except (TypeError, ValueError):
+        return habit_id
 
 
 class Habit:
 
-    _DB_NAME = "habits.db"
+    _DB_NAME = DEFAULT_DB_NAME
+
+    __slots__ = ("habit_id", "name", "description", "periodicity", "_days", "_loaded_since", "_unsaved_completions")
 
     def __init__(self, habit_id=None, name=None, description=None, periodicity=None):
         self.habit_id = habit_id
         self.name = name
         self.description = description
         self.periodicity = periodicity
-        self._initialize_db()
-        self.completed_dates = []
+        # the completed days as a sorted array of unique day ordinals (4 bytes per completion),
+        # None while the history of a habit loaded by get_by_id has not been needed yet
+        self._days = array("i")
+        # the first day ordinal of a windowed history, None if the whole history is loaded
+        self._loaded_since = None
+        # completions marked since the habit was loaded or last saved
+        self._unsaved_completions = []
+
+    def _loaded_days(self):
+        if self._days is None:
+            self.load_completions()
+        return self._days
+
+    @property
+    def completed_days(self):
+        """
+        The completed days as a sorted array('i') of day ordinals. Must not be changed in place.
 
-    # Initialization of the database
-    def _initialize_db(self):
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                           CREATE TABLE IF NOT EXISTS habit (
-                               id INTEGER PRIMARY KEY,
-                               name TEXT NOT NULL,
-                               description TEXT NOT NULL,
-                               periodicity TEXT NOT NULL
-                               )
-                           """)
-            cursor.execute("""
-                           CREATE TABLE IF NOT EXISTS tracking (
-                           id INTEGER PRIMARY KEY,
-                           habit_id INTEGER,
-                           completed_date DATETIME,
-                           FOREIGN KEY (habit_id) REFERENCES habit(id)
-                           )
-                       """)
-            conn.commit()
+        The history is loaded from the database on first access.
+        """
+        return self._loaded_days()
+
+    @property
+    def completed_dates(self):
+        """The completed days as a list of dates, built on every access."""
+        return [date.fromordinal(day) for day in self._loaded_days()]
+
+    @completed_dates.setter
+    def completed_dates(self, dates):
+        """Replaces the completions the habit knows. All of them are written by the next save()."""
+        completions = {}
+        for completed in dates:
+            completions.setdefault(day_and_timestamp(completed)[0], completed)
+        self._days = array("i", sorted(completions))
+        self._loaded_since = None
+        self._unsaved_completions = list(completions.values())
+
+    def is_completed_on(self, day):
+        """Checks in O(log n) whether the habit was completed on a date or day ordinal."""
+        day = _to_day(day)
+        days = self._loaded_days()
+        position = bisect_left(days, day)
+        return position < len(days) and days[position] == day
+
+    @instrumented
+    def load_completions(self, since=None):
+        """
+        Loads the completion history of the habit from the database.
+
+        Parameters
+        ----------
+        :param since: date or int
+            Only load the completions on or after this day. The habit then only knows this window
+            of its history until load_completions() is called again without it.
+        """
+        since_day = None if since is None else _to_day(since)
+        if since_day is None and self.habit_id is not None:
+            # whole histories are kept in the cache (as a copy, the habit changes its own array)
+            key = (self._DB_NAME, "days", _cache_id(self.habit_id))
+            with self._connection() as conn:
+                _check_cache(conn)
+                cached = habit_cache.get(key)
+                if cached is None:
+                    days = array("i", self.iter_completions())
+                    if not conn.in_transaction:
+                        habit_cache.put(key, array("i", days), tag=(self._DB_NAME, _cache_id(self.habit_id)))
+                else:
+                    days = array("i", cached)
+        else:
+            days = array("i", self.iter_completions(since_day))
+        # completions marked before the history was loaded are kept
+        for completed in self._unsaved_completions:
+            day = day_and_timestamp(completed)[0]
+            position = bisect_left(days, day)
+            if position == len(days) or days[position] != day:
+                days.insert(position, day)
+        self._days = days
+        self._loaded_since = since_day
+
+    def iter_completions(self, since=None):
+        """
+        Streams the saved completed days of the habit from the database in ascending order.
+
+        Nothing is kept in the habit, so this also works for histories that should not be held in memory.
+
+        Parameters
+        ----------
+        :param since: date or int
+            Only yield the completions on or after this day.
+
+        Returns
+        -------
+        :return: generator of int
+            The day ordinals of the completions.
+        """
+        if self.habit_id is None:
+            return
+        since_day = 0 if since is None else _to_day(since)
+        with self._connection() as conn:
+            cursor = conn.execute("""
+                SELECT completed_day FROM tracking WHERE habit_id = ? AND completed_day >= ? ORDER BY completed_day
+            """, (self.habit_id, since_day))
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0]
+
+    # Every database access goes through the shared connection pool of the database file.
+    # The schema is migrated on the first access in this process, constructing a Habit never touches the database.
+    @classmethod
+    def _connection(cls):
+        manager = get_manager(cls._DB_NAME)
+        ensure_schema(manager)
+        return manager.connection()
+
+    @classmethod
+    def configure_storage(cls, db_name=None, **options):
+        """
+        Sets the database file and the storage options of the habits.
+
+        Parameters
+        ----------
+        :param db_name: str
+            Path of the database file. The default is habits.db or the HABIT_DB_PATH environment variable.
+        :param options:
+            pool_size, journal_mode, synchronous and busy_timeout, see database.ConnectionManager.
+
+        Returns
+        -------
+        :return: StorageConfig
+            The storage options that are now in use.
+        """
+        if db_name is not None:
+            cls._DB_NAME = db_name
+        return configure(cls._DB_NAME, **options)
+
+    @classmethod
+    @contextmanager
+    def transaction(cls):
+        """
+        Context manager that runs all Habit operations inside its block over one connection.
+
+        The operations are committed together when the block ends and rolled back together if it raises.
+        Habits saved in a rolled back block keep their unsaved completions and can be saved again.
+        """
+        if get_manager(cls._DB_NAME).in_connection():
+            with cls._connection() as conn:
+                yield conn
+            return
+        _transaction.saved = saved = []
+        try:
+            with cls._connection() as conn:
+                yield conn
+        except BaseException:
+            _rolled_back(saved)
+            raise
+        finally:
+            _transaction.saved = None
+        _committed(saved)
+
+    @classmethod
+    @contextmanager
+    def savepoint(cls, name="habit"):
+        """
+        Context manager that runs its block in a savepoint of the open Habit.transaction().
+
+        If the block raises, only its operations are rolled back and the habits it saved keep their
+        unsaved completions. The rest of the transaction goes on.
+
+        Parameters
+        ----------
+        :param name: str
+            The name of the savepoint.
+        """
+        saved = getattr(_transaction, "saved", None)
+        if saved is None:
+            raise RuntimeError("A savepoint needs an open Habit.transaction().")
+        mark = len(saved)
+        with cls._connection() as conn:
+            conn.execute(f"SAVEPOINT {name}")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {name}")
+                _rolled_back(saved[mark:])
+                del saved[mark:]
+                raise
+            finally:
+                conn.execute(f"RELEASE {name}")
 
     # All the functions that have to do with the basic creation of the habits
     # and their storage and retrieval from the database.
 
+    @instrumented
     def save(self):
-        """ Saves the habit to the database"""
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            if self.habit_id:
-                # Update existing habit metadata
-                cursor.execute("""
-                    UPDATE habit SET name = ?, description = ?, periodicity = ? WHERE id = ?
-                """, (self.name, self.description, self.periodicity, self.habit_id))
-            else:
-                # Insert new habit metadata
-                cursor.execute("""
-                    INSERT INTO habit (name, description, periodicity) VALUES (?, ?, ?)
-                """, (self.name, self.description, self.periodicity))
-                self.habit_id = cursor.lastrowid
+        """
+        Saves the habit and its new completions to the database.
 
-            # Get existing completions for this habit
-            cursor.execute("""
-                SELECT completed_date FROM tracking WHERE habit_id = ?
-            """, (self.habit_id,))
-            existing_dates = {row[0] for row in cursor.fetchall()}
+        Only the completions marked since the habit was loaded or last saved are written,
+        the existing history is never read.
+        """
+        self.save_many([self])
 
-            # Insert new completions that don´t already exist in the database
-            for date in [d.isoformat() for d in self.completed_dates if d.isoformat() not in existing_dates]:
-                cursor.execute("""
-                    INSERT INTO tracking (habit_id, completed_date) VALUES (?, ?)
-                """, (self.habit_id, date))
+    @classmethod
+    @instrumented
+    def save_many(cls, habits):
+        """
+        Saves several habits and their new completions in a single transaction.
+
+        The habit metadata is upserted row by row (new habits need their generated ID),
+        the completions of all habits are inserted with one executemany. Completions that
+        already exist for the same day are skipped by the unique (habit_id, completed_day) constraint.
 
-            conn.commit()
+        Parameters
+        ----------
+        :param habits: iterable of Habit
+        """
+        habits = list(habits)
+        saved = [(habit, list(habit._unsaved_completions), not habit.habit_id) for habit in habits]
+        outermost = not get_manager(cls._DB_NAME).in_connection()
+        try:
+            with cls._connection() as conn:
+                cursor = conn.cursor()
+                completions = []
+                for habit in habits:
+                    habit._save_metadata(cursor)
+                    for completed in habit._unsaved_completions:
+                        completed_day, completed_at = day_and_timestamp(completed)
+                        completions.append((habit.habit_id, completed_day, completed_at))
+
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO tracking (habit_id, completed_day, completed_at) VALUES (?, ?, ?)
+                """, completions)
+
+                # keep the streak summary of every habit up to date
+                for habit in habits:
+                    new_days = [day_and_timestamp(completed)[0] for completed in habit._unsaved_completions]
+                    update_stats(cursor, habit.habit_id, habit.periodicity, new_days)
+        except BaseException:
+            if outermost:
+                _rolled_back(saved)
+            raise
+        finally:
+            for habit in habits:
+                habit_cache.invalidate((cls._DB_NAME, _cache_id(habit.habit_id)))
+
+        # only forget the new completions once the transaction that wrote them has been committed
+        if outermost:
+            _committed(saved)
+        elif getattr(_transaction, "saved", None) is not None:
+            _transaction.saved.extend(saved)
+
+    def _save_metadata(self, cursor):
+        # every habit is stored with the canonical name of its periodicity, so it is found by it
+        self.periodicity = periodicity_name(self.periodicity)
+        if self.habit_id:
+            # Insert the habit with the chosen ID or update the existing habit metadata
+            cursor.execute("""
+                INSERT INTO habit (id, name, description, periodicity) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name, description = excluded.description, periodicity = excluded.periodicity
+            """, (self.habit_id, self.name, self.description, self.periodicity))
+        else:
+            # Insert new habit metadata
+            cursor.execute("""
+                INSERT INTO habit (name, description, periodicity) VALUES (?, ?, ?)
+            """, (self.name, self.description, self.periodicity))
+            self.habit_id = cursor.lastrowid
 
+    @instrumented
     def delete_habit(self):
         """Deletes a habit from the database"""
-        with sqlite3.connect(self._DB_NAME) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             if self.habit_id:
+                cursor.execute("""
+                DELETE FROM habit_stats WHERE habit_id = ?
+                """, (self.habit_id, ))
+                cursor.execute("""
+                DELETE FROM tracking WHERE habit_id = ?
+                """, (self.habit_id, ))
                 cursor.execute("""
                 DELETE FROM habit WHERE id = ?
                 """, (self.habit_id, ))
 
             else:
                 return None
+        habit_cache.invalidate((self._DB_NAME, _cache_id(self.habit_id)))
 
-            conn.commit()
 
     @classmethod
+    @instrumented
     def get_by_id(cls, habit_id):
-        """Retrieve a habit by its ID along with its tracking data."""
-        with sqlite3.connect(cls._DB_NAME) as conn:
-            cursor = conn.cursor()
+        """
+        Retrieve a habit by its ID.
 
-            # Fetch habit metadata
-            cursor.execute("""
-                    SELECT id, name, description, periodicity FROM habit WHERE id = ?
-                """, (habit_id,))
-            result = cursor.fetchone()
-            if not result:
-                return None
+        Only the habit row is read. The tracking data is loaded when it is first needed,
+        see load_completions() and iter_completions().
+        """
+        key = (cls._DB_NAME, "habit", _cache_id(habit_id))
+        with cls._connection() as conn:
+            _check_cache(conn)
+            result = habit_cache.get(key)
+            if result is None:
+                cursor = conn.cursor()
+
+                # Fetch habit metadata
+                cursor.execute("""
+                        SELECT id, name, description, periodicity FROM habit WHERE id = ?
+                    """, (habit_id,))
+                result = cursor.fetchone()
+                if not result:
+                    return None
+                # rows read while unsaved changes are pending are not cached, they could still be rolled back
+                if not conn.in_transaction:
+                    habit_cache.put(key, result, tag=(cls._DB_NAME, result[0]))
+
+        habit = cls(habit_id=result[0], name=result[1], description=result[2], periodicity=result[3])
+        habit._days = None
+        return habit
+
+    @classmethod
+    @instrumented
+    def get_streaks(cls, habit_id):
+        """
+        Returns the current and the longest streak of a habit from the habit_stats summary table.
 
-            habit = cls(habit_id=result[0], name=result[1], description=result[2], periodicity=result[3])
+        Reads one row, no matter how long the tracking history of the habit is.
 
-            # Fetch habit completions
-            cursor.execute("""
-                    SELECT completed_date FROM tracking where habit_id = ?
-                """, (habit_id,))
-            habit.completed_dates = [datetime.fromisoformat(row[0]).date() for row in cursor.fetchall()]
+        Returns
+        -------
+        :return: Streaks
+            (current, longest) in periods of the habit, (0, 0) if the habit has no completions.
+        """
+        today = clock.today()
+        key = (cls._DB_NAME, "streaks", _cache_id(habit_id), today)
+        with cls._connection() as conn:
+            _check_cache(conn)
+            streaks = habit_cache.get(key)
+            if streaks is None:
+                streaks = read_streaks(conn.cursor(), habit_id, today)
+                if not conn.in_transaction:
+                    habit_cache.put(key, streaks, tag=(cls._DB_NAME, _cache_id(habit_id)))
+        return streaks
+
+    @classmethod
+    @instrumented
+    def get_all_streaks(cls):
+        """Returns the HabitStreaks of every habit from the habit_stats summary table, ordered by habit_id."""
+        with cls._connection() as conn:
+            return read_all_streaks(conn.cursor(), clock.today())
+
+    @classmethod
+    @instrumented
+    def rebuild_stats(cls):
+        """Recomputes the habit_stats summary table from the tracking history of all habits."""
+        with cls._connection() as conn:
+            rebuild_stats(conn.cursor())
+        habit_cache.clear()
+
+    @staticmethod
+    def cache_stats():
+        """Returns the hit, miss and eviction counters and the size of the habit cache (see cache.py)."""
+        return habit_cache.stats()
+
+    @classmethod
+    @instrumented
+    def get_all(cls, periodicity=None):
+        """
+        Returns all habits, or all habits with one periodicity, ordered by their ID.
 
-            return habit
+        Only the habit rows are read, the tracking data of every habit is loaded lazily. The periodicity
+        is matched by its canonical name, so 'weekly' finds the habits saved as 'Weekly' and the other way round.
+        """
+        with cls._connection() as conn:
+            rows = conn.execute("SELECT id, name, description, periodicity FROM habit ORDER BY id").fetchall()
+            if periodicity is not None:
+                periodicity = periodicity_name(periodicity)
+                rows = [row for row in rows if periodicity_name(row[3]) == periodicity]
+            habits = []
+            for habit_id, name, description, habit_periodicity in rows:
+                habit = cls(habit_id=habit_id, name=name, description=description, periodicity=habit_periodicity)
+                habit._days = None
+                habits.append(habit)
+            return habits
 
     def __str__(self):
         return (f"Habit ID: {self.habit_id}\nHabit: {self.name}\n" +
@@ -115,13 +469,30 @@ class Habit:
     # The following are the functions that deal with the analysis of the habit.
 
     def mark_completed(self, date=None):
+        """
+        Marks the habit as completed on a date, now by default.
+
+        The day is found in the sorted day array by binary search, so completing a habit twice
+        on the same day has no effect. Appending the latest day does not move any other day.
+        A history that has not been loaded yet is not loaded for this.
+        """
         if date is None:
-            date = datetime.now()
-            if date not in self.completed_dates:
-                self.completed_dates.append(date)
+            date = clock.now()
+        day = day_and_timestamp(date)[0]
+        if self._days is None:
+            # the history is not loaded, days that are already saved are skipped by the unique constraint
+            if all(day_and_timestamp(completed)[0] != day for completed in self._unsaved_completions):
+                self._unsaved_completions.append(date)
+            return
+        days = self._days
+        position = bisect_left(days, day)
+        if position == len(days) or days[position] != day:
+            days.insert(position, day)
+            self._unsaved_completions.append(date)
 
     # GETS ALL SAVED TRACKING DATA
-    def get_tracking_data(self, habit_id):
+    @instrumented
+    def get_tracking_data(self, habit_id=None):
         """
         Gets the date and time of completion of a specific habit from the tracking table of the database.
 
@@ -135,14 +506,17 @@ class Habit:
         Returns
         -------
         :return:
-        tracking data --> if there is any saved tracking data for a specific habit
+        tracking data --> the completed days as date ordinals in ascending order, if there is any saved
+        tracking data for a specific habit
         None --> if there is no saved tracking data for a specific habit
             """
-        with (sqlite3.connect(self._DB_NAME) as conn):
+        if habit_id is None:
+            habit_id = self.habit_id
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT completed_date FROM tracking WHERE habit_id = ?
-            """, (self.habit_id, ))
+                SELECT completed_day FROM tracking WHERE habit_id = ? ORDER BY completed_day
+            """, (habit_id, ))
             existing_dates = [row[0] for row in cursor.fetchall()]
 
             if len(existing_dates) > 0:
@@ -151,395 +525,299 @@ class Habit:
             else:
                 return None
 
+    # GETS THE WEEKS WITH A COMPLETION
+    @instrumented
+    def get_tracking_weeks(self, habit_id=None):
+        """
+        Gets the ISO weeks in which a habit was completed, see streaks.week_key().
+
+        The weeks are read from the (habit_id, completed_week) index of the tracking table,
+        so every week is returned once however often the habit was completed in it.
+
+        Parameters
+        ----------
+        :param habit_id: int
+            The habit, this habit by default.
+
+        Returns
+        -------
+        :return: list
+            The week keys in ascending order, empty if the habit was never completed.
+        """
+        if habit_id is None:
+            habit_id = self.habit_id
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT completed_week FROM tracking WHERE habit_id = ? ORDER BY completed_week
+            """, (habit_id, ))
+            return [row[0] for row in cursor.fetchall()]
+
     # COMPUTES THE CURRENT STREAK OF A HABIT WITH THE PERIODICITY DAILY
+    @instrumented
     def calculate_current_daily_streak(self, habit_id):
         """
         Computes the current streak of a habit with the periodicity daily.
 
         Function cannot be called directly by the user but is used within other functions.
+        A streak that ended yesterday still counts, because today is not over yet.
 
         Parameters
         ----------
         :param habit_id: the habit id
-            Is assigned by the functions current_streak_habit and current_streak_overview.
+            Is assigned by the menu, see menu.show_current_streak_per_habit.
 
         Returns
         -------
         :return: int
             Returns a number as the streak count (zero to infinite)
-            Gives it to the functions current_streak_habit and current_streak_overview to be displayed to the user.
+            Gives it to the menu to be displayed to the user.
         """
-        existing_dates = self.get_tracking_data(habit_id)
-        if existing_dates is None:
+        existing_days = self.get_tracking_data(habit_id)
+        if existing_days is None:
             return 0
-        ref = datetime.now() - timedelta(days=1)
-        items = []
-        for item in reversed(existing_dates):
-            item = datetime.strptime(item[0], '%Y-%m-%d %H:%M:%S.%f')
-            items.append(item)
-        streak = 1 if datetime.now().date() == items[0].date() else 0
-
-        for item in items[streak:]:
-            if item.date() == ref.date():
-                streak += 1
-                ref -= timedelta(days=1)
-            else:
-                break
-
-        return streak
+        return current_daily_streak(existing_days, clock.today())
 
     # COMPUTES THE CURRENT STREAK OF A HABIT WITH THE PERIODICITY WEEKLY
+    @instrumented
     def calculate_current_weekly_streak(self, habit_id):
         """
         Computes the current streak of a habit with the periodicity weekly.
 
         Function cannot be called directly by the user but is used within other functions.
+        A streak that ended last week still counts, because the current week is not over yet.
 
         Parameters
         ----------
         :param habit_id: int
-            Is assigned by the functions current_streak_habit and current_streak_overview.
+            Is assigned by the menu, see menu.show_current_streak_per_habit.
 
         Returns
         -------
         :return: int
             Returns a number as the streak count (zero to infinite)
-            Gives it to the functions current_streak_habit and current_streak_overview to be displayed to the user.
+            Gives it to the menu to be displayed to the user.
         """
-        existing_dates = self.get_tracking_data(habit_id)
-        if existing_dates is None:
-            return 0
-
-        # saves all dates in a list
-        items = []
-        for item in reversed(existing_dates):
-            x = datetime.strptime(item[0], '%Y-%m-%d %H:%M:%S.%f')
-            items.append(x)
-
-        # finds out which calendar week the stored data corresponds to
-        calendar_weeks = []
-        for n in range(0, len(items)):
-            weeks = items[n].isocalendar()[1]
-            calendar_weeks.append(weeks)
-
-        # deletes all duplicate / same values, so that the calendar week is stored only once
-        adj_calendar_weeks = []
-        x = []
-        for e in calendar_weeks:
-            if e not in x:
-                adj_calendar_weeks.append(e)
-                x.append(e)
-
-        now = datetime.now()
-        now_week = now.isocalendar()[1]
-
-        # computes the streak
-        streak = []
-        if len(adj_calendar_weeks) == 1:
-            if adj_calendar_weeks[0] == now_week:
-                streak.append(1)
-                list_sum = sum(streak)
-                return list_sum
-
-        elif len(adj_calendar_weeks) >= 2 and adj_calendar_weeks[0] == now_week:
-            streak.append(1)
-            for n in range(0, len(adj_calendar_weeks)-1):
-                x = adj_calendar_weeks[n] - adj_calendar_weeks[n + 1]
-                if x == 1:
-                    streak.append(1)
-                else:
-                    break
-            list_sum = sum(streak)
-            return list_sum
-        else:
-            return 0
-
-    # RETURNS THE CURRENT STREAK OF A HABIT.
-    # AUTOMATICALLY FILTERS IF THE HABIT IS A DAILY OR WEEKLY HABIT AND OUTPUTS THE DATA ACCORDINGLY.
-    def current_streak_habit(self):
-        """
-        Returns the current streak of a specific habit.
-
-        User is asked to enter the habit_id of a specific habit.
-        If the habit_id exists, the function gets the periodicity of the habit.
-        If the periodicity is 'Daily' it calls the function calculate_current_daily_streak,
-        otherwise it calls the function calculate_current_weekly_streak.
-        """
-        habit_id = questionary.text("Please enter the ID of the habit for which "
-                                    "you want to see the current streak? ",
-                                    validate=lambda x: True if x.isdigit()
-                                    else "Please enter a correct value.").ask()
-        existing_habit = self.get_by_id(habit_id)
-        periodicity = existing_habit.periodicity
-
-        if existing_habit:
-            if periodicity == "Daily":
-                streak = self.calculate_current_daily_streak(habit_id)
-                if streak is not None:
-                    print(f"The current streak of the habit with the habit_id {habit_id} "
-                          f"is: ", streak, " day(s)")
-                else:
-                    print("This habit does not exist.")
-
-            else:
-                streak = self.calculate_current_weekly_streak(habit_id)
-                if streak is not None:
-                    print(f"The current streak of the habit with the habit_id {habit_id} "
-                          f"is: ", streak, " week(s)")
-                else:
-                    print("This habit does not exist.")
-        else:
-            print("This habit does not exist.")
+        weeks = self.get_tracking_weeks(habit_id)
+        return compute_streaks(weeks, day_key, week_key(clock.today())).current
 
     # Everything that has to do with the longest streak of the habits.
 
     # COMPUTES THE LONGEST STREAK OF A HABIT WITH THE PERIODICITY DAILY
+    @instrumented
     def calculate_longest_daily_streak(self, habit_id):
         """
         Calculates the longest streak of a habit with the periodicity daily.
 
-        Pulls all tracking data for a specific habit from the database, stores and cleans the data in a list.
-        Subtracts the values from each other. The differences are saved in a new list. The streak is calculated
-        if the number is a 1, otherwise the loop breaks, then the maximum streak count is determined.
+        Pulls all tracking data for a specific habit from the database and finds the longest run
+        of consecutive days in one pass.
 
         Parameters
         ----------
         :param habit_id: int
-            Is assigned through the functions longest_streak_habit() and longest_streak_overview()
+            Is assigned through menu.show_longest_streak_per_habit() and longest_streak_overview()
 
         Returns
         -------
         :return: int
-             Returns a number from 0 to infinite (max_value) as the longest streak count.
+             Returns a number from 0 to infinite as the longest streak count.
         """
-        existing_dates = self.get_tracking_data(habit_id)
-        if existing_dates is None:
+        existing_days = self.get_tracking_data(habit_id)
+        if existing_days is None:
             return 0
-
-        items = []
-        for item in reversed(existing_dates):
-            item = datetime.strptime(item[0], '%Y-%m-%d %H:%M:%S.%f')
-            items.append(item)
-
-        # calculates the difference between the values
-        diff = []
-        streak = 1 if datetime.now().date() == items[0].date() else 0
-        diff.append(streak)
-
-        for n in range(0, len(items) - 1):
-            difference = items[n].date() - items[n + 1].date()
-            diff.append(difference.days)
-
-        # cleans up the differences in the list for easier reuse
-        adj_diff = [99]
-        for n in diff:
-            if n == 1:
-                adj_diff.append(1)
-            elif n == 0 and adj_diff[-1] != 0:
-                adj_diff.append(0)
-            elif n != 0:
-                adj_diff.append(99)
-
-        temp_diff = []
-        for i in range(1, len(adj_diff) - 1):
-            if adj_diff[i] == 99 and adj_diff[i + 1] == 1:
-                temp_diff.append(99)
-                temp_diff.append(1)
-            else:
-                temp_diff.append(adj_diff[i])
-
-        final_diff = temp_diff + adj_diff[-1:]
-
-        for i in range(len(final_diff)):
-            if final_diff[i] == 0:
-                final_diff[i] = 1
-
-        # calculates the streak
-        # stores the values in the cache until a 99 appears
-        # then the loop breaks, the values are summed and the max. value is output
-        streak_count = []
-        cache = []
-        for n in final_diff:
-            if n == 1:
-                cache.append(1)
-            else:
-                list_sum = sum(cache)
-                streak_count.append(list_sum)
-                cache.clear()
-                continue
-        list_sum = sum(cache)
-        streak_count.append(list_sum)
-
-        max_value = max(streak_count)
-        return max_value
+        return longest_daily_streak(existing_days)
 
     # COMPUTES THE LONGEST STREAK OF A HABIT WITH THE PERIODICITY WEEKLY
+    @instrumented
     def calculate_longest_weekly_streak(self, habit_id):
         """
         Calculates the longest streak of a habit with the periodicity weekly.
 
-        Pulls all tracking data from the database, stores and cleans the data in a list.
-        Subtracts the values from each other. The differences are saved in a new list.
-        The streak is calculated and the maximum streak count is returned.
+        Pulls all tracking data from the database and finds the longest run of consecutive
+        calendar weeks in one pass. Runs continue across the turn of the year.
 
         Parameters
         ----------
         :param habit_id: int
-            Is assigned through the functions longest_streak_habit() and longest_streak_overview()
+            Is assigned through menu.show_longest_streak_per_habit() and longest_streak_overview()
 
         Returns
         -------
         :return: int
-             Returns a number from 0 to infinite (max_value) as the longest streak count.
+             Returns a number from 0 to infinite as the longest streak count.
         """
-        existing_dates = self.get_tracking_data(habit_id)
-        if existing_dates is None:
-            return 0
+        return compute_streaks(self.get_tracking_weeks(habit_id)).longest
 
-        items = []
-        for item in reversed(existing_dates):
-            item = datetime.strptime(item[0], '%Y-%m-%d %H:%M:%S.%f')
-            items.append(item)
-
-        # finds out which calendar week the stored data corresponds to
-        calendar_weeks = []
-        for n in range(0, len(items)):
-            weeks = items[n].isocalendar()[1]
-            calendar_weeks.append(weeks)
-
-        # deletes all duplicate / same values, so that the calendar week is stored only once
-        adj_calendar_weeks = []
-        x = []
-        for e in calendar_weeks:
-            if e not in x:
-                adj_calendar_weeks.append(e)
-                x.append(e)
-
-        # computes the difference between the calendar weeks
-        diff = [1]
-        for n in range(0, len(adj_calendar_weeks) - 1):
-            x = adj_calendar_weeks[n] - adj_calendar_weeks[n + 1]
-            diff.append(x)
-
-        if len(adj_calendar_weeks) >= 2:
-            if adj_calendar_weeks[-1] != adj_calendar_weeks[-2]:
-                diff.append(1)
-
-            adj_diff = [1]
-            for i in range(1, len(diff) - 1):
-                if diff[i] > 1 and diff[i + 1] == 1:
-                    adj_diff.append(99)
-                    adj_diff.append(1)
-                else:
-                    adj_diff.append(diff[i])
-
-            # calculates the streak
-            # stores the values in the cache until a 99 appears
-            # then the loop breaks, the values are summed and the max. value is output
-            streak_count = []
-            cache = []
-            for n in adj_diff:
-                if n == 1:
-                    cache.append(1)
-                else:
-                    list_sum = sum(cache)
-                    streak_count.append(list_sum)
-                    cache.clear()
-                    continue
-            list_sum = sum(cache)
-            streak_count.append(list_sum)
-
-            max_value = max(streak_count)
-            return max_value
-        else:
-            return 1
+    # COMPUTES THE STREAKS OF A HABIT WITH ANY PERIODICITY
+    @instrumented
+    def calculate_streaks(self, habit_id=None):
+        """
+        Computes the current and the longest streak of a habit from its tracking data.
+
+        Works for every periodicity of streaks.periodicity_for(), e.g. 'Monthly', 'Every 2 days' or
+        '3x per week', where a week only counts once the habit was completed on three of its days.
+
+        Parameters
+        ----------
+        :param habit_id: int
+            The habit, this habit by default.
 
-    # SHOWS THE USER THEIR LONGEST STREAK OF ALL THEIR HABITS SORTED BY PERIODICITY
-    def longest_streak_overview(self):
+        Returns
+        -------
+        :return: Streaks
+            (current, longest) in periods of the habit.
+            Raises ValueError if the habit does not exist or its periodicity is unknown.
+        """
+        if habit_id is None:
+            habit_id = self.habit_id
+        with self._connection() as conn:
+            row = conn.execute("SELECT periodicity FROM habit WHERE id = ?", (habit_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"Habit {habit_id} does not exist")
+        periodicity = periodicity_for(row[0])
+        days = self.get_tracking_data(habit_id) or []
+        return compute_streaks(days, periodicity.key, clock.today(), periodicity.times)
+
+    # RETURNS THE LONGEST STREAK OF ALL HABITS SORTED BY PERIODICITY
+    @classmethod
+    @instrumented
+    def longest_streak_overview(cls):
         """
-        Shows the user their longest streak of all their habits sorted by periodicity.
+        Returns the habit with the longest streak for every periodicity.
 
-        First selects all daily habits from the database, then computes the longest streak from all habits
-        and then prints the longest one to the user.
+        Answered by one query over the habit_stats summary table, whatever the number of habits.
 
-        Then selects all weekly habits from the database, then computes the longest streak from all habits
-        and then prints the longest one to the user.
+        Returns
+        -------
+        :return: dict
+            canonical periodicity ('Daily', '3x per week', ...) --> HabitStreaks(habit_id, name,
+            periodicity, current, longest) of the strongest habit.
+            Periodicities without completed habits are missing.
         """
-        # daily habits
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT name FROM habit WHERE periodicity = 'Daily'
-            """, (self.periodicity,))
-            all_daily_habits = cursor.fetchall()
-            daily_habits = []
-            for habit in all_daily_habits:
-                daily_habits.append(habit)
-
-        streaks = []
-        for habit in daily_habits:
-            longest_daily_habit_streak = self.calculate_longest_daily_streak(habit[0])
-            streaks.append((habit[0], longest_daily_habit_streak))
-
-        max_value = max(streaks, key=lambda e: e[1])
-        print(f"Your longest daily streak among all your daily habits is {max_value[1]} day(s). "
-              f"The habit '{max_value[0]}' is your strongest!")
-
-        # weekly habits
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT name FROM habit WHERE periodicity = 'Weekly'
-            """, (self.periodicity,))
-            all_weekly_habits = cursor.fetchall()
-            weekly_habits = []
-            for habit in all_weekly_habits:
-                weekly_habits.append(habit)
-
-        streaks = []
-        for habit in weekly_habits:
-            longest_weekly_habit_streak = self.calculate_longest_weekly_streak(habit[0])
-            streaks.append((habit[0], longest_weekly_habit_streak))
-
-        max_value = max(streaks, key=lambda e: e[1])
-        print(f"Your longest weekly streak among all your weekly habits is {max_value[1]} weeks(s). "
-              f"You're doing great with habit '{max_value[0]}'!")
+        with cls._connection() as conn:
+            return best_streaks(conn.cursor())
 
-    # The following are the functions that give an overview of all the habits.
+    # COMPUTES THE STREAKS OF ALL HABITS FROM THEIR TRACKING HISTORY
+    @classmethod
+    @instrumented
+    def longest_streaks(cls):
+        """
+        Computes the current and the longest streak of every habit with completions.
 
-    # ASKS THE USER FOR WHICH HABIT THEY WANT TO SEE THE LONGEST STREAK.
-    # THEN SHOWS THE LONGEST STREAK FOR THE CHOSEN HABIT.
-    # AUTOMATICALLY FILTERS IF THE HABIT IS DAILY OR WEEKLY.
-    def longest_streak_habit(self):
-        """
-        Shows the longest streak for a chosen habit.
-
-        User is asked to enter the habit_id of a specific habit.
-        If the habit_id exists, the function gets the periodicity of the habit.
-        If the periodicity is 'Daily' it calls the function calculate_longest_daily_streak,
-        otherwise it calls the function calculate_longest_weekly_streak.
-        """
-        habit_id = questionary.text("Please enter the ID of the habit for which "
-                                    "you want to see the longest streak? ",
-                                    validate=lambda x: True if x.isdigit()
-                                    else "Please enter a correct value.").ask()
-        existing_habit = self.get_by_id(habit_id)
-        periodicity = existing_habit.periodicity
-
-        if existing_habit:
-            if periodicity == "Daily":
-                streak = self.calculate_longest_daily_streak(habit_id)
-                if streak is not None:
-                    print(f"The longest streak of the habit with the habit_id {habit_id} "
-                          "is: ", streak, " day(s)")
-            else:
-                streak = self.calculate_longest_weekly_streak(habit_id)
-                if streak is not None:
-                    print(f"The longest streak of the habit with the habit_id {habit_id} "
-                          "is: ", streak, " week(s)")
+        All tracking rows are read by one ordered query and processed in a single pass,
+        independent of the habit_stats summary table.
 
-        else:
-            print("This habit does not exist.")
+        Returns
+        -------
+        :return: list of HabitStreaks
+            Ordered by habit_id.
+        """
+        with cls._connection() as conn:
+            return list(stream_streaks(conn.cursor(), clock.today()))
+
+    # COUNTS THE COMPLETIONS PER DAY, WEEK OR MONTH, E.G. FOR A CALENDAR HEATMAP
+    @classmethod
+    @instrumented
+    def completions(cls, habit_ids=None, start=None, end=None, bucket="week"):
+        """
+        Counts the completions of habits per day, week or month in a range of days, see history.completions().
+
+        Parameters
+        ----------
+        :param habit_ids: iterable of int
+            All habits by default.
+        :param start: date
+        :param end: date
+            The first and the last day of the range, the first and the last completion by default.
+        :param bucket: str
+            'day', 'week' or 'month'.
+
+        Returns
+        -------
+        :return: dict
+            habit_id --> {first day of the bucket: number of completions}
+        """
+        with cls._connection() as conn:
+            return completions(conn, habit_ids, start, end, bucket)
+
+    # COMPUTES THE STREAKS OF ALL HABITS ON SEVERAL CPU CORES
+    @classmethod
+    @instrumented
+    def streak_report(cls, workers=None, today=None):
+        """
+        Computes the current and the longest streak of every habit with completions in worker processes.
+
+        The habits are split into ranges of habit IDs that are computed in parallel over read-only
+        connections, see report.streak_report(). Only committed completions are seen.
+
+        Parameters
+        ----------
+        :param workers: int
+            The number of worker processes, the number of CPUs by default.
+
+        Returns
+        -------
+        :return: list of HabitStreaks
+            Ordered by habit_id, the same as longest_streaks().
+        """
+        with cls._connection():
+            pass
+        return streak_report(cls._DB_NAME, workers, today)
+
+    # COMPUTES THE STREAKS OF ALL HABITS AT ONCE FOR BULK WORKLOADS
+    @classmethod
+    @instrumented
+    def batch_streaks(cls, today=None, use_numpy=None):
+        """
+        Computes the current and the longest streak of every habit with the batch API of analytics.py.
+
+        Uses NumPy when it is installed and the pure Python streak engine otherwise.
+
+        Returns
+        -------
+        :return: dict
+            habit_id --> Streaks(current, longest)
+        """
+        with cls._connection() as conn:
+            return batch_streaks(conn, today, use_numpy)
+
+    # BULK IMPORT AND EXPORT OF THE HABIT AND TRACKING TABLES
+    @classmethod
+    @instrumented
+    def export_table(cls, table, path, fmt=None):
+        """Writes the 'habit' or 'tracking' table to a CSV or JSON Lines file, see bulk.export_table()."""
+        with cls._connection() as conn:
+            return export_table(conn, table, path, fmt)
+
+    @classmethod
+    @instrumented
+    def export_snapshot(cls, path):
+        """
+        Writes all habits and their completed days to a columnar snapshot file for offline analytics.
+
+        The file is read with snapshot.Snapshot without touching the database, see snapshot.write_snapshot().
+
+        Returns
+        -------
+        :return: tuple
+            (number of habits, number of completions)
+        """
+        with cls._connection() as conn:
+            return write_snapshot(conn, path)
+
+    @classmethod
+    @instrumented
+    def import_table(cls, table, path, fmt=None, chunk_size=10000):
+        """Reads a CSV or JSON Lines file into the 'habit' or 'tracking' table, see bulk.import_table()."""
+        # inside Habit.transaction() the import is committed or rolled back with the rest of the block
+        nested = get_manager(cls._DB_NAME).in_connection()
+        try:
+            with cls._connection() as conn:
+                return import_table(conn, table, path, fmt, chunk_size, nested)
+        finally:
+            habit_cache.clear()
+
+    # The following are the functions that give an overview of all the habits.
 
     # QUERIES THE DB AND RETURNS A LIST OF ALL HABITS TO THE USER.
     def get_habits(self):
@@ -551,9 +829,9 @@ class Habit:
         :return: list
         returns a list of all habits
         """
-        with sqlite3.connect(self._DB_NAME) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""SELECT name FROM habit""", (self.name,))
+            cursor.execute("""SELECT name FROM habit""")
             items = cursor.fetchall()
             habits = []
             for item in items:
@@ -572,17 +850,9 @@ class Habit:
             returns a list of weekly habits
         """
 
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT name FROM habit WHERE periodicity = 'Weekly'
-            """, (self.periodicity,))
-            items = cursor.fetchall()
-            habits = []
-            for item in items:
-                habits.append(item[0])
-            print(habits)
-            return habits
+        habits = [habit.name for habit in self.get_all("Weekly")]
+        print(habits)
+        return habits
 
     # QUERIES THE DB AND RETURNS A LIST OF ALL DAILY HABITS TO THE USER.
     def get_daily_habits(self):
@@ -594,14 +864,6 @@ class Habit:
         :return: list
             returns a list of all daily habits
         """
-        with sqlite3.connect(self._DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT name FROM habit WHERE periodicity = 'Daily'
-            """, (self.periodicity,))
-            items = cursor.fetchall()
-            habits = []
-            for item in items:
-                habits.append(item[0])
-            print(habits)
-            return habits
+        habits = [habit.name for habit in self.get_all("Daily")]
+        print(habits)
+        return habits
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import date
+
+
+# RANGE AGGREGATION OF THE COMPLETION HISTORY
+# Completion counts per habit and day, week or month over any range of days, for calendar heatmaps
+# and dashboards. The counting is done by SQLite over the (habit_id, completed_day) index of the
+# tracking table, so only the non-empty buckets are returned to Python and the memory grows with the
+# number of buckets, not with the number of completions. Whole months are read from the habit_month
+# rollup table, which SQLite triggers keep up to date on every insert into and delete from tracking.
+
+BUCKETS = ("day", "week", "month")
+
+# SQLite has no date functions for day ordinals, but julianday = ordinal + 1721424.5.
+_JULIAN_OFFSET = 1721424.5
+
+# the number of habit IDs per query, well below the SQLite limit of bound parameters
+_CHUNK_SIZE = 500
+
+
+def month_number_sql(column):
+    """Returns the SQL expression of the month number (year * 12 + month - 1) of a day ordinal column."""
+    julian = f"{column} + {_JULIAN_OFFSET}"
+    return (f"(CAST(strftime('%Y', {julian}) AS INTEGER) * 12 "
+            f"+ CAST(strftime('%m', {julian}) AS INTEGER) - 1)")
+
+
+def month_number(day):
+    """Returns the month number (year * 12 + month - 1) of a date."""
+    return day.year * 12 + day.month - 1
+
+
+def _month_start(month):
+    return date(month // 12, month % 12 + 1, 1)
+
+
+_BUCKET_SQL = {
+    "day": "completed_day",
+    "week": "(completed_day - 1) / 7",
+    "month": month_number_sql("completed_day"),
+}
+
+_BUCKET_START = {
+    "day": date.fromordinal,
+    "week": lambda week: date.fromordinal(week * 7 + 1),
+    "month": _month_start,
+}
+
+
+def _habit_filter(habit_ids):
+    """Yields (SQL condition, parameters) per chunk of habit IDs, one condition for all habits."""
+    if habit_ids is None:
+        yield "1", ()
+        return
+    for first in range(0, len(habit_ids), _CHUNK_SIZE):
+        chunk = habit_ids[first:first + _CHUNK_SIZE]
+        yield f"habit_id IN ({', '.join('?' * len(chunk))})", tuple(chunk)
+
+
+def _count_tracking(cursor, habit_ids, bucket, first_day, last_day, result):
+    if first_day > last_day:
+        return
+    for condition, parameters in _habit_filter(habit_ids):
+        cursor.execute(f"""
+            SELECT habit_id, {_BUCKET_SQL[bucket]} AS bucket, COUNT(*) FROM tracking
+            WHERE {condition} AND completed_day BETWEEN ? AND ?
+            GROUP BY habit_id, bucket
+        """, parameters + (first_day, last_day))
+        for habit_id, key, count in cursor:
+            result[habit_id][key] += count
+
+
+def _count_rollup(cursor, habit_ids, first_month, last_month, result):
+    if first_month > last_month:
+        return
+    for condition, parameters in _habit_filter(habit_ids):
+        cursor.execute(f"""
+            SELECT habit_id, month, completions FROM habit_month
+            WHERE {condition} AND month BETWEEN ? AND ?
+        """, parameters + (first_month, last_month))
+        for habit_id, key, count in cursor:
+            result[habit_id][key] += count
+
+
+def completions(conn, habit_ids=None, start=None, end=None, bucket="week", use_rollup=True):
+    """
+    Counts the completions of habits per day, week or month in a range of days.
+
+    Weeks are ISO weeks from Monday to Sunday. Buckets at the edges of the range only count the
+    completions inside the range. Buckets without completions are left out.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param habit_ids: iterable of int
+        The habits to count, all habits by default.
+    :param start: date
+        The first day of the range, the first completion by default.
+    :param end: date
+        The last day of the range (included), the last completion by default.
+    :param bucket: str
+        'day', 'week' or 'month'.
+    :param use_rollup: bool
+        Whether whole months are read from the habit_month rollup table instead of the tracking table.
+
+    Returns
+    -------
+    :return: dict
+        habit_id --> {first day of the bucket: number of completions}, both in ascending order.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket!r}, expected one of {', '.join(BUCKETS)}")
+    if habit_ids is not None:
+        habit_ids = sorted({int(habit_id) for habit_id in habit_ids})
+    cursor = conn.cursor()
+    if start is None or end is None:
+        first_day, last_day = cursor.execute("SELECT MIN(completed_day), MAX(completed_day) FROM tracking").fetchone()
+        if first_day is None:
+            return {}
+        start = start or date.fromordinal(first_day)
+        end = end or date.fromordinal(last_day)
+    first_day, last_day = start.toordinal(), end.toordinal()
+
+    result = defaultdict(lambda: defaultdict(int))
+    if bucket == "month" and use_rollup:
+        # whole months come from the rollup table, the partial months at the edges from the index
+        first_month = month_number(start) if start.day == 1 else month_number(start) + 1
+        last_month = month_number(end) if date.fromordinal(last_day + 1).day == 1 else month_number(end) - 1
+        if first_month <= last_month:
+            _count_rollup(cursor, habit_ids, first_month, last_month, result)
+            _count_tracking(cursor, habit_ids, bucket, first_day, _month_start(first_month).toordinal() - 1, result)
+            after_last = _month_start(last_month + 1).toordinal()
+            _count_tracking(cursor, habit_ids, bucket, after_last, last_day, result)
+        else:
+            _count_tracking(cursor, habit_ids, bucket, first_day, last_day, result)
+    else:
+        _count_tracking(cursor, habit_ids, bucket, first_day, last_day, result)
+
+    # many habits share the same buckets, every bucket date is only built once
+    starts = {}
+    bucket_start = _BUCKET_START[bucket]
+    return {habit_id: {starts.get(key) or starts.setdefault(key, bucket_start(key)): counts[key]
+                       for key in sorted(counts)}
+            for habit_id, counts in sorted(result.items())}
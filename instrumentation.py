@@ -0,0 +1,319 @@
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+# OPT-IN INSTRUMENTATION OF THE HABIT OPERATIONS
+#
+#   import instrumentation
+#   instrumentation.enable()
+#   ...
+#   print(instrumentation.summary_table())
+#
+# Operations are the Habit methods decorated with @instrumented. Per operation the calls, errors,
+# wall time and the SQL statements and rows fetched while it ran are counted (nested operations are
+# included in the numbers of the outer one). Per SQL statement the executions and the rows fetched
+# are counted. Statements are collected with the sqlite3 trace callback, so BEGIN, COMMIT and the
+# PRAGMAs of new connections are included, and grouped by their text with the literal values
+# replaced by ?. Set HABIT_INSTRUMENTATION=1 to enable it when the module is imported.
+#
+# While it is disabled, an instrumented call costs one extra function call and one flag check.
+
+_enabled = False
+_lock = threading.Lock()
+_local = threading.local()
+_operations = {}
+_statements = {}
+_counters = {"connections_opened": 0}
+
+
+def enable():
+    """Starts collecting. The numbers collected so far are kept, see reset()."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Stops collecting. The numbers collected so far are kept."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forgets all collected numbers."""
+    with _lock:
+        _operations.clear()
+        _statements.clear()
+        for name in _counters:
+            _counters[name] = 0
+
+
+@contextmanager
+def profile():
+    """Collects the numbers of the operations inside the block only, from zero."""
+    reset()
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+
+# OPERATIONS
+
+def _active():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def instrumented(function):
+    """Decorator that records the calls of a function as an operation named after its qualified name."""
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return function(*args, **kwargs)
+        stack = _active()
+        frame = [0, 0]  # statements, rows
+        stack.append(frame)
+        error = False
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            stack.pop()
+            with _lock:
+                stats = _operations.get(name)
+                if stats is None:
+                    stats = _operations[name] = {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                 "statements": 0, "rows": 0}
+                stats["calls"] += 1
+                stats["errors"] += error
+                stats["seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                stats["statements"] += frame[0]
+                stats["rows"] += frame[1]
+            # the outer operation includes the numbers of this one
+            if stack:
+                stack[-1][0] += frame[0]
+                stack[-1][1] += frame[1]
+
+    return wrapper
+
+
+# SQL STATEMENTS
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# the trace callback gets the statements with their parameters filled in, None becomes NULL
+_NULL_VALUES = re.compile(r"([(,=]\s*)NULL\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapses the whitespace of a statement and replaces its literal values with ?."""
+    sql = _LITERALS.sub("?", _WHITESPACE.sub(" ", sql).strip())
+    return _NULL_VALUES.sub(r"\1?", sql)
+
+
+def _statement(sql):
+    stats = _statements.get(sql)
+    if stats is None:
+        stats = _statements[sql] = {"executions": 0, "rows": 0}
+    return stats
+
+
+def _trace(sql):
+    if not _enabled:
+        return
+    sql = normalize_sql(sql)
+    with _lock:
+        _statement(sql)["executions"] += 1
+    stack = _active()
+    if stack:
+        stack[-1][0] += 1
+
+
+def _fetched(sql, rows):
+    if not rows:
+        return
+    with _lock:
+        _statement(normalize_sql(sql))["rows"] += rows
+    stack = _active()
+    if stack:
+        stack[-1][1] += rows
+
+
+def record_connection():
+    """Counts a newly opened database connection."""
+    if _enabled:
+        with _lock:
+            _counters["connections_opened"] += 1
+
+
+class CountingCursor(sqlite3.Cursor):
+    """A cursor that counts the rows it fetches. Only used while the instrumentation is enabled."""
+
+    _sql = ""
+
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        self._sql = sql
+        return super().executemany(sql, parameters)
+
+    def fetchone(self):
+        row = super().fetchone()
+        _fetched(self._sql, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _fetched(self._sql, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        _fetched(self._sql, len(rows))
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        _fetched(self._sql, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    The connection class of the connection pool.
+
+    While the instrumentation is enabled it traces the executed statements and hands out
+    CountingCursors, otherwise it behaves like a plain sqlite3.Connection.
+    """
+
+    _traced = False
+
+    def _check_trace(self):
+        self.set_trace_callback(_trace if _enabled else None)
+        self._traced = _enabled
+
+    def cursor(self, factory=None):
+        if self._traced != _enabled:
+            self._check_trace()
+        if _enabled and factory is None:
+            factory = CountingCursor
+        return super().cursor() if factory is None else super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if self._traced != _enabled:
+            self._check_trace()
+        if _enabled:
+            return self.cursor().execute(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        if self._traced != _enabled:
+            self._check_trace()
+        if _enabled:
+            return self.cursor().executemany(sql, parameters)
+        return super().executemany(sql, parameters)
+
+
+# EXPORT
+
+def snapshot():
+    """
+    Returns a copy of all collected numbers.
+
+    Returns
+    -------
+    :return: dict
+        'operations': name --> calls, errors, seconds, max_seconds, statements, rows
+        'statements': normalized SQL --> executions, rows
+        'connections_opened': int
+    """
+    with _lock:
+        return {
+            "enabled": _enabled,
+            "operations": {name: dict(stats) for name, stats in _operations.items()},
+            "statements": {sql: dict(stats) for sql, stats in _statements.items()},
+            **_counters,
+        }
+
+
+def to_json():
+    """Returns the snapshot as JSON text."""
+    return json.dumps(snapshot(), indent=2)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def to_prometheus(prefix="habit"):
+    """Returns the snapshot in the Prometheus text exposition format."""
+    data = snapshot()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(text)}"' for key, text in labels.items())
+            lines.append(f"{prefix}_{name}{{{label_text}}} {value}" if labels else f"{prefix}_{name} {value}")
+
+    operations = sorted(data["operations"].items())
+    for field, name, help_text in (("calls", "operation_calls_total", "Calls of a Habit operation."),
+                                   ("errors", "operation_errors_total", "Calls that raised an exception."),
+                                   ("seconds", "operation_seconds_total", "Wall time spent in an operation."),
+                                   ("statements", "operation_statements_total", "SQL statements run by an operation."),
+                                   ("rows", "operation_rows_total", "Rows fetched by an operation.")):
+        metric(name, "counter", help_text, [({"operation": op}, stats[field]) for op, stats in operations])
+
+    statements = sorted(data["statements"].items())
+    metric("sql_executions_total", "counter", "Executions of a SQL statement.",
+           [({"sql": sql}, stats["executions"]) for sql, stats in statements])
+    metric("sql_rows_total", "counter", "Rows fetched by a SQL statement.",
+           [({"sql": sql}, stats["rows"]) for sql, stats in statements])
+    metric("connections_opened_total", "counter", "Opened database connections.", [({}, data["connections_opened"])])
+    return "\n".join(lines) + "\n"
+
+
+def summary_table(limit=10):
+    """Returns the operations by total time and the most executed SQL statements as a text table."""
+    data = snapshot()
+    lines = [f"{'operation':40} {'calls':>7} {'errors':>6} {'total ms':>10} {'avg ms':>8} {'max ms':>8} "
+             f"{'sql':>7} {'rows':>8}"]
+    for name, stats in sorted(data["operations"].items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(f"{name:40} {stats['calls']:7} {stats['errors']:6} {stats['seconds'] * 1000:10.2f} "
+                     f"{stats['seconds'] * 1000 / stats['calls']:8.3f} {stats['max_seconds'] * 1000:8.3f} "
+                     f"{stats['statements']:7} {stats['rows']:8}")
+    lines.append("")
+    lines.append(f"{'executions':>10} {'rows':>8}  sql")
+    for sql, stats in sorted(data["statements"].items(), key=lambda item: -item[1]["executions"])[:limit]:
+        lines.append(f"{stats['executions']:10} {stats['rows']:8}  {sql[:100]}")
+    lines.append("")
+    lines.append(f"connections opened: {data['connections_opened']}")
+    return "\n".join(lines)
+
+
+if os.environ.get("HABIT_INSTRUMENTATION", "").lower() in ("1", "true", "yes", "on"):
+    enable()
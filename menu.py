@@ -0,0 +1,244 @@
+import questionary
+from database import close_all
+from habit import Habit
+from streaks import periodicity_for, periodicity_name
+
+
+# THE INTERACTIVE MENU OF THE HABIT TRACKING APP.
+# This is the only module that needs questionary. The habit model, the storage and the streak
+# computation can be used without it, see habit.py and cli.py.
+
+
+class MenuState:
+    """
+    State that is kept between the iterations of the menu loop.
+
+    The habit list is loaded once and reused until a handler changes the habits. The database
+    connection stays open in the connection pool for the whole session and is closed when the menu exits.
+    """
+
+    def __init__(self):
+        self._habits = None
+
+    @property
+    def habits(self):
+        if self._habits is None:
+            self._habits = Habit.get_all()
+        return self._habits
+
+    def invalidate(self):
+        """Forgets the cached habit list after habits were created, edited or deleted."""
+        self._habits = None
+
+
+def _valid_periodicity(text):
+    try:
+        periodicity_for(text)
+    except ValueError:
+        return "Please enter a periodicity like `Daily`, `Weekly`, `Monthly`, `Every 2 days` or `3x per week`."
+    return True
+
+
+def _unit(habit):
+    """The unit the streaks of a habit are counted in, e.g. 'week(s)'."""
+    try:
+        return f"{periodicity_for(habit.periodicity).unit}(s)"
+    except ValueError:
+        return "period(s)"
+
+
+def create_habit(state):
+    habit_id = questionary.text("Please enter an ID for your habit:",
+                                validate=lambda x: True if x.isdigit()
+                                else "Please enter a correct value."
+                                ).ask()
+    name = questionary.text("Please enter the habit name:",
+                            validate=lambda text: True if len(text) > 0 and text.isalpha()
+                            else "Please enter a correct value. "
+                            "Your habit name should only contain upper and lowercase letters."
+                            ).ask()
+    description = questionary.text("Please enter the habit description:").ask()
+    periodicity = questionary.text(
+        "How often do you want to do your habit? For example `Daily`, `Weekly`, `Monthly`, "
+        "`Every 2 days` or `3x per week`.",
+        validate=_valid_periodicity,
+    ).ask()
+
+    habit = Habit(habit_id=habit_id, name=name, description=description, periodicity=periodicity)
+    habit.save()
+    state.invalidate()
+    print("Habit saved successfully!")
+
+
+def edit_habit(state):
+    habit_id = questionary.text("Please enter the ID of the habit to edit:",
+                                validate=lambda x: True if x.isdigit()
+                                else "Please enter a correct value.").ask()
+    habit = Habit.get_by_id(habit_id)
+
+    if not habit:
+        print("Habit not found!")
+        return
+
+    habit.name = questionary.text(f"Please enter the new name (current: {habit.name}):").ask()
+    habit.description = questionary.text(f"Please enter the new description (current: {habit.description}):").ask()
+    habit.periodicity = questionary.text(f" Please enter the new periodicity (current: {habit.periodicity}):",
+                                         validate=_valid_periodicity).ask()
+
+    habit.save()
+    state.invalidate()
+    print("Habit updated successfully!")
+
+
+def delete_habit(state):
+    habit_id = questionary.text("Please enter the ID of the habit to delete:",
+                                validate=lambda x: True if x.isdigit()
+                                else "Please enter a correct value.").ask()
+    habit = Habit.get_by_id(habit_id)
+
+    if not habit:
+        print("Habit not found!")
+        return
+
+    confirmation = questionary.confirm(f"Are you sure you want to delete habit ´{habit.name}´?").ask()
+    if confirmation:
+        habit.delete_habit()
+        state.invalidate()
+        print("Habit deleted successfully!")
+
+
+def mark_habit_as_completed(state):
+    habit_id = questionary.text("Please enter the ID of the habit you want to mark as completed:",
+                                validate=lambda x: True if x.isdigit()
+                                else "Please enter a correct value.").ask()
+    habit = Habit.get_by_id(habit_id)
+
+    if not habit:
+        print("Habit not found!")
+        return
+
+    habit.mark_completed()
+    habit.save()
+    print("You completed your habit. Well done!")
+
+
+def show_all_habits(state):
+    print("You currently have these habits saved:")
+    print([habit.name for habit in state.habits])
+
+
+def show_all_weekly_habits(state):
+    print("Your weekly habits are:")
+    print([habit.name for habit in state.habits if periodicity_name(habit.periodicity) == "Weekly"])
+
+
+def show_all_daily_habits(state):
+    print("Your daily habits are:")
+    print([habit.name for habit in state.habits if periodicity_name(habit.periodicity) == "Daily"])
+
+
+def _ask_streak_habit(kind):
+    habit_id = questionary.text(f"Please enter the ID of the habit for which "
+                                f"you want to see the {kind} streak? ",
+                                validate=lambda x: True if x.isdigit()
+                                else "Please enter a correct value.").ask()
+    return habit_id, Habit.get_by_id(habit_id)
+
+
+# RETURNS THE CURRENT STREAK OF A HABIT.
+# THE STREAK IS SHOWN IN THE PERIODS OF THE HABIT (DAYS, WEEKS, MONTHS, ...).
+def show_current_streak_per_habit(state):
+    """
+    Shows the current streak of a specific habit.
+
+    User is asked to enter the habit_id of a specific habit.
+    If the habit_id exists, the streak is read from the habit_stats summary table
+    and shown in days, weeks or months depending on the periodicity of the habit.
+    """
+    habit_id, existing_habit = _ask_streak_habit("current")
+
+    if existing_habit:
+        unit = _unit(existing_habit)
+        streak = Habit.get_streaks(habit_id).current
+        print(f"The current streak of the habit with the habit_id {habit_id} "
+              f"is: ", streak, f" {unit}")
+    else:
+        print("This habit does not exist.")
+
+
+# ASKS THE USER FOR WHICH HABIT THEY WANT TO SEE THE LONGEST STREAK.
+# THEN SHOWS THE LONGEST STREAK FOR THE CHOSEN HABIT.
+# THE STREAK IS SHOWN IN THE PERIODS OF THE HABIT (DAYS, WEEKS, MONTHS, ...).
+def show_longest_streak_per_habit(state):
+    """
+    Shows the longest streak for a chosen habit.
+
+    User is asked to enter the habit_id of a specific habit.
+    If the habit_id exists, the streak is read from the habit_stats summary table
+    and shown in days, weeks or months depending on the periodicity of the habit.
+    """
+    habit_id, existing_habit = _ask_streak_habit("longest")
+
+    if existing_habit:
+        unit = _unit(existing_habit)
+        streak = Habit.get_streaks(habit_id).longest
+        print(f"The longest streak of the habit with the habit_id {habit_id} "
+              "is: ", streak, f" {unit}")
+    else:
+        print("This habit does not exist.")
+
+
+def show_longest_streak_overview(state):
+    overview = Habit.longest_streak_overview()
+    if "Daily" in overview:
+        best = overview["Daily"]
+        print(f"Your longest daily streak among all your daily habits is {best.longest} day(s). "
+              f"The habit '{best.name}' is your strongest!")
+    if "Weekly" in overview:
+        best = overview["Weekly"]
+        print(f"Your longest weekly streak among all your weekly habits is {best.longest} weeks(s). "
+              f"You're doing great with habit '{best.name}'!")
+    for periodicity, best in overview.items():
+        if periodicity not in ("Daily", "Weekly"):
+            print(f"Your longest streak among all your '{periodicity}' habits is {best.longest} "
+                  f"{periodicity_for(periodicity).unit}(s), with habit '{best.name}'.")
+    if not overview:
+        print("There are no completed habits yet.")
+
+
+# MAPS EVERY MENU ENTRY TO ITS HANDLER. THE ORDER IS THE ORDER OF THE MENU.
+COMMANDS = {
+    "Create a new habit": create_habit,
+    "Edit an existing habit": edit_habit,
+    "Delete a habit": delete_habit,
+    "Mark a habit as completed": mark_habit_as_completed,
+    "Show all habits": show_all_habits,
+    "Show all weekly habits": show_all_weekly_habits,
+    "Show all daily habits": show_all_daily_habits,
+    "Show current streak per habit": show_current_streak_per_habit,
+    "Show longest streak per habit": show_longest_streak_per_habit,
+    "Show longest streak overview (by periodicity)": show_longest_streak_overview,
+}
+
+
+def main_menu():
+    """
+    Shows the menu until the user chooses 'Exit'.
+
+    Every handler returns to this loop, so the stack depth stays the same however long the session is.
+    """
+    state = MenuState()
+    try:
+        while True:
+            choice = questionary.select(
+                "What do you want to do?",
+                choices=list(COMMANDS) + ["Exit"]
+            ).ask()
+
+            # None is returned when the user presses Ctrl+C
+            if choice is None or choice == "Exit":
+                break
+            COMMANDS[choice](state)
+    finally:
+        close_all()
+
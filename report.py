@@ -0,0 +1,97 @@
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+import clock
+from stats import stream_streaks
+
+
+# PARALLEL STREAK REPORT
+# The habits are split into ranges of habit IDs. Every range is computed in a worker process that
+# streams only the tracking rows of its habits over its own read-only connection, and the results of
+# the ranges are put back together in habit ID order.
+
+def partition_ranges(conn, partitions):
+    """
+    Splits the habit IDs into ranges with about the same number of habits.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param partitions: int
+
+    Returns
+    -------
+    :return: list of tuple
+        (first_id, last_id) per range in ascending order, both included.
+    """
+    count = conn.execute("SELECT COUNT(*) FROM habit").fetchone()[0]
+    if count == 0:
+        return []
+    partitions = max(1, min(partitions, count))
+    ranges = []
+    first_id = conn.execute("SELECT MIN(id) FROM habit").fetchone()[0]
+    for number in range(1, partitions + 1):
+        offset = count * number // partitions - 1
+        last_id = conn.execute("SELECT id FROM habit ORDER BY id LIMIT 1 OFFSET ?", (offset,)).fetchone()[0]
+        if last_id >= first_id:
+            ranges.append((first_id, last_id))
+            first_id = last_id + 1
+    return ranges
+
+
+def _read_only(db_name):
+    return sqlite3.connect(Path(db_name).resolve().as_uri() + "?mode=ro", uri=True)
+
+
+def partition_streaks(db_name, first_id, last_id, today):
+    """Computes the HabitStreaks of the habits with an ID from first_id to last_id. Runs in a worker process."""
+    conn = _read_only(db_name)
+    try:
+        return list(stream_streaks(conn.cursor(), today, first_id, last_id))
+    finally:
+        conn.close()
+
+
+def streak_report(db_name, workers=None, today=None, partitions_per_worker=4):
+    """
+    Computes the current and the longest streak of every habit with completions on several CPU cores.
+
+    Parameters
+    ----------
+    :param db_name: str
+        Path of the database file, which is only read.
+    :param workers: int
+        The number of worker processes, the number of CPUs by default. With 1 everything runs in this process.
+    :param today: date or int
+        The day the current streaks are computed for, today by default.
+    :param partitions_per_worker: int
+        More ranges than workers even out ranges with more completions than others.
+
+    Returns
+    -------
+    :return: list of HabitStreaks
+        Ordered by habit_id.
+    """
+    if today is None:
+        today = clock.today()
+    if isinstance(today, date):
+        today = today.toordinal()
+    workers = workers or os.cpu_count() or 1
+
+    conn = _read_only(db_name)
+    try:
+        ranges = partition_ranges(conn, workers * partitions_per_worker)
+    finally:
+        conn.close()
+
+    if workers == 1 or len(ranges) <= 1:
+        parts = [partition_streaks(db_name, first_id, last_id, today) for first_id, last_id in ranges]
+    else:
+        # imported here, so that importing habit.py does not load the multiprocessing machinery
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as executor:
+            parts = list(executor.map(partition_streaks, *zip(*[(db_name, first_id, last_id, today)
+                                                                 for first_id, last_id in ranges])))
+    return [streaks for part in parts for streaks in part]
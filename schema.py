@@ -0,0 +1,335 @@
+import re
+import threading
+from datetime import date, datetime
+from itertools import groupby
+import clock
+from instrumentation import instrumented
+
+
+# Every migration only uses the code in its own section, never the functions of the application,
+# so a later change of the application cannot change what a released migration does.
+
+
+# VERSION 1: THE ORIGINAL HABIT AND TRACKING TABLES.
+# "IF NOT EXISTS" lets databases created before the migration layer adopt version 1 as they are.
+def _create_habit_and_tracking(cursor):
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS habit (
+                       id INTEGER PRIMARY KEY,
+                       name TEXT NOT NULL,
+                       description TEXT NOT NULL,
+                       periodicity TEXT NOT NULL
+                       )
+                   """)
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS tracking (
+                   id INTEGER PRIMARY KEY,
+                   habit_id INTEGER,
+                   completed_date DATETIME,
+                   FOREIGN KEY (habit_id) REFERENCES habit(id)
+                   )
+               """)
+
+
+# VERSION 2: TRACKING STORES THE DAY AS AN INTEGER ORDINAL (date.toordinal()) NEXT TO THE OPTIONAL TIMESTAMP.
+# The unique constraint doubles as the (habit_id, completed_day) index used by every per-habit lookup.
+def _tracking_day_ordinals(cursor):
+    cursor.execute("""
+                   CREATE TABLE tracking_v2 (
+                   id INTEGER PRIMARY KEY,
+                   habit_id INTEGER NOT NULL,
+                   completed_day INTEGER NOT NULL,
+                   completed_at TEXT,
+                   FOREIGN KEY (habit_id) REFERENCES habit(id),
+                   UNIQUE (habit_id, completed_day)
+                   )
+               """)
+    # completions of deleted habits were left behind before, they would violate the foreign key
+    cursor.execute("""
+        SELECT habit_id, completed_date FROM tracking
+        WHERE habit_id IN (SELECT id FROM habit) AND completed_date IS NOT NULL ORDER BY id
+    """)
+    # the calendar day of the stored text, whatever the day settings of clock.py are when this runs
+    rows = []
+    for habit_id, completed_date in cursor.fetchall():
+        text = str(completed_date)
+        if len(text) == 10:
+            rows.append((habit_id, date.fromisoformat(text).toordinal(), None))
+        else:
+            completed = datetime.fromisoformat(text)
+            rows.append((habit_id, completed.toordinal(), completed.isoformat(sep=" ")))
+    cursor.executemany("""
+        INSERT OR IGNORE INTO tracking_v2 (habit_id, completed_day, completed_at) VALUES (?, ?, ?)
+    """, rows)
+    cursor.execute("DROP TABLE tracking")
+    cursor.execute("ALTER TABLE tracking_v2 RENAME TO tracking")
+
+
+def parse_completed_date(text):
+    """Parses an ISO date ('2024-12-31') to a date and an ISO timestamp to a datetime."""
+    if len(text) == 10:
+        return date.fromisoformat(text)
+    return datetime.fromisoformat(text)
+
+
+def day_and_timestamp(value):
+    """
+    Converts a completion to the values stored in the tracking table.
+
+    The day of a datetime follows the timezone and the start of the day of clock.py.
+
+    Parameters
+    ----------
+    :param value: date or datetime
+
+    Returns
+    -------
+    :return: tuple
+        (day ordinal, ISO timestamp) for a datetime, (day ordinal, None) for a plain date.
+    """
+    if isinstance(value, datetime):
+        return clock.completion_day(value), value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.toordinal(), None
+    raise TypeError(f"Expected a date or datetime, got {type(value).__name__}")
+
+
+# VERSION 3: ONE SUMMARY ROW PER HABIT WITH ITS STREAKS, KEPT UP TO DATE BY Habit.save_many (see stats.py).
+def _habit_stats(cursor):
+    cursor.execute("""
+                   CREATE TABLE habit_stats (
+                   habit_id INTEGER PRIMARY KEY,
+                   periodicity TEXT NOT NULL,
+                   last_day INTEGER NOT NULL,
+                   current_run INTEGER NOT NULL,
+                   longest_streak INTEGER NOT NULL,
+                   total_completions INTEGER NOT NULL,
+                   FOREIGN KEY (habit_id) REFERENCES habit(id)
+                   )
+               """)
+    # the streaks of the daily and weekly habits, as stats.rebuild_stats() computed them in this version
+    rows = cursor.execute("""
+        SELECT t.habit_id, h.periodicity, t.completed_day
+        FROM tracking t JOIN habit h ON h.id = t.habit_id
+        ORDER BY t.habit_id, t.completed_day
+    """).fetchall()
+    summaries = []
+    for (habit_id, periodicity), group in groupby(rows, key=lambda row: row[:2]):
+        length = {"Daily": 1, "Weekly": 7}.get(str(periodicity).strip().capitalize())
+        if length is None:
+            continue
+        last = None
+        run = longest = total = 0
+        for _, _, day in group:
+            total += 1
+            period = (day - 1) // length
+            if period == last:
+                continue
+            run = run + 1 if last is not None and period == last + 1 else 1
+            last = period
+            longest = max(longest, run)
+        summaries.append((habit_id, periodicity, day, run, longest, total))
+    cursor.executemany("""
+        INSERT INTO habit_stats
+            (habit_id, periodicity, last_day, current_run, longest_streak, total_completions)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, summaries)
+
+
+# VERSION 4: COMPLETIONS PER HABIT AND MONTH FOR THE RANGE AGGREGATION OF history.py.
+# Triggers keep the rollup in step with every insert into and delete from tracking, whichever code
+# path writes it. Completions skipped by INSERT OR IGNORE fire no trigger. A migration that rebuilds
+# the tracking table has to create the triggers again.
+def _month_sql(column):
+    # julianday = day ordinal + 1721424.5
+    return (f"(CAST(strftime('%Y', {column} + 1721424.5) AS INTEGER) * 12 "
+            f"+ CAST(strftime('%m', {column} + 1721424.5) AS INTEGER) - 1)")
+
+
+def _habit_month(cursor):
+    month = _month_sql("NEW.completed_day")
+    cursor.execute("""
+                   CREATE TABLE habit_month (
+                   habit_id INTEGER NOT NULL,
+                   month INTEGER NOT NULL,
+                   completions INTEGER NOT NULL,
+                   PRIMARY KEY (habit_id, month)
+                   ) WITHOUT ROWID
+               """)
+    cursor.execute(f"""
+        INSERT INTO habit_month (habit_id, month, completions)
+        SELECT habit_id, {_month_sql("completed_day")} AS month, COUNT(*) FROM tracking GROUP BY habit_id, month
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER tracking_month_insert AFTER INSERT ON tracking BEGIN
+            INSERT INTO habit_month (habit_id, month, completions) VALUES (NEW.habit_id, {month}, 1)
+            ON CONFLICT (habit_id, month) DO UPDATE SET completions = completions + 1;
+        END
+    """)
+    month = _month_sql("OLD.completed_day")
+    cursor.execute(f"""
+        CREATE TRIGGER tracking_month_delete AFTER DELETE ON tracking BEGIN
+            UPDATE habit_month SET completions = completions - 1 WHERE habit_id = OLD.habit_id AND month = {month};
+            DELETE FROM habit_month WHERE habit_id = OLD.habit_id AND month = {month} AND completions <= 0;
+        END
+    """)
+
+
+# VERSION 5: THE ISO WEEK OF EVERY COMPLETION NEXT TO ITS DAY.
+# A generated column, so every code path that inserts completions fills it in. Its values are stored
+# in the (habit_id, completed_week) index, which answers the weekly lookups of a habit on its own.
+def _tracking_weeks(cursor):
+    cursor.execute("""
+        ALTER TABLE tracking ADD COLUMN completed_week INTEGER
+        GENERATED ALWAYS AS ((completed_day - 1) / 7) VIRTUAL
+    """)
+    cursor.execute("CREATE INDEX tracking_habit_week ON tracking (habit_id, completed_week)")
+
+
+# VERSION 6: THE STREAK STATE OF PERIODICITIES LIKE '3x per week' (see streaks.periodicity_for).
+# A period only counts once it has enough completed days, so the summary row also keeps the number of
+# completed days in the latest period and the latest period that counted.
+_EVERY_V6 = re.compile(r"every (\d+) days?")
+_TIMES_V6 = re.compile(r"(\d+) ?(?:x|times) (?:per|a) (week|month)")
+
+
+def _month_of_day(day):
+    day = date.fromordinal(day)
+    return day.year * 12 + day.month - 1
+
+
+_DAILY_V6 = ("Daily", lambda day: day, 1)
+_WEEKLY_V6 = ("Weekly", lambda day: (day - 1) // 7, 1)
+_MONTHLY_V6 = ("Monthly", _month_of_day, 1)
+
+
+def _periodicity_v6(text):
+    """(canonical name, period key, completed days per period) of a periodicity in this version, None if unknown."""
+    text = " ".join(str(text).lower().split())
+    fixed = {"daily": _DAILY_V6, "every day": _DAILY_V6, "weekly": _WEEKLY_V6, "monthly": _MONTHLY_V6}
+    if text in fixed:
+        return fixed[text]
+    match = _EVERY_V6.fullmatch(text)
+    if match and int(match[1]) >= 1:
+        length = int(match[1])
+        return _DAILY_V6 if length == 1 else (f"Every {length} days", lambda day: (day - 1) // length, 1)
+    match = _TIMES_V6.fullmatch(text)
+    if match and 1 <= int(match[1]) <= {"week": 7, "month": 28}[match[2]]:
+        times, base = int(match[1]), _WEEKLY_V6 if match[2] == "week" else _MONTHLY_V6
+        return base if times == 1 else (f"{times}x per {match[2]}", base[1], times)
+    return None
+
+
+def _streak_state(cursor):
+    cursor.execute("ALTER TABLE habit_stats ADD COLUMN period_days INTEGER NOT NULL DEFAULT 0")
+    cursor.execute("ALTER TABLE habit_stats ADD COLUMN last_period INTEGER")
+    # the summaries of all habits, as stats.rebuild_stats() computes them in this version
+    cursor.execute("DELETE FROM habit_stats")
+    rows = cursor.execute("""
+        SELECT t.habit_id, h.periodicity, t.completed_day
+        FROM tracking t JOIN habit h ON h.id = t.habit_id
+        ORDER BY t.habit_id, t.completed_day
+    """).fetchall()
+    summaries = []
+    for (habit_id, periodicity), group in groupby(rows, key=lambda row: row[:2]):
+        periodicity = _periodicity_v6(periodicity)
+        if periodicity is None:
+            continue
+        name, key, times = periodicity
+        period = last_period = None
+        period_days = run = longest = total = 0
+        for _, _, day in group:
+            total += 1
+            if key(day) == period:
+                period_days += 1
+            else:
+                period, period_days = key(day), 1
+            if period_days != times:
+                continue
+            run = run + 1 if last_period is not None and period == last_period + 1 else 1
+            last_period = period
+            longest = max(longest, run)
+        summaries.append((habit_id, name, day, period_days, last_period, run, longest, total))
+    cursor.executemany("""
+        INSERT INTO habit_stats
+            (habit_id, periodicity, last_day, period_days, last_period, current_run, longest_streak, total_completions)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, summaries)
+
+
+# Ordered list of (version, description, function). New migrations are appended at the end
+# and must never be changed once released.
+MIGRATIONS = [
+    (1, "create habit and tracking tables", _create_habit_and_tracking),
+    (2, "store tracking days as indexed ordinals", _tracking_day_ordinals),
+    (3, "add habit_stats summary table", _habit_stats),
+    (4, "add habit_month rollup table", _habit_month),
+    (5, "index the ISO week of the completions", _tracking_weeks),
+    (6, "add the streak state of all periodicities to habit_stats", _streak_state),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+_lock = threading.Lock()
+
+
+def current_version(conn):
+    """Returns the schema version of a database, 0 if it has never been migrated."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+            )
+    """)
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    version = cursor.fetchone()[0]
+    return version or 0
+
+
+@instrumented
+def migrate(conn):
+    """
+    Applies all pending migrations to a database in one transaction.
+
+    The write lock is taken before the version is read, so several processes starting
+    at the same time cannot apply the same migration twice.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+
+    Returns
+    -------
+    :return: int
+        The schema version of the database after the migration.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    version = current_version(conn)
+    cursor = conn.cursor()
+    for number, description, apply in MIGRATIONS:
+        if number > version:
+            apply(cursor)
+            cursor.execute("""
+                INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)
+            """, (number, description, datetime.now().isoformat()))
+            version = number
+    return version
+
+
+def ensure_schema(manager):
+    """
+    Migrates the database of a ConnectionManager the first time it is used in this process.
+
+    Later calls only check a flag on the manager, so they do not touch the database at all.
+    """
+    if manager.schema_ready:
+        return
+    with _lock:
+        if manager.schema_ready:
+            return
+        with manager.connection() as conn:
+            migrate(conn)
+        manager.schema_ready = True
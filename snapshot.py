@@ -0,0 +1,295 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date
+import clock
+from analytics import numpy_module
+from streaks import Streaks, compute_streaks, periodicity_for
+
+
+# COLUMNAR SNAPSHOT FILES FOR READ-ONLY ANALYTICS
+# A snapshot is a copy of the habits and their completed days in one file with a fixed binary layout,
+# so reports can run without touching the live database. The reader maps the file into memory:
+# opening it only reads the header, and the completed days of a habit are a zero-copy memoryview
+# into the mapped file.
+#
+# Layout, all numbers little-endian, every column starts at a multiple of 8 bytes:
+#
+#   header        magic b"HABITSNP", version u32, reserved u32,
+#                 habit count n u64, completion count m u64, names length u64
+#   habit_ids     n x int64, ascending
+#   offsets       (n + 1) x int64, the days of habit i are days[offsets[i]:offsets[i + 1]]
+#   periodicity   n x int32, the index in the list of periodicities (-1 for an unknown periodicity)
+#   padding       to the next multiple of 8 bytes
+#   days          m x int32, the day ordinals, ascending per habit
+#   names         UTF-8 JSON object: 'names', the name of every habit, and 'periodicities', the canonical
+#                 names of the periodicities in the file (see streaks.periodicity_for)
+
+MAGIC = b"HABITSNP"
+VERSION = 2
+
+_HEADER = struct.Struct("<8sIIQQQ")
+_CHUNK_SIZE = 65536
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _pad(position):
+    return -position % 8
+
+
+def write_snapshot(conn, path):
+    """
+    Writes all habits and their completed days to a snapshot file.
+
+    The habits and completions are read in one read transaction, so the snapshot is consistent.
+    The days are streamed into the file in chunks, and the file is written under a temporary name
+    and renamed when it is complete.
+
+    Parameters
+    ----------
+    :param conn: sqlite3.Connection
+    :param path: str
+
+    Returns
+    -------
+    :return: tuple
+        (number of habits, number of completions)
+    """
+    started = not conn.in_transaction
+    if started:
+        conn.execute("BEGIN")
+    try:
+        habits = conn.execute("""
+            SELECT h.id, h.name, h.periodicity, COUNT(t.habit_id) FROM habit h
+            LEFT JOIN tracking t ON t.habit_id = h.id
+            GROUP BY h.id ORDER BY h.id
+        """).fetchall()
+        offsets = array("q", [0])
+        for row in habits:
+            offsets.append(offsets[-1] + row[3])
+        codes = {}
+        periodicities = array("i", [_code(codes, row[2]) for row in habits])
+        names = json.dumps({"names": [row[1] for row in habits], "periodicities": list(codes)},
+                           ensure_ascii=False).encode("utf-8")
+        completions = offsets[-1]
+
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, VERSION, 0, len(habits), completions, len(names)))
+            _little_endian(array("q", [row[0] for row in habits])).tofile(file)
+            _little_endian(offsets).tofile(file)
+            _little_endian(periodicities).tofile(file)
+            file.write(b"\0" * _pad(file.tell()))
+            cursor = conn.execute("""
+                SELECT t.completed_day FROM habit h JOIN tracking t ON t.habit_id = h.id
+                ORDER BY h.id, t.completed_day
+            """)
+            while True:
+                rows = cursor.fetchmany(_CHUNK_SIZE)
+                if not rows:
+                    break
+                _little_endian(array("i", [row[0] for row in rows])).tofile(file)
+            file.write(names)
+        os.replace(temporary, path)
+    finally:
+        if started:
+            conn.rollback()
+    return len(habits), completions
+
+
+def _code(codes, text):
+    """Returns the index of a periodicity in the list of periodicities of the file, -1 if it is unknown."""
+    try:
+        name = periodicity_for(text).name
+    except ValueError:
+        return -1
+    return codes.setdefault(name, len(codes))
+
+
+def _numpy_streaks(np, days, length, today):
+    """
+    The streaks of one habit from a view of its days, computed by NumPy without copying the view.
+    Only for periodicities with periods of `length` days and one completion per period.
+    """
+    periods = np.frombuffer(days, dtype=np.int32)
+    if length > 1:
+        periods = (periods - 1) // length
+    # several completions in the same period count once
+    periods = periods[np.r_[True, periods[1:] != periods[:-1]]]
+    run_starts = np.r_[0, np.flatnonzero(np.diff(periods) != 1) + 1]
+    run_lengths = np.diff(np.r_[run_starts, len(periods)])
+    today_period = today if length == 1 else (today - 1) // length
+    current = int(run_lengths[-1]) if 0 <= today_period - int(periods[-1]) <= 1 else 0
+    return Streaks(current, int(run_lengths.max()))
+
+
+class Snapshot:
+    """
+    A snapshot file mapped into memory, see write_snapshot().
+
+        with Snapshot("habits.snapshot") as snapshot:
+            for habit_id, periodicity, days in snapshot:
+                ...
+
+    The completed days of a habit are an int32 memoryview into the mapped file that is valid until
+    the snapshot is closed. Nothing is copied when the file is opened or a habit is looked up.
+
+    Parameters
+    ----------
+    :param path: str
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self):
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{self.path} is not a habit snapshot")
+        magic, version, _, habits, completions, names = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a habit snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} in {self.path}")
+
+        ids_start = _HEADER.size
+        offsets_start = ids_start + 8 * habits
+        periodicities_start = offsets_start + 8 * (habits + 1)
+        days_start = periodicities_start + 4 * habits
+        days_start += _pad(days_start)
+        self._names_start = days_start + 4 * completions
+        if len(self._map) != self._names_start + names:
+            raise ValueError(f"{self.path} is truncated or damaged")
+        if sys.byteorder == "big":
+            raise ValueError("Snapshots can only be mapped on little-endian machines")
+
+        view = memoryview(self._map)
+        self._views = [view]
+        self.habit_ids = self._column(view, ids_start, offsets_start, "q")
+        self._offsets = self._column(view, offsets_start, periodicities_start, "q")
+        self._periodicities = self._column(view, periodicities_start, periodicities_start + 4 * habits, "i")
+        self._days = self._column(view, days_start, self._names_start, "i")
+        self._names = self._periodicity_names = None
+
+    def _column(self, view, start, end, fmt):
+        column = view[start:end].cast(fmt)
+        self._views.append(column)
+        return column
+
+    def __len__(self):
+        return len(self.habit_ids)
+
+    @property
+    def completions(self):
+        """The number of completions of all habits."""
+        return len(self._days)
+
+    def _index(self, habit_id):
+        index = bisect_left(self.habit_ids, habit_id)
+        if index == len(self.habit_ids) or self.habit_ids[index] != habit_id:
+            raise KeyError(habit_id)
+        return index
+
+    def days(self, habit_id):
+        """Returns the completed days of a habit as a zero-copy int32 memoryview, ascending. KeyError if unknown."""
+        index = self._index(habit_id)
+        return self._days[self._offsets[index]:self._offsets[index + 1]]
+
+    def _load_names(self):
+        if self._names is None:
+            names = json.loads(bytes(self._map[self._names_start:]).decode("utf-8"))
+            self._names, self._periodicity_names = names["names"], names["periodicities"]
+
+    def _periodicity(self, code):
+        if code < 0:
+            return None
+        self._load_names()
+        return self._periodicity_names[code]
+
+    def periodicity(self, habit_id):
+        """Returns the canonical name of the periodicity, e.g. 'Daily', or None for an unknown periodicity."""
+        return self._periodicity(self._periodicities[self._index(habit_id)])
+
+    def name(self, habit_id):
+        """Returns the name of a habit. The names are only decoded on the first call."""
+        self._load_names()
+        return self._names[self._index(habit_id)]
+
+    def __iter__(self):
+        """Yields (habit_id, periodicity, days) for every habit in ascending habit_id order."""
+        offsets, codes = self._offsets, self._periodicities
+        for index, habit_id in enumerate(self.habit_ids):
+            yield habit_id, self._periodicity(codes[index]), self._days[offsets[index]:offsets[index + 1]]
+
+    def streaks(self, today=None, use_numpy=None):
+        """
+        Computes the current and the longest streak of every habit with completions.
+
+        The days are read straight from the mapped file one habit at a time, so the memory use
+        depends on the largest history of a habit, not on the size of the snapshot. Habits with an
+        unknown periodicity are left out, like in analytics.batch_streaks().
+
+        Parameters
+        ----------
+        :param today: date or int
+            The day the current streaks are computed for, today by default.
+        :param use_numpy: bool
+            True forces, False disables NumPy. By default NumPy is used when it is installed.
+
+        Returns
+        -------
+        :return: dict
+            habit_id --> Streaks(current, longest)
+        """
+        if today is None:
+            today = clock.today()
+        if isinstance(today, date):
+            today = today.toordinal()
+        np = numpy_module() if use_numpy or use_numpy is None else None
+        if use_numpy and np is None:
+            raise ImportError("NumPy is not installed")
+        result = {}
+        for habit_id, periodicity, days in self:
+            if periodicity is None or not len(days):
+                continue
+            periodicity = periodicity_for(periodicity)
+            if np is None or not periodicity.length or periodicity.times != 1:
+                result[habit_id] = compute_streaks(days, periodicity.key, today, periodicity.times)
+            else:
+                result[habit_id] = _numpy_streaks(np, days, periodicity.length, today)
+        return result
+
+    def close(self):
+        """
+        Unmaps the file. Day views that are still referenced elsewhere keep the mapping alive
+        until they are released.
+        """
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        try:
+            self._map.close()
+        except BufferError:
+            # a caller still holds a slice, the mapping is closed when it is garbage collected
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
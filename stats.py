@@ -0,0 +1,235 @@
+import sqlite3
+import sys
+from collections import namedtuple
+from itertools import groupby
+from streaks import EMPTY_STATE, StreakState, Streaks, compute_streaks, current_run, extend_streaks, periodicity_for
+
+
+HabitStreaks = namedtuple("HabitStreaks", ["habit_id", "name", "periodicity", "current", "longest"])
+
+
+# The habit_stats table holds one summary row per habit, the StreakState of its history (see streaks.py):
+#   last_day           the latest completed day (day ordinal)
+#   period_days        the number of completed days in the period of last_day
+#   last_period        the latest period with enough completed days
+#   current_run        the number of consecutive periods that end with last_period
+#   longest_streak     the longest run of consecutive periods
+#   total_completions  the number of tracking rows
+#   periodicity        the canonical name of the periodicity the row was computed for
+# Appending completions after last_day updates the row in O(1) per completion. Anything else
+# (completions before last_day, a changed periodicity) rebuilds the row of that habit from its
+# tracking history. Habits with an unknown periodicity have no row.
+
+def _periodicity(text):
+    try:
+        return periodicity_for(text)
+    except ValueError:
+        return None
+
+
+def _stats_row(habit_id, periodicity, state, total):
+    return (habit_id, periodicity.name, state.last_day, state.period_days, state.last_period,
+            state.run, state.longest, total)
+
+
+_INSERT_STATS = """
+    INSERT OR REPLACE INTO habit_stats
+        (habit_id, periodicity, last_day, period_days, last_period, current_run, longest_streak, total_completions)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def rebuild_habit_stats(cursor, habit_id, periodicity):
+    """Recomputes the summary row of one habit from its whole tracking history."""
+    periodicity = _periodicity(periodicity)
+    if periodicity is None:
+        cursor.execute("DELETE FROM habit_stats WHERE habit_id = ?", (habit_id,))
+        return
+    cursor.execute("""
+        SELECT completed_day FROM tracking WHERE habit_id = ? ORDER BY completed_day
+    """, (habit_id,))
+    days = [row[0] for row in cursor.fetchall()]
+    if not days:
+        cursor.execute("DELETE FROM habit_stats WHERE habit_id = ?", (habit_id,))
+        return
+    state = extend_streaks(EMPTY_STATE, days, periodicity.key, periodicity.times)
+    cursor.execute(_INSERT_STATS, _stats_row(habit_id, periodicity, state, len(days)))
+
+
+def stream_streaks(cursor, today=None, first_id=None, last_id=None):
+    """
+    Computes the streaks of all habits with completions from one ordered query over the tracking table.
+
+    The rows are consumed while the cursor streams them, grouped by habit, so only the state of the
+    current habit is kept in memory. Habits with an unknown periodicity are skipped.
+
+    Parameters
+    ----------
+    :param cursor: sqlite3.Cursor
+    :param today: int
+        The day ordinal of today, used for the current streak.
+    :param first_id: int
+    :param last_id: int
+        Only the habits with an ID in this range (both included) are computed.
+
+    Returns
+    -------
+    :return: generator of HabitStreaks
+        One entry per habit, ordered by habit_id.
+    """
+    rows = cursor.execute("""
+        SELECT t.habit_id, h.name, h.periodicity, t.completed_day
+        FROM tracking t JOIN habit h ON h.id = t.habit_id
+        WHERE t.habit_id BETWEEN ? AND ?
+        ORDER BY t.habit_id, t.completed_day
+    """, (-2 ** 63 if first_id is None else first_id, 2 ** 63 - 1 if last_id is None else last_id))
+    for (habit_id, name, text), group in groupby(rows, key=lambda row: row[:3]):
+        periodicity = _periodicity(text)
+        if periodicity is None:
+            continue
+        current, longest = compute_streaks((row[3] for row in group), periodicity.key, today, periodicity.times)
+        yield HabitStreaks(habit_id, name, text, current, longest)
+
+
+def rebuild_stats(cursor):
+    """
+    Recomputes the summary rows of all habits in one pass over the tracking table.
+
+    This is the repair command for the habit_stats table, for example after the tracking
+    table has been edited by hand.
+    """
+    cursor.execute("DELETE FROM habit_stats")
+    rows = cursor.execute("""
+        SELECT t.habit_id, h.periodicity, t.completed_day
+        FROM tracking t JOIN habit h ON h.id = t.habit_id
+        ORDER BY t.habit_id, t.completed_day
+    """)
+    summaries = []
+    for (habit_id, text), group in groupby(rows, key=lambda row: row[:2]):
+        periodicity = _periodicity(text)
+        if periodicity is None:
+            continue
+        days = [row[2] for row in group]
+        state = extend_streaks(EMPTY_STATE, days, periodicity.key, periodicity.times)
+        summaries.append(_stats_row(habit_id, periodicity, state, len(days)))
+    cursor.executemany(_INSERT_STATS, summaries)
+
+
+def update_stats(cursor, habit_id, periodicity, days):
+    """
+    Updates the summary row of a habit after new completions have been inserted.
+
+    Parameters
+    ----------
+    :param cursor: sqlite3.Cursor
+    :param habit_id: int
+    :param periodicity: str
+    :param days: iterable of int
+        The day ordinals of the completions that were just saved.
+    """
+    days = sorted(set(days))
+    parsed = _periodicity(periodicity)
+    cursor.execute("""
+        SELECT periodicity, last_day, period_days, last_period, current_run, longest_streak, total_completions
+        FROM habit_stats WHERE habit_id = ?
+    """, (habit_id,))
+    row = cursor.fetchone()
+    if row is None or parsed is None or row[0] != parsed.name:
+        # no summary yet or the periodicity changed
+        rebuild_habit_stats(cursor, habit_id, periodicity)
+        return
+    if not days:
+        return
+    state, total = StreakState(*row[1:6]), row[6]
+    if days[0] < state.last_day:
+        # a completion was added before the latest one, the runs have to be recomputed
+        rebuild_habit_stats(cursor, habit_id, periodicity)
+        return
+    # days up to last_day are already stored and were ignored by the unique constraint
+    total += sum(1 for day in days if day > state.last_day)
+    state = extend_streaks(state, days, parsed.key, parsed.times)
+    cursor.execute(_INSERT_STATS, _stats_row(habit_id, parsed, state, total))
+
+
+def _current(periodicity, last_period, run, today):
+    key = periodicity_for(periodicity).key
+    return current_run(StreakState(None, 0, last_period, run, 0), key, today)
+
+
+def read_streaks(cursor, habit_id, today):
+    """
+    Returns the current and longest streak of a habit from its summary row in O(1).
+
+    Parameters
+    ----------
+    :param cursor: sqlite3.Cursor
+    :param habit_id: int
+    :param today: int
+        The day ordinal of today.
+
+    Returns
+    -------
+    :return: Streaks
+        (0, 0) if the habit has no completions.
+    """
+    cursor.execute("""
+        SELECT periodicity, last_period, current_run, longest_streak FROM habit_stats WHERE habit_id = ?
+    """, (habit_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return Streaks(0, 0)
+    periodicity, last_period, run, longest = row
+    return Streaks(_current(periodicity, last_period, run, today), longest)
+
+
+def read_all_streaks(cursor, today):
+    """
+    Returns the current and longest streak of every habit from habit_stats with one query.
+
+    Returns
+    -------
+    :return: list of HabitStreaks
+        One entry per habit ordered by habit_id, habits without completions have (0, 0).
+    """
+    cursor.execute("""
+        SELECT h.id, h.name, h.periodicity, s.periodicity, s.last_period, s.current_run, s.longest_streak
+        FROM habit h LEFT JOIN habit_stats s ON s.habit_id = h.id ORDER BY h.id
+    """)
+    result = []
+    for habit_id, name, periodicity, stats_periodicity, last_period, run, longest in cursor.fetchall():
+        if stats_periodicity is None:
+            result.append(HabitStreaks(habit_id, name, periodicity, 0, 0))
+            continue
+        current = _current(stats_periodicity, last_period, run, today)
+        result.append(HabitStreaks(habit_id, name, periodicity, current, longest))
+    return result
+
+
+def best_streaks(cursor):
+    """
+    Finds the habit with the longest streak for every periodicity with one query over habit_stats.
+
+    Returns
+    -------
+    :return: dict
+        canonical periodicity name --> HabitStreaks of the strongest habit (ties go to the lower habit_id).
+        The current streak is not part of the overview and is None.
+    """
+    cursor.execute("""
+        SELECT habit_id, name, periodicity, longest_streak FROM (
+            SELECT h.id AS habit_id, h.name, s.periodicity, s.longest_streak,
+                   ROW_NUMBER() OVER (PARTITION BY s.periodicity ORDER BY s.longest_streak DESC, h.id) AS position
+            FROM habit h JOIN habit_stats s ON s.habit_id = h.id
+        ) WHERE position = 1
+    """)
+    return {periodicity: HabitStreaks(habit_id, name, periodicity, None, longest)
+            for habit_id, name, periodicity, longest in cursor.fetchall()}
+
+
+# REBUILDS THE SUMMARY TABLE OF A DATABASE: python stats.py [habits.db]
+if __name__ == "__main__":
+    from schema import migrate
+    with sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else "habits.db") as conn:
+        migrate(conn)
+        rebuild_stats(conn.cursor())
+    print("Habit statistics rebuilt.")
@@ -0,0 +1,276 @@
+import re
+from collections import namedtuple
+from datetime import date, datetime
+from functools import lru_cache
+import clock
+
+
+Streaks = namedtuple("Streaks", ["current", "longest"])
+
+
+# PERIOD KEYS
+# A period key maps a day ordinal (date.toordinal()) to a running period number, so that two periods
+# are consecutive exactly when their keys differ by one, also across the turn of the year.
+
+def day_key(day):
+    """The period key of a daily habit is the day ordinal itself."""
+    return day
+
+
+def week_key(day):
+    """
+    The period key of a weekly habit is the number of the ISO week (Monday to Sunday) counted from 0001-01-01.
+
+    date.fromordinal(1) is a Monday, so unlike isocalendar()[1] the key does not wrap at New Year.
+    """
+    return (day - 1) // 7
+
+
+def month_key(day):
+    """The period key of a monthly habit is the number of the calendar month (year * 12 + month - 1)."""
+    day = date.fromordinal(day)
+    return day.year * 12 + day.month - 1
+
+
+def days_key(length):
+    """
+    Returns the period key of a habit that is due every `length` days.
+
+    The periods are counted from 0001-01-01, so every habit with the same length has the same periods,
+    and days_key(7) gives the same periods as week_key.
+    """
+    def key(day):
+        return (day - 1) // length
+    return key
+
+
+# PERIODICITIES
+# A periodicity is a period key and the number of days with a completion a period needs to count
+# for a streak, so '3x per week' is week_key with times=3. Periods of a fixed number of days also
+# have a length, which lets the NumPy implementations compute their keys for whole arrays at once.
+# Everything that computes streaks gets its periodicity from periodicity_for(), so a new periodicity
+# only needs a new line in the parser.
+
+Periodicity = namedtuple("Periodicity", ["name", "key", "times", "length", "unit"])
+
+DAILY = Periodicity("Daily", day_key, 1, 1, "day")
+WEEKLY = Periodicity("Weekly", week_key, 1, 7, "week")
+MONTHLY = Periodicity("Monthly", month_key, 1, None, "month")
+
+_EVERY = re.compile(r"every (\d+) days?")
+_TIMES = re.compile(r"(\d+) ?(?:x|times) (?:per|a) (week|month)")
+_MAX_TIMES = {"week": 7, "month": 28}
+
+
+@lru_cache(maxsize=256)
+def periodicity_for(text):
+    """
+    Parses the periodicity of a habit, the case and extra spaces are ignored.
+
+    'Daily', 'Weekly' and 'Monthly', 'Every N days', and 'Nx per week' or 'N times per month' for
+    habits that have to be completed on N different days of every week or month.
+
+    Returns
+    -------
+    :return: Periodicity
+        With the canonical name, e.g. '3x per week' for '3 times a week'.
+    """
+    normalized = " ".join(str(text).lower().split())
+    if normalized in ("daily", "every day"):
+        return DAILY
+    if normalized == "weekly":
+        return WEEKLY
+    if normalized == "monthly":
+        return MONTHLY
+    match = _EVERY.fullmatch(normalized)
+    if match and int(match[1]) >= 1:
+        length = int(match[1])
+        if length == 1:
+            return DAILY
+        return Periodicity(f"Every {length} days", days_key(length), 1, length, f"{length}-day period")
+    match = _TIMES.fullmatch(normalized)
+    if match and 1 <= int(match[1]) <= _MAX_TIMES[match[2]]:
+        times, base = int(match[1]), WEEKLY if match[2] == "week" else MONTHLY
+        if times == 1:
+            return base
+        return base._replace(name=f"{times}x per {match[2]}", times=times)
+    raise ValueError(f"Unknown periodicity: {text!r}, expected e.g. 'Daily', 'Weekly', 'Monthly', "
+                     f"'Every 2 days' or '3x per week'")
+
+
+def periodicity_name(text):
+    """
+    Returns the canonical name of a periodicity, e.g. 'Weekly' for 'weekly' or '3x per week' for
+    '3 times a week'. Text that is no periodicity of periodicity_for() is returned unchanged.
+    """
+    try:
+        return periodicity_for(text).name
+    except ValueError:
+        return text
+
+
+def period_key_for(periodicity):
+    """Returns the period key function of a periodicity, see periodicity_for()."""
+    return periodicity_for(periodicity).key
+
+
+# STREAK ENGINE
+# The state of the streaks after a run of completions, so that later completions can continue it:
+#   last_day      the latest completed day
+#   period_days   the number of completed days in the period of last_day
+#   last_period   the latest period with enough completed days, None if there is none yet
+#   run           the number of consecutive complete periods that end with last_period
+#   longest       the longest run
+# Each completion updates the state in O(1).
+
+StreakState = namedtuple("StreakState", ["last_day", "period_days", "last_period", "run", "longest"])
+
+EMPTY_STATE = StreakState(None, 0, None, 0, 0)
+
+
+def extend_streaks(state, days, key=day_key, times=1):
+    """
+    Continues a StreakState with completed days in ascending order.
+
+    Days up to the last_day of the state are skipped, so several completions on one day count once.
+
+    Parameters
+    ----------
+    :param state: StreakState
+        EMPTY_STATE to start a new history.
+    :param days: iterable of int
+        Day ordinals in ascending order.
+    :param key: function
+        The period key function of the periodicity.
+    :param times: int
+        The number of completed days a period needs.
+
+    Returns
+    -------
+    :return: StreakState
+    """
+    last_day, period_days, last_period, run, longest = state
+    previous = -1 if last_day is None else last_day
+    period = None if last_day is None else key(last_day)
+    for day in days:
+        if day <= previous:
+            continue
+        previous = day
+        current_period = key(day)
+        if current_period == period:
+            period_days += 1
+            if period_days != times:
+                continue
+        else:
+            period = current_period
+            period_days = 1
+            if times != 1:
+                continue
+        if last_period is not None and period == last_period + 1:
+            run += 1
+        else:
+            run = 1
+        last_period = period
+        if run > longest:
+            longest = run
+    return StreakState(None if previous == -1 else previous, period_days, last_period, run, longest)
+
+
+def current_run(state, key, today):
+    """
+    Returns the current streak of a StreakState: the run if its last period is the period of `today`
+    or the one before, because the current period is not over yet, otherwise 0.
+    """
+    if state.last_period is None or today is None:
+        return 0
+    return state.run if 0 <= key(today) - state.last_period <= 1 else 0
+
+
+def compute_streaks(days, key=day_key, today=None, times=1):
+    """
+    Computes the current and the longest streak of a habit in one pass over its completions.
+
+    Several completions on the same day count once. A period counts for a streak when `times` of its
+    days have a completion. The current streak is the run of consecutive periods that ends in the
+    period of `today` or in the period before it, because the current period is not over yet.
+
+    Parameters
+    ----------
+    :param days: iterable of int
+        The completed days as day ordinals in ascending order.
+    :param key: function
+        The period key function, e.g. day_key or week_key.
+    :param today: int
+        The day ordinal of today. Without it the current streak is 0.
+    :param times: int
+        The number of completed days a period needs, 1 by default.
+
+    Returns
+    -------
+    :return: Streaks
+        (current, longest) as numbers of periods.
+    """
+    state = extend_streaks(EMPTY_STATE, days, key, times)
+    return Streaks(current_run(state, key, today), state.longest)
+
+
+# PURE STREAK FUNCTIONS OVER DATES
+# The streak rules of the four Habit.calculate_*_streak methods without the database: they take the
+# completions in any order, as dates, datetimes or day ordinals, with duplicates and several
+# completions on the same day.
+
+def as_day(value):
+    """
+    Returns the day ordinal of a date, datetime or day ordinal.
+
+    A datetime counts for the day clock.completion_day() gives it, the same day Habit stores it on.
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, datetime):
+        return clock.completion_day(value)
+    if isinstance(value, date):
+        return value.toordinal()
+    raise TypeError(f"Expected a date, datetime or day ordinal, got {type(value).__name__}")
+
+
+def streaks_of(completions, periodicity, today=None):
+    """
+    Computes the current and the longest streak of a history of completions.
+
+    Parameters
+    ----------
+    :param completions: iterable of date, datetime or int
+        In any order.
+    :param periodicity: str
+        'Daily', 'Weekly' or any other periodicity of periodicity_for().
+    :param today: date or int
+        The day the current streak is computed for. Without it the current streak is 0.
+
+    Returns
+    -------
+    :return: Streaks
+    """
+    days = sorted({as_day(completed) for completed in completions})
+    periodicity = periodicity_for(periodicity)
+    return compute_streaks(days, periodicity.key, None if today is None else as_day(today), periodicity.times)
+
+
+def current_daily_streak(completions, today):
+    """The number of consecutive days with a completion up to today or yesterday."""
+    return streaks_of(completions, "Daily", today).current
+
+
+def longest_daily_streak(completions):
+    """The longest number of consecutive days with a completion."""
+    return streaks_of(completions, "Daily").longest
+
+
+def current_weekly_streak(completions, today):
+    """The number of consecutive ISO weeks with a completion up to this week or the week before."""
+    return streaks_of(completions, "Weekly", today).current
+
+
+def longest_weekly_streak(completions):
+    """The longest number of consecutive ISO weeks with a completion."""
+    return streaks_of(completions, "Weekly").longest
@@ -0,0 +1,43 @@
+from datetime import date
+import pytest
+from analytics import batch_streaks
+from habit import Habit
+
+
+PERIODICITIES = ["Daily", "Weekly", "weekly", "Monthly", "Every 3 days", "3x per week", "2 times a month", "Yearly"]
+GAPS = [0, 1, 1, 1, 2, 5, 7, 8, 20]
+
+
+def test_python_batch_matches_the_per_habit_methods(random_habits):
+    habits = random_habits(1, 60, PERIODICITIES, GAPS)
+    result = Habit.batch_streaks(use_numpy=False)
+    for habit in habits:
+        if habit.periodicity == "Daily":
+            expected = (habit.calculate_current_daily_streak(habit.habit_id),
+                        habit.calculate_longest_daily_streak(habit.habit_id))
+        elif habit.periodicity in ("Weekly", "weekly"):
+            expected = (habit.calculate_current_weekly_streak(habit.habit_id),
+                        habit.calculate_longest_weekly_streak(habit.habit_id))
+        elif habit.periodicity == "Yearly":
+            assert habit.habit_id not in result
+            continue
+        else:
+            expected = habit.calculate_streaks()
+        assert result.get(habit.habit_id, (0, 0)) == expected
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_numpy_and_python_give_identical_results(seed, random_habits):
+    pytest.importorskip("numpy")
+    random_habits(seed, 60, PERIODICITIES, GAPS)
+    for today in (date(2025, 1, 1), date(2025, 3, 1), date.today()):
+        with Habit._connection() as conn:
+            assert batch_streaks(conn, today, use_numpy=True) == batch_streaks(conn, today, use_numpy=False)
+
+
+def test_empty_database():
+    with Habit._connection() as conn:
+        assert batch_streaks(conn, use_numpy=False) == {}
+    pytest.importorskip("numpy")
+    with Habit._connection() as conn:
+        assert batch_streaks(conn, use_numpy=True) == {}
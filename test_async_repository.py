@@ -0,0 +1,64 @@
+import asyncio
+from datetime import date, timedelta
+import pytest
+from async_repository import AsyncHabitRepository
+from habit import Habit
+
+
+def test_concurrent_writes_are_group_committed():
+    habits = [Habit(name=f"Habit{i}", description="", periodicity="Daily") for i in range(10)]
+    Habit.save_many(habits)
+    start = date.today() - timedelta(days=49)
+
+    async def scenario():
+        async with AsyncHabitRepository() as repository:
+            await asyncio.gather(*(repository.mark_completed(habit.habit_id, start + timedelta(days=day))
+                                   for habit in habits for day in range(50)))
+            streaks = await asyncio.gather(*(repository.streaks(habit.habit_id) for habit in habits))
+            loaded = await repository.get(habits[0].habit_id)
+            return repository, streaks, loaded
+
+    repository, streaks, loaded = asyncio.run(scenario())
+    assert repository.requests == 511
+    assert repository.batches < 100
+    assert set(streaks) == {(50, 50)}
+    assert len(loaded.completed_days) == 50
+
+
+def test_a_failing_request_does_not_affect_the_others():
+    Habit(habit_id=1, name="Read", description="", periodicity="Daily").save()
+
+    async def scenario():
+        async with AsyncHabitRepository() as repository:
+            return await asyncio.gather(repository.mark_completed(1, date(2024, 1, 1)),
+                                        repository.mark_completed(2, date(2024, 1, 1)),
+                                        repository.mark_completed(1, date(2024, 1, 2)),
+                                        repository.get(2),
+                                        return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert results[0] is None and results[2] is None and results[3] is None
+    assert isinstance(results[1], LookupError)
+    assert Habit.get_by_id(1).completed_dates == [date(2024, 1, 1), date(2024, 1, 2)]
+
+
+def test_a_rolled_back_request_leaves_its_habit_unsaved():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.mark_completed(date(2024, 1, 1))
+
+    def save_and_fail():
+        habit.save()
+        raise ValueError("invalid")
+
+    async def scenario():
+        async with AsyncHabitRepository() as repository:
+            with pytest.raises(ValueError):
+                await repository._submit(save_and_fail)
+            assert habit.habit_id is None and len(habit._unsaved_completions) == 1
+            await repository.save(habit)
+            return await repository.get(habit.habit_id)
+
+    loaded = asyncio.run(scenario())
+    # the history was loaded on the worker thread
+    assert loaded._days is not None
+    assert loaded.completed_dates == [date(2024, 1, 1)]
@@ -0,0 +1,49 @@
+import json
+from datetime import date
+import pytest
+from benchmark import compare, generate_habits, main, measure, run_benchmarks
+from streaks import compute_streaks, period_key_for
+
+
+def test_generator_is_reproducible():
+    first = generate_habits(20, 90, "random", 0.5, seed=4, end=date(2024, 6, 30))
+    second = generate_habits(20, 90, "random", 0.5, seed=4, end=date(2024, 6, 30))
+    assert [(h.periodicity, list(h.completed_days)) for h in first] == \
+        [(h.periodicity, list(h.completed_days)) for h in second]
+    assert {h.periodicity for h in first} == {"Daily", "Weekly"}
+    assert all(max(h.completed_days) <= date(2024, 6, 30).toordinal() for h in first)
+
+
+def test_without_gaps_every_history_is_one_streak():
+    for habit in generate_habits(10, 60, "none", 0.5, end=date(2024, 6, 30)):
+        days = list(habit.completed_days)
+        assert compute_streaks(days, period_key_for(habit.periodicity), days[-1]).longest == len(days)
+
+
+def test_unknown_gap_pattern():
+    with pytest.raises(ValueError):
+        generate_habits(1, 10, "weekends")
+
+
+def test_measure_reports_latencies():
+    result = measure(lambda n: sum(range(n)), [1000] * 50)
+    assert result["calls"] == 50
+    assert 0 < result["p50_ms"] <= result["p99_ms"]
+    assert result["ops_per_second"] > 0
+
+
+def test_run_and_compare(tmp_path, capsys):
+    results = run_benchmarks(habits=8, days=30, directory=str(tmp_path))
+    assert results["completions"] > 0
+    assert {"save", "get_by_id", "get_tracking_data", "calculate_current_daily_streak",
+            "calculate_longest_weekly_streak"} <= set(results["operations"])
+    assert all(result["ops_per_second"] > 0 for result in results["operations"].values()
+               if result["calls"])
+    assert compare(results, results)["save"]["p50_ms"] == 1.0
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(results))
+    output = tmp_path / "results.json"
+    assert main(["--habits", "4", "--days", "14", "--output", str(output), "--compare", str(baseline)]) == 0
+    assert "comparison" in json.loads(output.read_text())
+    assert "get_by_id" in capsys.readouterr().out
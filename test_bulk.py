@@ -0,0 +1,70 @@
+from datetime import date
+import pytest
+from cli import main
+from habit import Habit
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_export_and_import_round_trip(tmp_path, monkeypatch, fmt):
+    habit = Habit(name="Read", description="Read, a book", periodicity="Daily")
+    for day in (1, 2, 3):
+        habit.mark_completed(date(2024, 6, day))
+    habit.save()
+
+    assert Habit.export_table("habit", str(tmp_path / f"habit.{fmt}")) == 1
+    assert Habit.export_table("tracking", str(tmp_path / f"tracking.{fmt}")) == 3
+
+    monkeypatch.setattr(Habit, "_DB_NAME", str(tmp_path / "copy.db"))
+    assert Habit.import_table("habit", str(tmp_path / f"habit.{fmt}")) == 1
+    assert Habit.import_table("tracking", str(tmp_path / f"tracking.{fmt}"), chunk_size=2) == 3
+
+    copy = Habit.get_by_id(habit.habit_id)
+    assert (copy.name, copy.description, copy.periodicity) == ("Read", "Read, a book", "Daily")
+    assert copy.completed_dates == [date(2024, 6, day) for day in (1, 2, 3)]
+    with Habit._connection() as conn:
+        assert conn.execute("SELECT longest_streak, total_completions FROM habit_stats").fetchone() == (3, 3)
+
+
+def test_import_skips_existing_completions_and_assigns_new_ids(tmp_path):
+    Habit.import_table("habit", write(tmp_path / "habits.csv",
+                                      "id,name,description,periodicity\n7,Run,,Daily\n,Swim,,Weekly\n"))
+    assert Habit.get_by_id(8).name == "Swim"
+
+    tracking = write(tmp_path / "tracking.jsonl",
+                     '{"habit_id": 7, "completed_date": "2024-06-01"}\n'
+                     '{"habit_id": 7, "completed_date": "2024-06-01T20:00:00"}\n'
+                     '{"habit_id": 7, "completed_date": "2024-06-02 07:30:00"}\n')
+    assert Habit.import_table("tracking", tracking) == 3
+    assert Habit.get_by_id(7).completed_dates == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert Habit.get_streaks(7).longest == 2
+
+
+def test_invalid_record_reports_its_line(tmp_path):
+    Habit(habit_id=1, name="Run", description="", periodicity="Daily").save()
+    tracking = write(tmp_path / "tracking.csv",
+                     "habit_id,completed_date\n1,2024-06-01\n1,2024-06-02\n1,yesterday\n")
+    with pytest.raises(ValueError, match="line 4"):
+        Habit.import_table("tracking", tracking, chunk_size=2)
+    # the first chunk was committed before the invalid record was found
+    assert Habit.get_by_id(1).completed_dates == [date(2024, 6, 1), date(2024, 6, 2)]
+    assert Habit.get_streaks(1).longest == 2
+
+    with pytest.raises(ValueError, match="Unknown file format"):
+        Habit.import_table("tracking", str(tmp_path / "tracking.xml"))
+
+
+def test_completions_of_unknown_habits_are_rejected_with_their_line(tmp_path, capsys):
+    Habit(habit_id=1, name="Run", description="", periodicity="Daily").save()
+    tracking = write(tmp_path / "tracking.csv",
+                     "habit_id,completed_date\n1,2024-06-01\n1,2024-06-02\n1,2024-06-03\n9,2024-06-03\n")
+    with pytest.raises(ValueError, match="line 5: unknown habit 9"):
+        Habit.import_table("tracking", tracking, chunk_size=2)
+    assert Habit.get_by_id(1).completed_dates == [date(2024, 6, 1), date(2024, 6, 2)]
+
+    assert main(["import", "tracking", tracking]) == 1
+    assert "Error: line 5: unknown habit 9" in capsys.readouterr().err
@@ -0,0 +1,88 @@
+from datetime import date
+import sqlite3
+import pytest
+from cache import LRUCache, habit_cache
+from habit import Habit
+
+
+def test_lru_eviction_tags_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1, tag="x")
+    cache.put("b", 2, tag="y")
+    assert cache.get("a") == 1
+    cache.put("c", 3, tag="x")
+    # "b" was the least recently used entry
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.invalidate("x")
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.resize(0)
+    cache.put("d", 4)
+    assert cache.get("d") is None
+
+
+def test_reads_are_cached_and_writes_invalidate_them():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.mark_completed(date.today())
+    habit.save()
+    other = Habit(name="Run", description="", periodicity="Daily")
+    other.save()
+
+    before = habit_cache.stats()
+    Habit.get_by_id(habit.habit_id)
+    Habit.get_by_id(str(habit.habit_id))
+    Habit.get_streaks(habit.habit_id)
+    Habit.get_streaks(habit.habit_id)
+    Habit.get_by_id(other.habit_id)
+    after = habit_cache.stats()
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] - before["misses"] == 3
+
+    habit.name = "Write"
+    habit.save()
+    assert Habit.get_by_id(habit.habit_id).name == "Write"
+    # only the entries of the saved habit were invalidated
+    hits = habit_cache.stats()["hits"]
+    Habit.get_by_id(other.habit_id)
+    assert habit_cache.stats()["hits"] == hits + 1
+
+    loaded = Habit.get_by_id(habit.habit_id)
+    assert len(loaded.completed_days) == 1
+    loaded.mark_completed(date(2020, 1, 1))
+    assert len(Habit.get_by_id(habit.habit_id).completed_days) == 1
+
+    loaded.delete_habit()
+    assert Habit.get_by_id(habit.habit_id) is None
+    assert Habit.get_streaks(habit.habit_id) == (0, 0)
+
+
+def test_uncommitted_rows_are_not_cached():
+    with pytest.raises(RuntimeError):
+        with Habit.transaction():
+            Habit(habit_id=3, name="Read", description="", periodicity="Daily").save()
+            assert Habit.get_by_id(3).name == "Read"
+            raise RuntimeError
+    assert Habit.get_by_id(3) is None
+
+
+def test_writes_of_other_processes_are_not_served_from_the_cache():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.mark_completed(date(2024, 1, 1))
+    habit.save()
+    assert Habit.get_by_id(habit.habit_id).name == "Read"
+    assert len(Habit.get_by_id(habit.habit_id).completed_days) == 1
+    Habit.get_streaks(habit.habit_id)
+
+    # another process writes to the database
+    other = sqlite3.connect(Habit._DB_NAME)
+    with other:
+        other.execute("UPDATE habit SET name = 'Write' WHERE id = ?", (habit.habit_id,))
+        other.execute("INSERT INTO tracking (habit_id, completed_day) VALUES (?, ?)",
+                      (habit.habit_id, date(2024, 1, 2).toordinal()))
+    other.close()
+
+    assert Habit.get_by_id(habit.habit_id).name == "Write"
+    assert len(Habit.get_by_id(habit.habit_id).completed_days) == 2
@@ -0,0 +1,115 @@
+import io
+import json
+import pytest
+from cli import main
+from habit import Habit
+
+
+def run(*argv):
+    out = io.StringIO()
+    code = main(list(argv), out=out)
+    return code, out.getvalue()
+
+
+def test_add_complete_and_streaks_as_json():
+    assert run("add", "--name", "Read", "--periodicity", "Daily") == (0, "Habit 1 saved.\n")
+    assert run("complete", "--id", "1", "--date", "2024-06-01")[0] == 0
+    assert run("complete", "--id", "1", "--date", "2024-06-02T07:00:00")[0] == 0
+
+    code, output = run("--json", "streaks", "--id", "1")
+    assert code == 0
+    assert json.loads(output) == {"habit_id": 1, "name": "Read", "periodicity": "Daily", "current": 0, "longest": 2}
+
+    code, output = run("--json", "history", "--id", "1", "--bucket", "month", "--start", "2024-01-01")
+    assert json.loads(output) == {"1": {"2024-06-01": 2}}
+
+
+def test_unknown_habit_fails():
+    assert run("complete", "--id", "5") == (1, "")
+
+
+def test_batch_runs_in_one_transaction(tmp_path):
+    batch = tmp_path / "commands.txt"
+    batch.write_text("# two habits\n"
+                     "add --name Read --periodicity Daily\n"
+                     "\n"
+                     "add --name Run --description 'Run 5 km' --periodicity Weekly\n"
+                     "complete --id 2 --date 2024-06-03\n")
+    code, output = run("--json", "--batch", str(batch))
+    assert code == 0
+    assert len(output.splitlines()) == 3
+    assert Habit.get_by_id(2).description == "Run 5 km"
+    assert Habit.get_streaks(2).longest == 1
+
+    # a failing command rolls back the whole batch
+    batch.write_text("add --name Swim --periodicity Weekly\n"
+                     "complete --id 9\n")
+    assert run("--batch", str(batch))[0] == 1
+    assert [habit.name for habit in Habit.get_all()] == ["Read", "Run"]
+
+
+def test_import_in_a_batch_is_part_of_its_transaction(tmp_path):
+    (tmp_path / "empty.csv").write_text("id,name,description,periodicity\n")
+    (tmp_path / "habits.csv").write_text("id,name,description,periodicity\n7,Swim,,Weekly\n")
+    batch = tmp_path / "commands.txt"
+    batch.write_text(f"add --name A --periodicity Daily\n"
+                     f"import habit {tmp_path / 'empty.csv'}\n"
+                     f"add --name B --periodicity Daily\n")
+    assert run("--batch", str(batch))[0] == 0
+    assert [habit.name for habit in Habit.get_all()] == ["A", "B"]
+
+    # a later failure also rolls back the imported habits and the commands before the import
+    batch.write_text(f"add --name C --periodicity Daily\n"
+                     f"import habit {tmp_path / 'habits.csv'}\n"
+                     f"complete --id 99\n")
+    assert run("--batch", str(batch))[0] == 1
+    assert [habit.name for habit in Habit.get_all()] == ["A", "B"]
+
+
+def test_periodicities_are_stored_by_their_canonical_name():
+    assert run("add", "--name", "Gym", "--periodicity", "3 times a week")[0] == 0
+    code, output = run("--json", "list", "--periodicity", "3x per week")
+    assert [habit["periodicity"] for habit in json.loads(output)] == ["3x per week"]
+    with pytest.raises(SystemExit):
+        run("add", "--name", "Tax", "--periodicity", "Yearly")
+
+
+def test_list_finds_habits_saved_with_another_spelling():
+    Habit(name="Swim", description="", periodicity="weekly").save()
+    with Habit.transaction() as conn:
+        conn.execute("INSERT INTO habit (name, description, periodicity) VALUES ('Run', '', 'weekly')")
+    code, output = run("--json", "list", "--periodicity", "WEEKLY")
+    assert [habit["name"] for habit in json.loads(output)] == ["Swim", "Run"]
+
+
+def test_add_does_not_overwrite_an_existing_habit(capsys):
+    assert run("add", "--id", "3", "--name", "Read", "--periodicity", "Daily")[0] == 0
+    assert run("add", "--id", "3", "--name", "Swim", "--periodicity", "Weekly")[0] == 1
+    assert "Habit 3 already exists" in capsys.readouterr().err
+    assert Habit.get_by_id(3).name == "Read"
+
+
+def test_invalid_batch_line_is_reported_with_its_number(tmp_path, capsys):
+    batch = tmp_path / "commands.txt"
+    batch.write_text("add --name Read --periodicity Daily\n"
+                     "\n"
+                     "add --name Swim --periodicity Yearly\n")
+    assert run("--batch", str(batch))[0] == 1
+    assert "Error: line 3: invalid command: add --name Swim --periodicity Yearly" in capsys.readouterr().err
+    assert Habit.get_all() == []
+
+
+def test_json_and_db_are_accepted_after_the_command(tmp_path, monkeypatch):
+    assert run("add", "--name", "Read", "--periodicity", "Daily")[0] == 0
+    assert run("complete", "--id", "1", "--date", "2024-06-01")[0] == 0
+    code, output = run("streaks", "--all", "--json")
+    assert code == 0
+    assert [streak["name"] for streak in json.loads(output)] == ["Read"]
+    # given before the command, --json is not reset by the command
+    assert json.loads(run("--json", "list")[1])[0]["name"] == "Read"
+
+    monkeypatch.setattr(Habit, "_DB_NAME", Habit._DB_NAME)
+    other = str(tmp_path / "other.db")
+    assert run("add", "--name", "Swim", "--periodicity", "Weekly", "--db", other)[0] == 0
+    assert Habit._DB_NAME == other
+    assert [habit.name for habit in Habit.get_all()] == ["Swim"]
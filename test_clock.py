@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta, timezone
+import pytest
+import clock
+from habit import Habit
+
+
+@pytest.fixture(autouse=True)
+def day_settings(monkeypatch):
+    monkeypatch.setattr(clock, "_settings", clock.DaySettings(None, timedelta(0)))
+
+
+def test_default_day_is_the_calendar_day():
+    assert clock.completion_day(datetime(2024, 3, 5, 0, 10)) == date(2024, 3, 5).toordinal()
+    assert clock.completion_day(date(2024, 3, 5)) == date(2024, 3, 5).toordinal()
+
+
+def test_completion_before_the_day_start_counts_for_the_day_before():
+    clock.configure(day_start="04:00")
+    assert clock.completion_day(datetime(2024, 3, 5, 3, 30)) == date(2024, 3, 4).toordinal()
+    assert clock.completion_day(datetime(2024, 3, 5, 4, 0)) == date(2024, 3, 5).toordinal()
+    # a plain date has no time of day and stays on its day
+    assert clock.completion_day(date(2024, 3, 5)) == date(2024, 3, 5).toordinal()
+
+
+def test_aware_datetime_is_converted_to_the_configured_timezone():
+    clock.configure(timezone="Europe/Berlin")
+    late_utc = datetime(2024, 3, 4, 23, 30, tzinfo=timezone.utc)
+    assert clock.completion_day(late_utc) == date(2024, 3, 5).toordinal()
+    clock.configure(timezone="America/New_York")
+    assert clock.completion_day(late_utc) == date(2024, 3, 4).toordinal()
+
+
+def test_early_monday_counts_for_the_week_before_with_a_late_day_start():
+    clock.configure(day_start=4)
+    early_monday = datetime(2024, 3, 11, 2, 0)
+    habit = Habit(name="Run", description="", periodicity="Weekly")
+    habit.mark_completed(datetime(2024, 3, 4, 12, 0))
+    habit.mark_completed(early_monday)
+    habit.save()
+    # both completions belong to the ISO week starting on 2024-03-04
+    assert habit.get_tracking_weeks() == [(date(2024, 3, 4).toordinal() - 1) // 7]
+    assert habit.get_tracking_data() == [date(2024, 3, 4).toordinal(), date(2024, 3, 10).toordinal()]
+
+
+@pytest.mark.parametrize("timezone_name, day_start", [
+    ("Mars/Olympus_Mons", None),
+    (None, "25:00"),
+    (None, 12),
+    (None, "four"),
+])
+def test_invalid_settings_are_rejected(timezone_name, day_start):
+    with pytest.raises(ValueError):
+        clock.configure(timezone_name, day_start)
+
+
+def test_settings_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("HABIT_TIMEZONE", "Asia/Tokyo")
+    monkeypatch.setenv("HABIT_DAY_START", "05:30")
+    settings = clock.settings_from_env()
+    assert str(settings.timezone) == "Asia/Tokyo"
+    assert settings.day_start == timedelta(hours=5, minutes=30)
+
+
+def test_weekly_streaks_use_the_week_index():
+    habit = Habit(name="Swim", description="", periodicity="Weekly")
+    for day in (date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 9), date(2024, 1, 15), date(2024, 2, 5)):
+        habit.mark_completed(day)
+    habit.save()
+    assert habit.calculate_longest_weekly_streak(habit.habit_id) == 3
+    assert habit.get_tracking_weeks() == sorted({(day - 1) // 7 for day in habit.get_tracking_data()})
+    with habit._connection() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT DISTINCT completed_week FROM tracking WHERE habit_id = ? "
+            "ORDER BY completed_week", (habit.habit_id,)))
+    assert "tracking_habit_week" in plan
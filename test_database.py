@@ -0,0 +1,129 @@
+import multiprocessing
+import sqlite3
+import threading
+import pytest
+from database import ConnectionManager, close_all, configure
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"), pool_size=2)
+    yield manager
+    manager.close()
+
+
+def test_connection_is_reused_within_a_thread(manager):
+    with manager.connection() as outer:
+        with manager.connection() as inner:
+            assert inner is outer
+
+    with manager.connection() as again:
+        assert again is outer
+
+
+def test_outermost_block_commits_and_rolls_back(manager):
+    with manager.connection() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+
+    with pytest.raises(RuntimeError):
+        with manager.connection() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            with manager.connection() as nested:
+                nested.execute("INSERT INTO t VALUES (2)")
+            raise RuntimeError
+
+    with manager.connection() as conn:
+        conn.execute("INSERT INTO t VALUES (3)")
+
+    with sqlite3.connect(manager.db_name) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(3,)]
+
+
+def test_pragmas_are_applied(manager):
+    with manager.connection() as conn:
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+
+def test_threads_get_their_own_connection_and_pool_is_bounded(manager):
+    barrier = threading.Barrier(3)
+    seen = []
+
+    def work():
+        with manager.connection() as conn:
+            seen.append(conn)
+            barrier.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, seen))) == 3
+    assert len(manager._idle) == 2
+
+
+def test_closed_manager_refuses_connections(manager):
+    with manager.connection():
+        pass
+    manager.close()
+    assert manager._idle == []
+    with pytest.raises(sqlite3.ProgrammingError):
+        with manager.connection():
+            pass
+
+    manager.open()
+    with manager.connection() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_storage_options_are_applied(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "wal.db"), journal_mode="wal", synchronous="normal", busy_timeout=1234)
+    with manager.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    manager.close()
+
+    with pytest.raises(ValueError):
+        ConnectionManager(str(tmp_path / "wal.db"), journal_mode="WAL; DROP TABLE habit")
+    with pytest.raises(ValueError):
+        configure(str(tmp_path / "wal.db"), page_size=4096)
+
+
+def _stress_worker(db_name, worker, workers, habit_ids, days):
+    # runs in a separate process: completes every habit on its share of the days and reads streaks in between
+    from datetime import date, timedelta
+    from habit import Habit
+    Habit.configure_storage(db_name)
+    start = date(2024, 1, 1)
+    for day in range(worker, days, workers):
+        for habit_id in habit_ids:
+            habit = Habit.get_by_id(habit_id)
+            habit.mark_completed(start + timedelta(days=day))
+            habit.save()
+            Habit.get_streaks(habit_id)
+            Habit.get_all_streaks()
+    return worker
+
+
+def test_concurrent_writers_in_several_processes(tmp_path, monkeypatch):
+    from habit import Habit
+    # every process has its own cache, so caching is switched off for the workers
+    monkeypatch.setenv("HABIT_CACHE_SIZE", "0")
+    db_name = str(tmp_path / "stress.db")
+    monkeypatch.setattr(Habit, "_DB_NAME", db_name)
+    habits = [Habit(name=f"Habit{i}", description="", periodicity="Daily") for i in range(3)]
+    Habit.save_many(habits)
+    close_all()
+
+    workers, days = 4, 30
+    habit_ids = [habit.habit_id for habit in habits]
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        done = pool.starmap(_stress_worker, [(db_name, w, workers, habit_ids, days) for w in range(workers)])
+    assert sorted(done) == list(range(workers))
+
+    with sqlite3.connect(db_name) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM tracking").fetchone()[0] == days * len(habits)
+        summaries = conn.execute("SELECT longest_streak, total_completions FROM habit_stats").fetchall()
+    assert summaries == [(days, days)] * len(habits)
@@ -1,18 +1,8 @@
-import sqlite3
 import pytest
 from datetime import datetime, timedelta
 from habit import Habit
 
 
-def setup_function():
-    # Create an SQLite DB connection and drop tables
-    with sqlite3.connect(Habit._DB_NAME) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DROP TABLE IF EXISTS tracking")
-        cursor.execute("DROP TABLE IF EXISTS habit")
-        conn.commit()
-
-
 def test_habit_creation_and_retrieval():
     # Create a habit and marks completions
     habit = Habit(habit_id=1, name="Exercise", description="Run for 30 minutes", periodicity="Daily")
@@ -20,14 +10,115 @@ def test_habit_creation_and_retrieval():
 
     for i in range(3):
         habit.mark_completed(datetime.today().date() - timedelta(days=i))
+    habit.save()
+
+    # Assertions
+    assert habit.name == "Exercise"
+    assert habit.description == "Run for 30 minutes"
+    assert habit.periodicity == "Daily"
+    assert habit.calculate_current_daily_streak(habit_id=1) == 3
+    assert habit.calculate_longest_daily_streak(habit_id=1) == 3
+
+
+def test_save_only_writes_new_completions():
+    habit = Habit(habit_id=1, name="Read", description="Read a book", periodicity="Daily")
+    habit.mark_completed(datetime(2024, 3, 1, 8, 0))
+    habit.mark_completed(datetime(2024, 3, 2, 8, 0))
+    habit.save()
+    assert habit._unsaved_completions == []
+
+    loaded = Habit.get_by_id(1)
+    assert loaded.name == "Read"
+    assert loaded.completed_dates == [datetime(2024, 3, 1).date(), datetime(2024, 3, 2).date()]
+
+    # a second completion on the same day is ignored by the unique constraint
+    loaded.mark_completed(datetime(2024, 3, 2, 20, 0))
+    loaded.mark_completed(datetime(2024, 3, 3, 8, 0))
+    loaded.save()
+    assert len(Habit.get_by_id(1).completed_dates) == 3
+
+
+def test_save_many_persists_all_habits():
+    habits = [Habit(name=f"Habit{i}", description="", periodicity="Weekly") for i in range(5)]
+    for i, habit in enumerate(habits):
+        habit.mark_completed(datetime(2024, 1, 1) + timedelta(days=i))
+    Habit.save_many(habits)
+
+    assert [habit.habit_id for habit in habits] == [1, 2, 3, 4, 5]
+    for i, habit in enumerate(habits):
+        assert Habit.get_by_id(habit.habit_id).completed_dates == [(datetime(2024, 1, 1) + timedelta(days=i)).date()]
+
+
+def test_completions_are_stored_as_sorted_unique_day_ordinals():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    assert not hasattr(habit, "__dict__")
+
+    for day in (5, 1, 3, 5, 1):
+        habit.mark_completed(datetime(2024, 2, day, 12, 0))
+    assert list(habit.completed_days) == [datetime(2024, 2, day).toordinal() for day in (1, 3, 5)]
+    assert habit.completed_days.itemsize == 4
+    assert len(habit._unsaved_completions) == 3
+
+    assert habit.is_completed_on(datetime(2024, 2, 3).date())
+    assert habit.is_completed_on(datetime(2024, 2, 5, 23, 59))
+    assert not habit.is_completed_on(datetime(2024, 2, 4).date())
+
+
+def test_history_is_loaded_lazily_and_can_be_windowed():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    for day in range(1, 11):
+        habit.mark_completed(datetime(2024, 4, day).date())
+    habit.save()
+
+    loaded = Habit.get_by_id(habit.habit_id)
+    assert loaded._days is None
+    # marking a completion does not load the history
+    loaded.mark_completed(datetime(2024, 4, 12).date())
+    loaded.mark_completed(datetime(2024, 4, 12, 18, 0))
+    assert loaded._days is None and len(loaded._unsaved_completions) == 1
+
+    loaded.load_completions(since=datetime(2024, 4, 9).date())
+    assert loaded.completed_dates == [datetime(2024, 4, day).date() for day in (9, 10, 12)]
+
+    assert list(loaded.iter_completions(since=datetime(2024, 4, 10).date())) == [datetime(2024, 4, 10).toordinal()]
+    assert len(Habit.get_by_id(habit.habit_id).completed_days) == 10
+
+
+def test_completed_dates_set_before_saving_are_persisted():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.completed_dates = [datetime(2024, 5, 2, 9, 0), datetime(2024, 5, 1).date(), datetime(2024, 5, 2, 21, 0)]
+    habit.save()
+    assert Habit.get_by_id(habit.habit_id).completed_dates == [datetime(2024, 5, day).date() for day in (1, 2)]
+    assert habit._unsaved_completions == []
 
-        # Assertions
-        assert habit.name == "Exercise"
-        assert habit.description == "Run for 30 minutes"
-        assert habit.periodicity == "Daily"
-        assert habit.calculate_current_daily_streak(habit_id=1) == 3
 
+def test_rolled_back_transaction_keeps_the_completions_unsaved():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.mark_completed(datetime(2024, 5, 1).date())
+    with pytest.raises(RuntimeError):
+        with Habit.transaction():
+            habit.save()
+            # the completion is only saved once the outer transaction commits
+            assert len(habit._unsaved_completions) == 1
+            raise RuntimeError("abort")
+    assert habit.habit_id is None and len(habit._unsaved_completions) == 1
 
+    with Habit.transaction():
+        habit.save()
+    assert habit._unsaved_completions == []
+    assert Habit.get_by_id(habit.habit_id).completed_dates == [datetime(2024, 5, 1).date()]
 
 
+def test_habits_are_found_by_the_canonical_name_of_their_periodicity():
+    Habit(name="Gym", description="", periodicity="3 times a week").save()
+    Habit(name="Swim", description="", periodicity="weekly").save()
+    with Habit.transaction() as conn:
+        # a habit saved by an older version with the periodicity as it was typed
+        conn.execute("INSERT INTO habit (name, description, periodicity) VALUES ('Run', '', ' WEEKLY ')")
+        conn.execute("INSERT INTO habit (name, description, periodicity) VALUES ('Read', '', 'daily')")
 
+    assert [habit.periodicity for habit in Habit.get_all()] == ["3x per week", "Weekly", " WEEKLY ", "daily"]
+    assert [habit.name for habit in Habit.get_all("Weekly")] == ["Swim", "Run"]
+    assert [habit.name for habit in Habit.get_all("3x a week")] == ["Gym"]
+    assert Habit().get_weekly_habits() == ["Swim", "Run"]
+    assert Habit().get_daily_habits() == ["Read"]
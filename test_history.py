@@ -0,0 +1,85 @@
+import random
+from collections import Counter
+from datetime import date, timedelta
+import pytest
+from habit import Habit
+from history import completions
+
+
+def random_histories(count=30, seed=5):
+    rng = random.Random(seed)
+    habits = []
+    for number in range(count):
+        habit = Habit(name=f"Habit{number}", description="", periodicity=rng.choice(["Daily", "Weekly"]))
+        day = date(2023, 11, 1) + timedelta(days=rng.randint(0, 60))
+        for _ in range(rng.randint(0, 200)):
+            habit.mark_completed(day)
+            day += timedelta(days=rng.choice([1, 1, 2, 3, 9]))
+        habits.append(habit)
+    Habit.save_many(habits)
+    return {habit.habit_id: [date.fromordinal(day) for day in habit.completed_days] for habit in habits}
+
+
+def bucket_start(day, bucket):
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def expected_counts(histories, habit_ids, start, end, bucket):
+    result = {}
+    for habit_id in habit_ids:
+        counts = Counter(bucket_start(day, bucket) for day in histories[habit_id] if start <= day <= end)
+        if counts:
+            result[habit_id] = dict(sorted(counts.items()))
+    return result
+
+
+@pytest.mark.parametrize("bucket", ["day", "week", "month"])
+@pytest.mark.parametrize("start, end", [
+    (date(2023, 11, 1), date(2024, 12, 31)),
+    (date(2023, 11, 17), date(2024, 6, 3)),
+    (date(2024, 2, 1), date(2024, 2, 29)),
+    (date(2024, 2, 10), date(2024, 2, 20)),
+])
+def test_counts_match_the_raw_history(bucket, start, end):
+    histories = random_histories()
+    habit_ids = sorted(histories)[::2]
+    expected = expected_counts(histories, habit_ids, start, end, bucket)
+    assert Habit.completions(habit_ids, start, end, bucket) == expected
+    with Habit._connection() as conn:
+        assert completions(conn, habit_ids, start, end, bucket, use_rollup=False) == expected
+
+
+def test_defaults_cover_all_habits_and_the_whole_history():
+    histories = random_histories(count=8)
+    first = min(day for days in histories.values() for day in days)
+    last = max(day for days in histories.values() for day in days)
+    assert Habit.completions(bucket="month") == expected_counts(histories, histories, first, last, "month")
+
+
+def test_rollup_follows_inserts_and_deletes():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    for day in (1, 2, 2, 3):
+        habit.mark_completed(date(2024, 3, day))
+    habit.save()
+    # already saved, skipped by the unique constraint
+    habit.mark_completed(date(2024, 3, 1))
+    habit.save()
+    assert Habit.completions([habit.habit_id], date(2024, 1, 1), date(2024, 12, 31), "month") == \
+        {habit.habit_id: {date(2024, 3, 1): 3}}
+
+    habit.delete_habit()
+    with Habit._connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM habit_month").fetchone()[0] == 0
+
+
+def test_unknown_bucket():
+    with pytest.raises(ValueError):
+        Habit.completions(bucket="year")
+
+
+def test_empty_database():
+    assert Habit.completions() == {}
@@ -0,0 +1,73 @@
+from datetime import date
+import pytest
+import instrumentation
+from cli import main
+from habit import Habit
+
+
+@pytest.fixture(autouse=True)
+def reset_instrumentation():
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_disabled_by_default_records_nothing():
+    Habit(name="Read", description="", periodicity="Daily").save()
+    data = instrumentation.snapshot()
+    assert data["operations"] == {} and data["statements"] == {}
+
+
+def test_operations_statements_and_rows_are_counted():
+    with instrumentation.profile():
+        habit = Habit(name="Read", description="", periodicity="Daily")
+        for day in range(1, 6):
+            habit.mark_completed(date(2024, 5, day))
+        habit.save()
+        assert habit.get_tracking_data() == [date(2024, 5, day).toordinal() for day in range(1, 6)]
+        with pytest.raises(ValueError):
+            Habit.import_table("nope", "file.csv")
+    habit.get_tracking_data()
+
+    data = instrumentation.snapshot()
+    operations = data["operations"]
+    assert operations["Habit.save"]["calls"] == 1
+    # save() runs save_many(), whose statements are included in save()
+    assert operations["Habit.save"]["statements"] == operations["Habit.save_many"]["statements"] > 0
+    assert operations["Habit.get_tracking_data"] == {**operations["Habit.get_tracking_data"],
+                                                     "calls": 1, "errors": 0, "rows": 5}
+    assert operations["Habit.import_table"]["errors"] == 1
+    assert operations["migrate"]["calls"] == 1
+    assert data["connections_opened"] == 1
+
+    # save() builds the summary row of the new habit with the same query as get_tracking_data()
+    select = "SELECT completed_day FROM tracking WHERE habit_id = ? ORDER BY completed_day"
+    assert data["statements"][select] == {"executions": 2, "rows": 10}
+    assert "INSERT OR IGNORE INTO tracking (habit_id, completed_day, completed_at) VALUES (?, ?, ?)" \
+        in data["statements"]
+    assert data["statements"]["COMMIT"]["executions"] >= 1
+
+
+def test_normalize_sql():
+    assert instrumentation.normalize_sql("SELECT *\n   FROM habit WHERE id = 12 AND name = 'it''s'") == \
+        "SELECT * FROM habit WHERE id = ? AND name = ?"
+    assert instrumentation.normalize_sql("INSERT INTO t VALUES (1, NULL) -- x IS NULL") == \
+        "INSERT INTO t VALUES (?, ?) -- x IS NULL"
+
+
+def test_exports():
+    with instrumentation.profile():
+        Habit(name="Read", description="", periodicity="Daily").save()
+    prometheus = instrumentation.to_prometheus()
+    assert '# TYPE habit_operation_calls_total counter' in prometheus
+    assert 'habit_operation_calls_total{operation="Habit.save"} 1' in prometheus
+    assert "habit_connections_opened_total 1" in prometheus
+    assert '"Habit.save"' in instrumentation.to_json()
+    assert "Habit.save" in instrumentation.summary_table()
+
+
+def test_cli_profile(capsys):
+    assert main(["--profile", "table", "add", "--name", "Read", "--periodicity", "Daily"]) == 0
+    captured = capsys.readouterr()
+    assert "Habit.save" in captured.err
+    assert not instrumentation.is_enabled()
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+import main
+from benchmark import HEAVY_MODULES
+from habit import Habit
+
+
+def imported_heavy_modules(module):
+    code = f"import sys, {module}; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return output.strip()
+
+
+def test_core_library_does_not_import_the_interactive_layer():
+    assert imported_heavy_modules("habit") == ""
+    assert imported_heavy_modules("cli") == ""
+    assert imported_heavy_modules("main") == ""
+
+
+def test_arguments_run_the_command_line_interface():
+    assert main.main(["--json", "add", "--name", "Read", "--periodicity", "Daily"]) == 0
+    assert [habit.name for habit in Habit.get_all()] == ["Read"]
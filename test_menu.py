@@ -0,0 +1,69 @@
+import sys
+import menu
+from habit import Habit
+
+
+def stack_depth():
+    frame, depth = sys._getframe(), 0
+    while frame is not None:
+        frame, depth = frame.f_back, depth + 1
+    return depth
+
+
+class Answer:
+    def __init__(self, value):
+        self.value = value
+
+    def ask(self):
+        return self.value
+
+
+def test_menu_loop_keeps_a_constant_stack_depth(monkeypatch, capsys):
+    Habit(name="Read", description="", periodicity="Daily").save()
+    choices = iter(["Show all habits"] * 3000 + ["Exit"])
+    depths = set()
+
+    def select(message, choices_=None, **kwargs):
+        depths.add(stack_depth())
+        return Answer(next(choices))
+
+    monkeypatch.setattr(menu.questionary, "select", select)
+    loads = []
+    monkeypatch.setattr(Habit, "get_all", classmethod(lambda cls, periodicity=None: loads.append(1) or []))
+
+    menu.main_menu()
+    assert len(depths) == 1
+    # the habit list is cached between the iterations
+    assert len(loads) == 1
+
+
+def test_edit_updates_the_existing_habit(monkeypatch):
+    Habit(habit_id=4, name="Read", description="", periodicity="Daily").save()
+    answers = iter(["4", "Write", "Write a page", "Weekly"])
+    monkeypatch.setattr(menu.questionary, "text", lambda *args, **kwargs: Answer(next(answers)))
+
+    state = menu.MenuState()
+    assert [habit.name for habit in state.habits] == ["Read"]
+    menu.edit_habit(state)
+    assert [(habit.habit_id, habit.name, habit.periodicity) for habit in state.habits] == [(4, "Write", "Weekly")]
+
+
+def test_streak_handlers(monkeypatch, capsys):
+    habit = Habit(habit_id=2, name="Read", description="", periodicity="Weekly")
+    habit.mark_completed()
+    habit.save()
+    monkeypatch.setattr(menu.questionary, "text", lambda *args, **kwargs: Answer("2"))
+    menu.show_current_streak_per_habit(menu.MenuState())
+    menu.show_longest_streak_per_habit(menu.MenuState())
+    output = capsys.readouterr().out
+    assert "The current streak of the habit with the habit_id 2 is:  1  week(s)" in output
+    assert "The longest streak of the habit with the habit_id 2 is:  1  week(s)" in output
+
+
+def test_weekly_and_daily_habits_are_shown_whatever_their_spelling(capsys):
+    with Habit.transaction() as conn:
+        conn.executemany("INSERT INTO habit (name, description, periodicity) VALUES (?, '', ?)",
+                         [("Swim", "weekly"), ("Read", "every day"), ("Gym", "3 times a week")])
+    menu.show_all_weekly_habits(menu.MenuState())
+    menu.show_all_daily_habits(menu.MenuState())
+    assert capsys.readouterr().out.splitlines()[1::2] == ["['Swim']", "['Read']"]
@@ -0,0 +1,40 @@
+import random
+from datetime import date, timedelta
+import pytest
+from habit import Habit
+from report import partition_ranges
+
+
+def create_habits(count, seed=3):
+    rng = random.Random(seed)
+    habits = []
+    for number in range(count):
+        habit = Habit(name=f"Habit{number}", description="", periodicity=rng.choice(["Daily", "Weekly"]))
+        day = date.today() - timedelta(days=rng.randint(0, 200))
+        for _ in range(rng.randint(0, 30)):
+            day += timedelta(days=rng.choice([0, 1, 1, 2, 7, 10]))
+            if day <= date.today():
+                habit.mark_completed(day)
+        habits.append(habit)
+    Habit.save_many(habits)
+
+
+def test_partitions_cover_all_habits():
+    create_habits(23)
+    with Habit._connection() as conn:
+        ranges = partition_ranges(conn, 5)
+        ids = [row[0] for row in conn.execute("SELECT id FROM habit ORDER BY id")]
+    assert len(ranges) == 5
+    assert [i for first, last in ranges for i in ids if first <= i <= last] == ids
+    with Habit._connection() as conn:
+        assert len(partition_ranges(conn, 100)) == 23
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_report_matches_the_single_pass(workers):
+    create_habits(40)
+    assert Habit.streak_report(workers=workers) == Habit.longest_streaks()
+
+
+def test_report_of_an_empty_database():
+    assert Habit.streak_report(workers=2) == []
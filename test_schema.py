@@ -0,0 +1,123 @@
+import os
+import sqlite3
+from datetime import date
+import pytest
+import clock
+from database import ConnectionManager, close_all
+from habit import Habit
+from schema import LATEST_VERSION, MIGRATIONS, current_version, ensure_schema, migrate
+from stats import rebuild_stats
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConnectionManager(str(tmp_path / "test.db"))
+    yield manager
+    manager.close()
+
+
+def test_fresh_database_is_migrated_to_latest_version(manager):
+    ensure_schema(manager)
+    with manager.connection() as conn:
+        assert current_version(conn) == LATEST_VERSION
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"habit", "tracking", "schema_version"} <= tables
+
+
+def test_migrate_is_idempotent(manager):
+    with manager.connection() as conn:
+        migrate(conn)
+    with manager.connection() as conn:
+        migrate(conn)
+        rows = conn.execute("SELECT version FROM schema_version").fetchall()
+    assert [row[0] for row in rows] == list(range(1, LATEST_VERSION + 1))
+
+
+def test_legacy_database_without_version_table_is_adopted(manager):
+    with sqlite3.connect(manager.db_name) as conn:
+        conn.execute("CREATE TABLE habit (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                     "description TEXT NOT NULL, periodicity TEXT NOT NULL)")
+        conn.execute("INSERT INTO habit VALUES (1, 'Read', 'Read a book', 'Daily')")
+    ensure_schema(manager)
+    with manager.connection() as conn:
+        assert current_version(conn) == LATEST_VERSION
+        assert conn.execute("SELECT name FROM habit").fetchall() == [("Read",)]
+
+
+def test_constructing_habits_does_not_touch_the_database(tmp_path, monkeypatch):
+    db_name = str(tmp_path / "habits.db")
+    monkeypatch.setattr(Habit, "_DB_NAME", db_name)
+    habits = [Habit(name=f"Habit{i}", description="", periodicity="Daily") for i in range(1000)]
+    assert len(habits) == 1000
+    assert not os.path.exists(db_name)
+    close_all()
+
+
+def test_legacy_tracking_text_dates_are_migrated_to_day_ordinals(manager):
+    with sqlite3.connect(manager.db_name) as conn:
+        conn.execute("CREATE TABLE habit (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                     "description TEXT NOT NULL, periodicity TEXT NOT NULL)")
+        conn.execute("CREATE TABLE tracking (id INTEGER PRIMARY KEY, habit_id INTEGER, completed_date DATETIME)")
+        conn.execute("INSERT INTO habit VALUES (1, 'Read', 'Read a book', 'Daily')")
+        conn.executemany("INSERT INTO tracking (habit_id, completed_date) VALUES (1, ?)", [
+            ("2024-12-31 08:15:00.123456",),
+            ("2024-12-31 21:00:00.000000",),
+            ("2025-01-01",),
+        ])
+        # a completion of a habit that was deleted before the migration layer existed
+        conn.execute("INSERT INTO tracking (habit_id, completed_date) VALUES (2, '2024-06-01')")
+    ensure_schema(manager)
+    with manager.connection() as conn:
+        rows = conn.execute("SELECT habit_id, completed_day, completed_at FROM tracking "
+                            "ORDER BY completed_day").fetchall()
+        months = conn.execute("SELECT habit_id, month, completions FROM habit_month ORDER BY month").fetchall()
+    assert rows == [
+        (1, date(2024, 12, 31).toordinal(), "2024-12-31 08:15:00.123456"),
+        (1, date(2025, 1, 1).toordinal(), None),
+    ]
+    assert months == [(1, 2024 * 12 + 11, 1), (1, 2025 * 12, 1)]
+
+
+def test_legacy_timestamps_keep_their_calendar_day_whatever_the_day_settings(manager, monkeypatch):
+    monkeypatch.setattr(clock, "_settings", clock.settings())
+    clock.configure(timezone="Pacific/Auckland", day_start="04:00")
+    with sqlite3.connect(manager.db_name) as conn:
+        conn.execute("CREATE TABLE habit (id INTEGER PRIMARY KEY, name TEXT NOT NULL, "
+                     "description TEXT NOT NULL, periodicity TEXT NOT NULL)")
+        conn.execute("CREATE TABLE tracking (id INTEGER PRIMARY KEY, habit_id INTEGER, completed_date DATETIME)")
+        conn.execute("INSERT INTO habit VALUES (1, 'Read', 'Read a book', 'Daily')")
+        conn.execute("INSERT INTO tracking (habit_id, completed_date) VALUES (1, '2024-12-31 02:15:00')")
+    ensure_schema(manager)
+    with manager.connection() as conn:
+        assert conn.execute("SELECT completed_day FROM tracking").fetchall() == [(date(2024, 12, 31).toordinal(),)]
+
+
+def test_per_habit_tracking_lookups_use_the_index(manager):
+    ensure_schema(manager)
+    with manager.connection() as conn:
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT completed_day FROM tracking "
+                            "WHERE habit_id = ? ORDER BY completed_day", (1,)).fetchall()
+    assert "USING COVERING INDEX" in " ".join(row[-1] for row in plan)
+
+
+def test_streak_state_migration_matches_a_rebuild(manager):
+    with manager.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        current_version(conn)
+        for number, description, apply in MIGRATIONS[:5]:
+            apply(conn.cursor())
+            conn.execute("INSERT INTO schema_version VALUES (?, ?, '')", (number, description))
+        periodicities = ["Daily", "weekly", "Monthly", "Every 3 days", "3 times a week", "2x per month", "Yearly"]
+        for habit_id, periodicity in enumerate(periodicities, start=1):
+            conn.execute("INSERT INTO habit VALUES (?, 'Habit', '', ?)", (habit_id, periodicity))
+            conn.executemany("INSERT INTO tracking (habit_id, completed_day) VALUES (?, ?)",
+                             [(habit_id, date(2024, 1, 1).toordinal() + offset)
+                              for offset in range(0, 120, 1 + habit_id % 3)])
+        conn.commit()
+        assert migrate(conn) == LATEST_VERSION
+        query = "SELECT * FROM habit_stats ORDER BY habit_id"
+        migrated = conn.execute(query).fetchall()
+        rebuild_stats(conn.cursor())
+        assert conn.execute(query).fetchall() == migrated
+        assert len(migrated) == len(periodicities) - 1
+        conn.rollback()
@@ -0,0 +1,70 @@
+from datetime import date
+import pytest
+from analytics import batch_streaks
+from cli import main
+from habit import Habit
+from snapshot import Snapshot
+
+
+PERIODICITIES = ["Daily", "Weekly", "weekly", "Monthly", "3x per week", "Yearly"]
+GAPS = [1, 1, 2, 5, 7, 8]
+
+
+def test_snapshot_holds_all_habits_and_days(tmp_path, random_habits):
+    habits = random_habits(11, 40, PERIODICITIES, GAPS, name="Habit {} ✓")
+    path = str(tmp_path / "habits.snapshot")
+    assert Habit.export_snapshot(path) == (len(habits), sum(len(habit.completed_days) for habit in habits))
+
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == len(habits)
+        assert list(snapshot.habit_ids) == sorted(habit.habit_id for habit in habits)
+        for habit in habits:
+            days = snapshot.days(habit.habit_id)
+            assert isinstance(days, memoryview) and days.format == "i"
+            assert list(days) == list(habit.completed_days)
+            assert snapshot.name(habit.habit_id) == habit.name
+            expected = None if habit.periodicity == "Yearly" else habit.periodicity.capitalize()
+            assert snapshot.periodicity(habit.habit_id) == expected
+        with pytest.raises(KeyError):
+            snapshot.days(10 ** 6)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_snapshot_streaks_match_the_database(tmp_path, use_numpy, random_habits):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    random_habits(11, 40, PERIODICITIES, GAPS, name="Habit {} ✓")
+    path = str(tmp_path / "habits.snapshot")
+    Habit.export_snapshot(path)
+    for today in (date(2025, 1, 20), date(2025, 3, 1)):
+        with Habit._connection() as conn:
+            expected = batch_streaks(conn, today, use_numpy=False)
+        with Snapshot(path) as snapshot:
+            assert snapshot.streaks(today, use_numpy=use_numpy) == expected
+
+
+def test_damaged_files_are_rejected(tmp_path, random_habits):
+    random_habits(11, 3, PERIODICITIES, GAPS, name="Habit {} ✓")
+    path = tmp_path / "habits.snapshot"
+    Habit.export_snapshot(str(path))
+    path.write_bytes(path.read_bytes()[:-3])
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+    (tmp_path / "other").write_bytes(b"not a snapshot" * 10)
+    with pytest.raises(ValueError):
+        Snapshot(str(tmp_path / "other"))
+
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / "habits.snapshot")
+    assert Habit.export_snapshot(path) == (0, 0)
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 0 and snapshot.streaks() == {}
+
+
+def test_cli_report_from_snapshot(tmp_path):
+    Habit(name="Read", description="", periodicity="Daily").save()
+    path = str(tmp_path / "habits.snapshot")
+    assert main(["snapshot", path]) == 0
+    assert main(["report", "--snapshot", path]) == 0
+    assert main(["report", "--snapshot", str(tmp_path / "missing")]) == 1
@@ -0,0 +1,123 @@
+import random
+from datetime import date, timedelta
+import pytest
+from habit import Habit
+from streaks import EMPTY_STATE, compute_streaks, extend_streaks, period_key_for, periodicity_for
+
+
+def stats_row(habit_id):
+    with Habit._connection() as conn:
+        return conn.execute("""
+            SELECT last_day, current_run, longest_streak, total_completions FROM habit_stats WHERE habit_id = ?
+        """, (habit_id,)).fetchone()
+
+
+def expected_row(days, periodicity):
+    periodicity = periodicity_for(periodicity)
+    state = extend_streaks(EMPTY_STATE, days, periodicity.key, periodicity.times)
+    if periodicity.times == 1:
+        assert (state.run, state.longest) == compute_streaks(days, periodicity.key, today=days[-1])
+    return days[-1], state.run, state.longest, len(days)
+
+
+@pytest.mark.parametrize("periodicity", ["Daily", "Weekly", "Monthly", "Every 3 days", "3x per week"])
+def test_incremental_updates_match_a_rebuild(periodicity):
+    rng = random.Random(7)
+    habit = Habit(name="Read", description="", periodicity=periodicity)
+    day = date(2024, 12, 1)
+    saved = []
+    for _ in range(40):
+        for _ in range(rng.randint(1, 3)):
+            day += timedelta(days=rng.choice([0, 1, 1, 2, 6, 9]))
+            habit.mark_completed(day)
+            saved.append(day.toordinal())
+        habit.save()
+        days = sorted(set(saved))
+        assert stats_row(habit.habit_id) == expected_row(days, periodicity)
+
+    incremental = stats_row(habit.habit_id)
+    Habit.rebuild_stats()
+    assert stats_row(habit.habit_id) == incremental
+
+
+def test_backfilled_completion_rebuilds_the_summary():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    for day in (1, 2, 4, 5):
+        habit.mark_completed(date(2024, 1, day))
+    habit.save()
+    assert stats_row(habit.habit_id)[1:] == (2, 2, 4)
+
+    habit.mark_completed(date(2024, 1, 3))
+    habit.save()
+    assert stats_row(habit.habit_id) == (date(2024, 1, 5).toordinal(), 5, 5, 5)
+
+
+def test_get_streaks_and_periodicity_change():
+    today = date.today()
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    for offset in (1, 2, 3, 10):
+        habit.mark_completed(today - timedelta(days=offset))
+    habit.save()
+    assert Habit.get_streaks(habit.habit_id) == (3, 3)
+
+    habit.periodicity = "Weekly"
+    habit.save()
+    assert Habit.get_streaks(habit.habit_id) == compute_streaks(
+        sorted((today - timedelta(days=offset)).toordinal() for offset in (1, 2, 3, 10)),
+        period_key_for("Weekly"), today.toordinal())
+
+
+def test_delete_removes_the_summary():
+    habit = Habit(name="Read", description="", periodicity="Daily")
+    habit.mark_completed(date(2024, 1, 1))
+    habit.save()
+    habit.delete_habit()
+    assert stats_row(habit.habit_id) is None
+    assert Habit.get_streaks(habit.habit_id) == (0, 0)
+
+
+def test_overview_and_streaming_streaks_for_all_habits():
+    today = date.today()
+    histories = {
+        ("Read", "Daily"): [1, 2, 3, 5],
+        ("Run", "Daily"): [0, 1, 2, 3, 4, 9],
+        ("Clean", "Weekly"): [0, 7, 14, 35],
+        ("Call", "Weekly"): [70],
+    }
+    habits = []
+    for (name, periodicity), offsets in histories.items():
+        habit = Habit(name=name, description="", periodicity=periodicity)
+        for offset in offsets:
+            habit.mark_completed(today - timedelta(days=offset))
+        habits.append(habit)
+    Habit.save_many(habits)
+
+    overview = Habit.longest_streak_overview()
+    assert (overview["Daily"].name, overview["Daily"].longest) == ("Run", 5)
+    assert overview["Weekly"].name == "Clean"
+
+    streaks = Habit.longest_streaks()
+    assert [s.name for s in streaks] == ["Read", "Run", "Clean", "Call"]
+    for habit, result in zip(habits, streaks):
+        assert (result.current, result.longest) == Habit.get_streaks(habit.habit_id)
+
+
+def test_summary_of_a_times_per_week_habit_and_overview_by_canonical_name():
+    today = date.today()
+    monday = today - timedelta(days=today.weekday())
+    gym = Habit(name="Gym", description="", periodicity="3 times a week")
+    for weeks_ago, weekdays in ((3, (0, 2, 4)), (2, (0, 1, 2, 3)), (1, (1, 5, 6)), (0, (0,))):
+        for weekday in weekdays:
+            day = monday - timedelta(weeks=weeks_ago) + timedelta(days=weekday)
+            if day <= today:
+                gym.mark_completed(day)
+        gym.save()
+    walk = Habit(name="Walk", description="", periodicity="3x per week")
+    walk.mark_completed(monday - timedelta(weeks=5))
+    walk.save()
+
+    # the current week only has one completion, but it is not over yet
+    assert Habit.get_streaks(gym.habit_id) == gym.calculate_streaks() == (3, 3)
+    overview = Habit.longest_streak_overview()
+    assert list(overview) == ["3x per week"]
+    assert (overview["3x per week"].name, overview["3x per week"].longest) == ("Gym", 3)
@@ -0,0 +1,143 @@
+import os
+import random
+from datetime import date, datetime, time, timedelta
+import pytest
+from analytics import numpy_module, numpy_streaks, python_streaks
+from habit import Habit
+from stats import read_streaks, stream_streaks
+from streaks import Streaks, as_day, current_daily_streak, current_weekly_streak, longest_daily_streak, \
+    longest_weekly_streak, streaks_of
+
+
+# DIFFERENTIAL FUZZ HARNESS
+# Seeded random histories are run through a slow reference implementation, which works on calendar
+# dates and ISO calendar weeks instead of day ordinals and period keys, and through every optimized
+# implementation. All of them have to agree. A failure prints the seed of the history, so it can be
+# reproduced with history(seed). STREAK_FUZZ_CASES sets the number of histories.
+
+CASES = int(os.environ.get("STREAK_FUZZ_CASES", "300"))
+
+# years with an ISO week 53 and years without one
+ANCHOR_YEARS = [2015, 2020, 2021, 2024, 2026, 2027]
+
+
+def period_start(day, periodicity):
+    """The first day of the period of a day: the day itself or the Monday of its ISO week."""
+    if periodicity == "Daily":
+        return day
+    year, week, _ = day.isocalendar()
+    return date.fromisocalendar(year, week, 1)
+
+
+def reference_streaks(completions, periodicity, today):
+    """Counts the streaks by walking from period to period through the calendar."""
+    step = timedelta(days=1 if periodicity == "Daily" else 7)
+    periods = {period_start(completed if type(completed) is date else completed.date(), periodicity)
+               for completed in completions}
+    longest = 0
+    for start in periods:
+        if start - step in periods:
+            continue
+        length = 0
+        while start + step * length in periods:
+            length += 1
+        longest = max(longest, length)
+
+    period = period_start(today, periodicity)
+    if period not in periods:
+        period -= step
+    current = 0
+    while period - step * current in periods:
+        current += 1
+    return Streaks(current, longest)
+
+
+def history(seed):
+    """
+    Returns (periodicity, completions, today) of a random history.
+
+    The histories mix dates and datetimes in random order, with duplicates, several completions on
+    the same day, gaps of all lengths and a start close to the turn of a year. Today is never before
+    the last completion.
+    """
+    rng = random.Random(seed)
+    periodicity = rng.choice(["Daily", "Weekly"])
+    day = date(rng.choice(ANCHOR_YEARS), 12, 1) + timedelta(days=rng.randint(0, 50))
+    gaps = rng.choice([[0, 1], [1], [0, 1, 1, 2, 3], [1, 6, 7, 8, 13, 14], [1, 7, 30]])
+    completions = []
+    for _ in range(rng.randint(0, 60)):
+        if rng.random() < 0.5:
+            completions.append(day)
+        else:
+            completions.append(datetime.combine(day, time(rng.randint(0, 23), rng.randint(0, 59))))
+        if rng.random() < 0.1:
+            completions.append(rng.choice(completions))
+        day += timedelta(days=rng.choice(gaps))
+    rng.shuffle(completions)
+    last = date.fromordinal(max(map(as_day, completions))) if completions else day
+    today = last + timedelta(days=rng.choice([0, 0, 1, 2, 6, 7, 8, 14]))
+    return periodicity, completions, today
+
+
+def test_reference_knows_iso_week_53():
+    # 2020-12-28 is in week 53 of 2020, between week 52 and week 1 of 2021
+    completions = [date(2020, 12, 21), date(2020, 12, 31), date(2021, 1, 4)]
+    assert reference_streaks(completions, "Weekly", date(2021, 1, 5)) == (3, 3)
+    assert reference_streaks(completions, "Daily", date(2021, 1, 5)) == (1, 1)
+
+
+@pytest.mark.parametrize("seed", range(CASES))
+def test_pure_functions_match_the_reference(seed):
+    periodicity, completions, today = history(seed)
+    expected = reference_streaks(completions, periodicity, today)
+    assert streaks_of(completions, periodicity, today) == expected, f"history({seed})"
+    if periodicity == "Daily":
+        result = current_daily_streak(completions, today), longest_daily_streak(completions)
+    else:
+        result = current_weekly_streak(completions, today), longest_weekly_streak(completions)
+    assert result == expected, f"history({seed})"
+
+
+@pytest.fixture
+def saved_histories():
+    """Saves the first histories in chunks of completions, so the summary table is updated incrementally."""
+    rng = random.Random(0)
+    histories = {}
+    for seed in range(min(CASES, 100)):
+        periodicity, completions, _ = history(seed)
+        habit = Habit(name=f"Habit{seed}", description="", periodicity=periodicity)
+        habit.save()
+        ordered = sorted(completions, key=lambda value: (value.toordinal(), type(value) is datetime))
+        while ordered:
+            size = rng.randint(1, 10)
+            chunk, ordered = ordered[:size], ordered[size:]
+            for completed in chunk:
+                habit.mark_completed(completed)
+            habit.save()
+        histories[habit.habit_id] = (periodicity, completions)
+    return histories
+
+
+@pytest.mark.parametrize("offset", [0, 1, 8, 30])
+def test_stored_implementations_match_the_reference(saved_histories, offset):
+    last = max(completed for _, completions in saved_histories.values() for completed in map(as_day, completions))
+    today = date.fromordinal(last) + timedelta(days=offset)
+    expected = {habit_id: reference_streaks(completions, periodicity, today)
+                for habit_id, (periodicity, completions) in saved_histories.items() if completions}
+    probe = Habit()
+
+    with Habit._connection() as conn:
+        cursor = conn.cursor()
+        assert python_streaks(cursor, today.toordinal()) == expected
+        if numpy_module() is not None:
+            assert numpy_streaks(cursor, today.toordinal()) == expected
+        assert {s.habit_id: (s.current, s.longest) for s in stream_streaks(cursor, today.toordinal())} == expected
+        for habit_id, streaks in expected.items():
+            assert read_streaks(cursor, habit_id, today.toordinal()) == streaks, f"habit {habit_id}"
+
+    for habit_id, (periodicity, completions) in saved_histories.items():
+        longest = expected.get(habit_id, Streaks(0, 0)).longest
+        if periodicity == "Daily":
+            assert probe.calculate_longest_daily_streak(habit_id) == longest
+        else:
+            assert probe.calculate_longest_weekly_streak(habit_id) == longest
@@ -0,0 +1,148 @@
+import random
+from datetime import date, datetime, timedelta
+import clock
+from streaks import EMPTY_STATE, compute_streaks, day_key, extend_streaks, longest_daily_streak, month_key, \
+    period_key_for, periodicity_for, streaks_of, week_key
+import pytest
+
+
+def days(*dates):
+    return [d.toordinal() for d in dates]
+
+
+def test_no_completions():
+    assert compute_streaks([], day_key, date(2024, 5, 1).toordinal()) == (0, 0)
+
+
+def test_daily_streaks_with_gap_and_duplicates():
+    history = days(date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 2), date(2024, 5, 3),
+                   date(2024, 5, 10), date(2024, 5, 11))
+    assert compute_streaks(history, day_key, date(2024, 5, 11).toordinal()) == (2, 3)
+    # yesterday's run is still current, the day before yesterday's is not
+    assert compute_streaks(history, day_key, date(2024, 5, 12).toordinal()) == (2, 3)
+    assert compute_streaks(history, day_key, date(2024, 5, 13).toordinal()) == (0, 3)
+
+
+def test_weekly_streak_continues_across_new_year():
+    # ISO weeks 51, 52 of 2024 and week 1 of 2025 (which starts on 2024-12-30)
+    history = days(date(2024, 12, 16), date(2024, 12, 27), date(2024, 12, 31), date(2025, 1, 2))
+    assert compute_streaks(history, week_key, date(2025, 1, 5).toordinal()) == (3, 3)
+
+
+def test_weekly_streak_across_iso_week_53():
+    # 2020 has 53 ISO weeks
+    history = days(date(2020, 12, 23), date(2020, 12, 28), date(2021, 1, 4))
+    assert [d.isocalendar()[1] for d in map(date.fromordinal, history)] == [52, 53, 1]
+    assert compute_streaks(history, week_key, date(2021, 1, 4).toordinal()) == (3, 3)
+
+
+def test_period_key_for():
+    assert period_key_for("Daily") is day_key
+    assert period_key_for("Weekly") is week_key
+    with pytest.raises(ValueError):
+        period_key_for("Yearly")
+
+
+def test_pure_functions_take_unsorted_dates_and_datetimes():
+    completions = [datetime(2024, 5, 3, 21, 0), date(2024, 5, 1), datetime(2024, 5, 2, 7, 30), date(2024, 5, 2)]
+    assert streaks_of(completions, "Daily", date(2024, 5, 4)) == (3, 3)
+    assert streaks_of(completions, "weekly", date(2024, 5, 4)) == (1, 1)
+    assert longest_daily_streak([]) == 0
+    with pytest.raises(TypeError):
+        streaks_of(["2024-05-01"], "Daily")
+
+
+@pytest.mark.parametrize("text, name, times", [
+    ("daily", "Daily", 1),
+    (" WEEKLY ", "Weekly", 1),
+    ("Monthly", "Monthly", 1),
+    ("every 1 day", "Daily", 1),
+    ("Every 2 days", "Every 2 days", 1),
+    ("3 times a week", "3x per week", 3),
+    ("3x per week", "3x per week", 3),
+    ("1x per week", "Weekly", 1),
+    ("2 times per month", "2x per month", 2),
+])
+def test_periodicity_for(text, name, times):
+    periodicity = periodicity_for(text)
+    assert (periodicity.name, periodicity.times) == (name, times)
+    assert periodicity_for(periodicity.name) == periodicity
+
+
+@pytest.mark.parametrize("text", ["Yearly", "every 0 days", "8x per week", "29 times per month", "3x per day", ""])
+def test_unknown_periodicities(text):
+    with pytest.raises(ValueError):
+        periodicity_for(text)
+
+
+def test_every_n_days_and_monthly_keys():
+    every_seven = period_key_for("Every 7 days")
+    assert all(every_seven(day) == week_key(day) for day in range(1, 100))
+    assert period_key_for("Every 3 days")(date(2024, 1, 1).toordinal()) == (date(2024, 1, 1).toordinal() - 1) // 3
+    assert month_key(date(2024, 1, 31).toordinal()) + 1 == month_key(date(2024, 2, 1).toordinal())
+    assert month_key(date(2024, 12, 31).toordinal()) + 1 == month_key(date(2025, 1, 1).toordinal())
+
+
+def test_times_per_week_needs_enough_days_in_a_week():
+    # week of 2024-05-06: three days, week of 2024-05-13: two days, then two full weeks
+    history = [date(2024, 5, 6), date(2024, 5, 7), date(2024, 5, 7), date(2024, 5, 12),
+               date(2024, 5, 13), date(2024, 5, 14),
+               date(2024, 5, 20), date(2024, 5, 21), date(2024, 5, 22),
+               date(2024, 5, 27), date(2024, 5, 28), date(2024, 6, 1)]
+    assert streaks_of(history, "3x per week", date(2024, 6, 2)) == (2, 2)
+    # the week of 2024-06-03 is not over yet, so last week's run is still current
+    assert streaks_of(history, "3x per week", date(2024, 6, 3)) == (2, 2)
+    assert streaks_of(history, "3x per week", date(2024, 6, 10)) == (0, 2)
+    assert streaks_of(history, "Weekly", date(2024, 6, 2)) == (4, 4)
+
+
+def test_monthly_streak_across_new_year():
+    history = [date(2024, 11, 30), date(2024, 12, 1), date(2025, 1, 31)]
+    assert streaks_of(history, "Monthly", date(2025, 2, 28)) == (3, 3)
+    assert streaks_of(history, "Monthly", date(2025, 3, 1)) == (0, 3)
+    assert streaks_of(history, "2x per month", date(2025, 1, 31)) == (0, 0)
+
+
+def reference_times_streaks(days, key, times, today):
+    """Counts the complete periods first and then their runs, the naive way."""
+    counts = {}
+    for day in sorted(set(days)):
+        counts[key(day)] = counts.get(key(day), 0) + 1
+    complete = sorted(period for period, count in counts.items() if count >= times)
+    runs = []
+    for period in complete:
+        if runs and runs[-1][1] == period - 1:
+            runs[-1][1] = period
+        else:
+            runs.append([period, period])
+    longest = max((last - first + 1 for first, last in runs), default=0)
+    current = runs[-1][1] - runs[-1][0] + 1 if runs and 0 <= key(today) - runs[-1][1] <= 1 else 0
+    return current, longest
+
+
+@pytest.mark.parametrize("text", ["Every 2 days", "Every 5 days", "2x per week", "3x per week", "Monthly", "4x per month"])
+def test_periodicities_match_a_naive_reference(text):
+    rng = random.Random(text)
+    periodicity = periodicity_for(text)
+    for _ in range(50):
+        day = date(2023, 12, 1).toordinal() + rng.randint(0, 30)
+        history = []
+        for _ in range(rng.randint(0, 60)):
+            history.append(day)
+            day += rng.choice([0, 1, 1, 2, 3, 6])
+        today = day + rng.randint(0, 20)
+        expected = reference_times_streaks(history, periodicity.key, periodicity.times, today)
+        assert compute_streaks(history, periodicity.key, today, periodicity.times) == expected
+        # continuing a state gives the same streaks as one pass over the whole history
+        split = rng.randint(0, len(history))
+        state = extend_streaks(EMPTY_STATE, history[:split], periodicity.key, periodicity.times)
+        state = extend_streaks(state, history[split:], periodicity.key, periodicity.times)
+        assert state == extend_streaks(EMPTY_STATE, history, periodicity.key, periodicity.times)
+
+
+def test_datetimes_count_for_the_day_of_the_configured_day_start(monkeypatch):
+    monkeypatch.setattr(clock, "_settings", clock.DaySettings(None, timedelta(hours=4)))
+    # 02:00 still belongs to the 1st of March, 10:00 to the 2nd, like completions saved by Habit
+    completions = [datetime(2024, 3, 2, 2), datetime(2024, 3, 2, 10)]
+    assert longest_daily_streak(completions) == 2
+    assert longest_daily_streak([date(2024, 3, 2), datetime(2024, 3, 2, 10)]) == 1